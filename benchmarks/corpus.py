@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Deterministic generator of synthetic Prophet-600 SysEx corpora in the
+original format and in all storage format versions of the GliGli format.
+"""
+
+import argparse
+from array import array
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from p600syx.bytewise import make_table  # noqa: E402
+from p600syx.gligli_sysex_parser import GliGliSysExParser  # noqa: E402
+from p600syx.patch_bank import PatchBank, column_from_bytes  # noqa: E402
+from p600syx.sequential_sysex_parser import (  # noqa: E402
+    SequentialSysExParser,
+)
+
+# corpus formats: "sequential" and "gligli-1" to "gligli-8"
+FORMATS = ["sequential"] + [f"gligli-{version}" for version in range(1, 9)]
+
+
+def _programs(rng: random.Random, count: int) -> "array[int]":
+    return array(
+        "B", rng.randbytes(count).translate(make_table(lambda x: x % 100))
+    )
+
+
+def generate(fmt: str, count: int, seed: int = 0) -> list[bytes]:
+    """
+    This function generates random patches and encodes them.
+
+    Parameters:
+            fmt (str): corpus format, see FORMATS
+            count (int): number of patches
+            seed (int): random seed
+    Returns:
+            A list of MIDI SysEx dumps.
+    """
+    rng = random.Random(f"{fmt}-{count}-{seed}")
+    if fmt == "sequential":
+        parser = SequentialSysExParser()
+        columns = []
+        for mask in parser.layout.masks:
+            table = make_table(lambda x: x & mask)
+            columns.append(
+                column_from_bytes(rng.randbytes(count).translate(table))
+            )
+        return parser.encode_many(
+            PatchBank(parser.layout.names, _programs(rng, count), columns)
+        )
+    if not fmt.startswith("gligli-"):
+        raise ValueError(f"Unknown corpus format {fmt!r}")
+    format_version = int(fmt[len("gligli-") :])
+    gligli = GliGliSysExParser()
+    layout = gligli.get_layout(format_version)
+    if layout is None:
+        raise ValueError(f"Unknown storage format version {format_version}")
+    columns = [
+        column_from_bytes(
+            rng.randbytes(count), rng.randbytes(count) if nbytes == 2 else None
+        )
+        for nbytes in layout.sizes
+    ]
+    return gligli.encode_many(
+        PatchBank(layout.names, _programs(rng, count), columns, format_version)
+    )
+
+
+def write(path: str, msgs: list[bytes]) -> None:
+    """
+    This function writes MIDI SysEx dumps to a file.
+
+    Parameters:
+            path (str): output file name
+            msgs (list): MIDI SysEx dumps
+    """
+    with open(path, "wb") as f:
+        f.write(b"".join(msgs))
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description=__doc__)
+    argparser.add_argument(
+        "-f",
+        "--format",
+        action="append",
+        choices=FORMATS,
+        help="corpus format (default: all formats)",
+    )
+    argparser.add_argument(
+        "-n",
+        "--number",
+        type=int,
+        action="append",
+        help="number of patches per file (default: 1, 100 and 10000)",
+    )
+    argparser.add_argument(
+        "-s", "--seed", type=int, default=0, help="random seed"
+    )
+    argparser.add_argument("outdir", help="output directory")
+    args = argparser.parse_args()
+
+    os.makedirs(args.outdir, exist_ok=True)
+    for fmt in args.format or FORMATS:
+        for count in args.number or [1, 100, 10000]:
+            path = os.path.join(args.outdir, f"{fmt}-{count}.syx")
+            write(path, generate(fmt, count, args.seed))
+            print(path)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark comparing the per-message cost of decoding GliGli dumps
+using compiled parameter layouts against the previous approach of popping
+bytes off the front of a list for every parameter.
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from p600syx.gligli_sysex_parser import GliGliSysExParser  # noqa: E402
+
+
+def make_message(parser: GliGliSysExParser, format_version: int) -> bytes:
+    rng = random.Random(format_version)
+    parameter_list = parser.get_parameter_list(format_version) or []
+    size = sum(nbytes for _, nbytes in parameter_list)
+    data = bytes([rng.randrange(100)]) + parser.format_id
+    data += bytes([format_version])
+    data += bytes(rng.randrange(256) for _ in range(size))
+    return parser.header + parser.pack_bytes(data)
+
+
+def decode_list_pop(
+    parser: GliGliSysExParser, msg: bytes
+) -> tuple[int, list[tuple[str, int]], list[int]]:
+    # reference: rebuild the parameter list and pop bytes per parameter
+    data = parser.unpack(msg[len(parser.header) :])
+    program = data.pop(0)
+    for _ in range(4):
+        data.pop(0)
+    parameter_list = parser.get_parameter_list(data.pop(0)) or []
+    parameters = []
+    for name, nbytes in parameter_list:
+        lsb = data.pop(0) if len(data) else 0
+        msb = data.pop(0) if len(data) and nbytes == 2 else 0
+        parameters.append((name, msb << 8 | lsb))
+    return (program, parameters, data)
+
+
+argparser = argparse.ArgumentParser(description=__doc__)
+argparser.add_argument(
+    "-n",
+    "--number",
+    type=int,
+    default=20000,
+    help="number of decoded messages per measurement (default: %(default)s)",
+)
+args = argparser.parse_args()
+
+parser = GliGliSysExParser()
+print(
+    f"{'version':>7} {'list.pop (us)':>14} {'layout (us)':>12} {'speedup':>8}"
+)
+for format_version in range(1, 9):
+    msg = make_message(parser, format_version)
+    assert decode_list_pop(parser, msg) == parser.decode(msg)
+    before = timeit.timeit(
+        lambda: decode_list_pop(parser, msg), number=args.number
+    )
+    after = timeit.timeit(lambda: parser.decode(msg), number=args.number)
+    print(
+        f"{format_version:7} {before / args.number * 1e6:14.2f}"
+        f" {after / args.number * 1e6:12.2f} {before / after:7.1f}x"
+    )
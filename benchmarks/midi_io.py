@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the MIDI transfer paths against emulated Prophet-600 devices
+(see p600syx/emulator.py). Patch dumps are received with several request
+windows and drop rates, and patches are sent with several processing
+allowances. The emulator transmits at MIDI speed in real time, so the
+results are repeatable and comparable to a real device, but a full run
+takes a few minutes.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import mido  # type: ignore  # noqa: E402
+
+from p600syx import emulator  # noqa: E402
+from p600syx.receiver import PatchReceiver  # noqa: E402
+from p600syx.sender import MESSAGE_TYPE_PATCH, SendScheduler  # noqa: E402
+
+argparser = argparse.ArgumentParser(description=__doc__)
+argparser.add_argument(
+    "-n",
+    "--patches",
+    type=int,
+    default=100,
+    help="number of patches per run (default: %(default)s)",
+)
+argparser.add_argument(
+    "-l",
+    "--latency",
+    type=float,
+    default=5,
+    help="processing latency of the device in ms (default: %(default)s)",
+)
+argparser.add_argument(
+    "--windows",
+    default="1,2,4,8",
+    help="request windows of the receive runs (default: %(default)s)",
+)
+argparser.add_argument(
+    "--drops",
+    default="0,0.05",
+    help="reply drop rates of the receive runs (default: %(default)s)",
+)
+argparser.add_argument(
+    "--allowances",
+    default="10,20,50",
+    help="patch processing allowances in ms of the send runs, the device needs 20 ms (default: %(default)s)",
+)
+argparser.add_argument(
+    "-s",
+    "--seed",
+    type=int,
+    default=0,
+    help="random seed (default: %(default)s)",
+)
+args = argparser.parse_args()
+
+programs = list(range(args.patches))
+bank = emulator.default_bank()
+patches = [bank[program % 100] for program in programs]
+messages = [mido.Message.from_bytes(msg) for msg in patches]
+
+
+def receive(window: int, drop: float) -> None:
+    (device,) = emulator.configure(
+        latency=args.latency / 1000.0, drop=drop, seed=args.seed
+    )
+    with emulator.Input(device.name) as inport:
+        with emulator.Output(device.name) as outport:
+            receiver = PatchReceiver.for_ports(
+                inport, outport, window=window, timeout=0.3
+            )
+            receiver.receive(
+                [program % 100 for program in programs], lambda *_: None
+            )
+    stats = receiver.stats
+    elapsed = stats.end - stats.start
+    latency = sum(stats.latencies) / max(len(stats.latencies), 1) * 1000
+    print(
+        f"{window:8} {drop:6.2f} {elapsed:8.2f} {stats.replies / elapsed:8.1f}"
+        f" {latency:8.1f} {stats.retries:7} {len(stats.lost):5}"
+    )
+
+
+def send(allowance: float) -> None:
+    (device,) = emulator.configure(latency=args.latency / 1000.0)
+    scheduler = SendScheduler({MESSAGE_TYPE_PATCH: allowance / 1000.0})
+    with emulator.Output(device.name) as outport:
+        start = time.monotonic()
+        for data, msg in zip(patches, messages):
+            scheduler.wait()
+            outport.send(msg)
+            scheduler.sent(data)
+        scheduler.wait()
+        elapsed = time.monotonic() - start
+    print(
+        f"{allowance:9.0f} {elapsed:8.2f} {scheduler.throughput():8.0f}"
+        f" {device.stats['patches']:7} {device.stats['overruns']:8}"
+    )
+
+
+print(f"Receiving {args.patches} patches")
+print(
+    f"{'window':>8} {'drop':>6} {'time':>8} {'patch/s':>8} {'lat ms':>8}"
+    f" {'retries':>7} {'lost':>5}"
+)
+for drop in [float(drop) for drop in args.drops.split(",")]:
+    for window in [int(window) for window in args.windows.split(",")]:
+        receive(window, drop)
+
+print(f"\nSending {args.patches} patches")
+print(
+    f"{'allowance':>9} {'time':>8} {'bytes/s':>8} {'stored':>7}"
+    f" {'overruns':>8}"
+)
+for allowance in [float(ms) for ms in args.allowances.split(",")]:
+    send(allowance)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite measuring decoding throughput, peak memory and import time
+of p600syx on synthetic corpora. Results are written as JSON and can be
+compared with the results of another commit.
+"""
+
+import argparse
+from collections.abc import Callable
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Optional
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from p600syx import factory  # noqa: E402
+from corpus import FORMATS, generate, write  # noqa: E402
+
+
+def measure(func: Callable[[], Any], repeat: int) -> float:
+    # best wall clock time of several runs
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_process(args: list[str]) -> tuple[float, int]:
+    # wall clock time and peak resident memory in bytes of a subprocess
+    start = time.perf_counter()
+    with open(os.devnull, "wb") as devnull:
+        proc = subprocess.Popen(args, stdout=devnull, cwd=ROOT)
+        _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"{args} failed with status {proc.returncode}")
+    return (elapsed, rusage.ru_maxrss * 1024)
+
+
+def decode_all(msgs: list[bytes]) -> None:
+    for msg in msgs:
+        parser = factory.get_parser(msg)
+        if parser:
+            parser.decode(msg)
+
+
+def decode_batch(msgs: list[bytes]) -> None:
+    parser = factory.get_parser(msgs[0])
+    getattr(parser, "decode_many")(msgs)
+
+
+def dispatch_all(msgs: list[bytes]) -> None:
+    for msg in msgs:
+        factory.get_parser(msg)
+
+
+def result(
+    benchmark: str,
+    fmt: Optional[str],
+    count: int,
+    seconds: float,
+    memory: Optional[int] = None,
+) -> dict[str, Any]:
+    return {
+        "benchmark": benchmark,
+        "format": fmt,
+        "patches": count,
+        "seconds": seconds,
+        "messages_per_second": count / seconds if count else None,
+        "peak_memory_bytes": memory,
+    }
+
+
+def import_time(repeat: int) -> float:
+    # difference between starting python with and without importing p600syx
+    def best(code: str) -> float:
+        return min(
+            run_process([sys.executable, "-c", code])[0] for _ in range(repeat)
+        )
+
+    return max(0.0, best("import p600syx") - best("pass"))
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict[str, Any]], path: str) -> None:
+    with open(path) as f:
+        previous = {
+            (r["benchmark"], r["format"], r["patches"]): r
+            for r in json.load(f)["results"]
+        }
+    print()
+    print(f"Comparison with {path} (time ratio, < 1 is faster):")
+    for r in results:
+        old = previous.get((r["benchmark"], r["format"], r["patches"]))
+        if old and old["seconds"]:
+            print(
+                f"  {r['benchmark']:12} {str(r['format']):12}"
+                f" {r['patches']:9}: {r['seconds'] / old['seconds']:6.2f}"
+            )
+
+
+argparser = argparse.ArgumentParser(description=__doc__)
+argparser.add_argument(
+    "-c", "--compare", help="JSON results of a previous run to compare with"
+)
+argparser.add_argument(
+    "-f",
+    "--format",
+    action="append",
+    choices=FORMATS,
+    help="corpus format (default: all formats)",
+)
+argparser.add_argument(
+    "-n",
+    "--number",
+    type=int,
+    action="append",
+    help="number of patches per corpus, e.g. 1000000 (default: 1, 100 and 10000)",
+)
+argparser.add_argument(
+    "-o",
+    "--output",
+    default="benchmark_results.json",
+    help="JSON output file (default: %(default)s)",
+)
+argparser.add_argument(
+    "-r",
+    "--repeat",
+    type=int,
+    default=3,
+    help="number of runs per measurement, the best is reported (default: %(default)s)",
+)
+args = argparser.parse_args()
+
+results = [result("import", None, 0, import_time(max(args.repeat, 5)))]
+print(
+    f"{'benchmark':12} {'format':12} {'patches':>9} {'msgs/s':>12} {'peak MiB':>9}"
+)
+with tempfile.TemporaryDirectory() as tmpdir:
+    for fmt in args.format or FORMATS:
+        for count in args.number or [1, 100, 10000]:
+            msgs = generate(fmt, count)
+            benchmarks = [
+                ("dispatch", lambda: dispatch_all(msgs)),
+                ("decode", lambda: decode_all(msgs)),
+            ]
+            if hasattr(factory.get_parser(msgs[0]), "decode_many"):
+                benchmarks.append(("decode_many", lambda: decode_batch(msgs)))
+            for benchmark, func in benchmarks:
+                seconds = measure(func, args.repeat)
+                results.append(
+                    result(benchmark, fmt, count, seconds, peak_memory(func))
+                )
+            path = os.path.join(tmpdir, f"{fmt}-{count}.syx")
+            write(path, msgs)
+            del msgs
+            script = os.path.join(ROOT, "p600_decode")
+            runs = [
+                run_process([sys.executable, script, "-j", "1", path])
+                for _ in range(args.repeat)
+            ]
+            results.append(
+                result(
+                    "p600_decode",
+                    fmt,
+                    count,
+                    min(seconds for seconds, _ in runs),
+                    max(memory for _, memory in runs),
+                )
+            )
+            os.remove(path)
+            for r in results[-len(benchmarks) - 1 :]:
+                memory = r["peak_memory_bytes"] / (1 << 20)
+                print(
+                    f"{r['benchmark']:12} {fmt:12} {count:9}"
+                    f" {r['messages_per_second']:12.0f} {memory:9.1f}"
+                )
+
+print(f"{'import':12} {'':12} {'':9} {results[0]['seconds'] * 1000:9.1f} ms")
+with open(args.output, "w") as f:
+    json.dump(
+        {
+            "meta": {
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "date": datetime.datetime.now().isoformat(),
+            },
+            "results": results,
+        },
+        f,
+        indent=2,
+    )
+print(f"Results written to {args.output}")
+if args.compare:
+    compare(results, args.compare)
@@ -1,52 +1,57 @@
 """
 This module provides an interface to several MIDI SysEx dump formats for
 the Sequential Circuits Prophet-600 analog synthesizer.
-"""
-
-from typing import Optional
-
-from .sysex_parser import SysExParser
-from .sequential_sysex_parser import SequentialSysExParser
-from .gligli_sysex_parser import GliGliSysExParser
-
-
-class SysExParserFactory:
-    """
-    This factory class is the provider for all registered parser classes.
-    """
-
-    def __init__(self) -> None:
-        self.parsers: dict[str, SysExParser] = {}
-
-    def register_parser(self, parser: SysExParser) -> None:
-        """
-        This function takes a parser object as argument and registers it
-        with the factory.
-
-        Parameters:
-                parser (object): An object implementing the functions
-                'can_decode' and 'decode' (see already implemented classes)
-        """
-        if not parser.name in self.parsers:
-            self.parsers[parser.name] = parser
-
-    def get_parser(self, msg: bytes) -> Optional[SysExParser]:
-        """
-        This function returns a suitable parser for decoding a SysEx
-        messages if available, None otherwise.
-
-        Parameters:
-                msg (bytes): A MIDI SysEx message as a bytestring.
-
-        Returns:
-                parser object or None
-        """
-        for _, parser in self.parsers.items():
-            if parser.can_decode(msg):
-                return parser
-        return None
 
+The names exported by this module are imported from their submodules on
+first access, so importing p600syx or any of its submodules does not
+import unrelated parts of the package.
+"""
 
-factory = SysExParserFactory()
-factory.register_parser(SequentialSysExParser())
-factory.register_parser(GliGliSysExParser())
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    # explicit re-exports, __all__ is not evaluated by type checkers
+    from .framing import iter_sysex as iter_sysex
+    from .gligli_sysex_parser import GliGliSysExParser as GliGliSysExParser
+    from .patch import Patch as Patch
+    from .patch_bank import PatchBank as PatchBank
+    from .registry import ENTRY_POINT_GROUP as ENTRY_POINT_GROUP
+    from .registry import SysExParserFactory as SysExParserFactory
+    from .registry import factory as factory
+    from .sequential_sysex_parser import (
+        SequentialSysExParser as SequentialSysExParser,
+    )
+    from .stats import Stats as Stats
+    from .sysex_parser import SysExMessage as SysExMessage
+    from .sysex_parser import SysExParser as SysExParser
+
+# exported names by submodule
+_EXPORTS = {
+    "SysExMessage": "sysex_parser",
+    "SysExParser": "sysex_parser",
+    "SequentialSysExParser": "sequential_sysex_parser",
+    "GliGliSysExParser": "gligli_sysex_parser",
+    "Patch": "patch",
+    "PatchBank": "patch_bank",
+    "iter_sysex": "framing",
+    "Stats": "stats",
+    "ENTRY_POINT_GROUP": "registry",
+    "SysExParserFactory": "registry",
+    "factory": "registry",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_EXPORTS))
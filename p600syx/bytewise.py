@@ -0,0 +1,37 @@
+"""
+This module contains helper functions for operating on whole byte strings at
+once, i.e. without iterating over single bytes in Python.
+"""
+from collections.abc import Callable
+
+
+def make_table(func: Callable[[int], int]) -> bytes:
+    """
+    This function creates a translation table for 'bytes.translate' by
+    applying a function to all possible byte values.
+
+    Parameters:
+            func (callable): A function mapping a byte value to a new value
+                             in the range 0-255.
+    Returns:
+            A bytestring of length 256.
+    """
+    return bytes(func(value) & 0xFF for value in range(256))
+
+
+def or_bytes(lhs: bytes, rhs: bytes) -> bytes:
+    """
+    This function combines two bytestrings of equal length using a bitwise
+    OR of the corresponding bytes.
+
+    Parameters:
+            lhs (bytes): first operand
+            rhs (bytes): second operand
+    Returns:
+            A bytestring of the same length as the operands.
+    """
+    if len(lhs) != len(rhs):
+        raise ValueError(f"Length mismatch: {len(lhs)} != {len(rhs)}")
+    return (
+        int.from_bytes(lhs, "little") | int.from_bytes(rhs, "little")
+    ).to_bytes(len(lhs), "little")
@@ -0,0 +1,68 @@
+"""
+This module contains the cache of p600_send, which stores the bank of every
+port after a synchronization. It has no dependencies on the decoding
+modules, so sending without synchronization can clear the cache cheaply.
+"""
+import os
+from typing import Optional
+
+import appdirs  # type: ignore
+
+from .workers import port_path
+
+
+def cache_dir() -> str:
+    """
+    This function returns the directory containing the cached banks, i.e.
+    the user cache directory of p600syx, e.g. ~/.cache/p600syx on Linux.
+    """
+    return str(appdirs.user_cache_dir("p600syx"))
+
+
+def cache_path(port: str, directory: Optional[str] = None) -> str:
+    """
+    This function returns the name of the cached bank of a port.
+
+    Parameters:
+            port (str): output port name
+            directory (str): cache directory, see 'cache_dir'
+    Returns:
+            The file name.
+    """
+    return port_path(os.path.join(directory or cache_dir(), "bank.syx"), port)
+
+
+def save_cache(
+    port: str, dumps: dict[int, bytes], directory: Optional[str] = None
+) -> None:
+    """
+    This function stores the bank of a port after a synchronization.
+
+    Parameters:
+            port (str): output port name
+            dumps (dict): patch dumps by program number
+            directory (str): cache directory, see 'cache_dir'
+    """
+    path = cache_path(port, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write atomically, the previous state stays valid on errors
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        for program in sorted(dumps):
+            f.write(dumps[program])
+    os.replace(tmp_path, path)
+
+
+def clear_cache(port: str, directory: Optional[str] = None) -> None:
+    """
+    This function removes the cached bank of a port, e.g. after sending
+    patches without synchronization.
+
+    Parameters:
+            port (str): output port name
+            directory (str): cache directory, see 'cache_dir'
+    """
+    try:
+        os.remove(cache_path(port, directory))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,345 @@
+"""
+This module contains the decoding pipeline of p600_decode, i.e. framing,
+parser lookup and decoding of MIDI SysEx dumps, which are passed to one of
+the writers in the output module.
+"""
+from collections.abc import Callable, Iterable, Iterator
+import io
+import sys
+import time
+from typing import Any, BinaryIO, Optional, TextIO
+
+from .error import ParseError
+from .framing import SysExFramer, iter_sysex
+from .index import OffsetIndex, open_index
+from .output import WRITERS, PatchWriter, TextWriter
+from .patch import Patch, PatchChanges
+from .registry import factory
+from .sysex_parser import SysExMessage, SysExParser
+from .stats import Stats
+
+
+def decode_stream(
+    infile: BinaryIO,
+    writer: Optional[PatchWriter] = None,
+    err: Optional[TextIO] = None,
+    message: int = -1,
+    program: int = -1,
+    debug: bool = False,
+    stats: Optional[Stats] = None,
+    source: str = "-",
+    index: Optional[OffsetIndex] = None,
+) -> int:
+    """
+    This function decodes all MIDI SysEx dumps read from a binary file
+    object and passes them to a writer.
+
+    Parameters:
+            infile (file): binary file object
+            writer (PatchWriter): output format receiving the decoded
+                                  patches, defaults to text written to
+                                  sys.stdout
+            err (file): text stream receiving debug output, defaults to
+                        sys.stderr
+            message (int): select message number, -1 for all messages
+            program (int): select program number, -1 for all programs
+            debug (bool): turn on debug output
+            stats (Stats): record the time spent in the decoding stages
+            source (str): input name passed to the writer
+            index (OffsetIndex): index of infile, only the messages matching
+                                 the selection are read if given
+    Returns:
+            The number of messages found.
+    """
+    if writer is None:
+        with TextWriter(sys.stdout.buffer) as writer:
+            return decode_stream(
+                infile,
+                writer,
+                err,
+                message,
+                program,
+                debug,
+                stats,
+                source,
+                index,
+            )
+    if err is None:
+        err = sys.stderr
+    if index is None:
+        framing = "iter_sysex"
+        messages: Iterable[SysExMessage] = iter_sysex(infile)
+    else:
+        framing = type(index).__name__
+        selected = index.select(message, program)
+        messages = (index.read(infile, i) for i in selected)
+    write = writer.write
+    if stats is not None:
+        factory.instrument(stats)
+        writer.instrument(stats)
+        messages = stats.timed_iter(messages, framing, "framing")
+        write = stats.timed(write, type(writer).__name__, "output")
+    try:
+        count = _decode_stream(
+            enumerate(messages) if index is None else zip(selected, messages),
+            write,
+            writer.note,
+            err,
+            message,
+            program,
+            debug,
+            source,
+        )
+    finally:
+        if stats is not None:
+            factory.uninstrument()
+            writer.uninstrument()
+    return count if index is None else len(index)
+
+
+def _decode_stream(
+    messages: Iterable[tuple[int, SysExMessage]],
+    write: Callable[[str, int, str, Patch], None],
+    note: Callable[[str, TextIO], None],
+    err: TextIO,
+    message: int,
+    program: int,
+    debug: bool,
+    source: str,
+) -> int:
+    count = 0
+    for i, m in messages:
+        count += 1
+        if message > -1 and i != message:
+            continue
+        parser = factory.get_parser(m)
+        if not parser:
+            note(f"No suitable parser found for message {i}", err)
+            if debug:
+                for chunk in [m[i : i + 5] for i in range(0, len(m), 5)]:
+                    for char in chunk:
+                        print(f"{char:02x}", file=err, end="")
+                    print(" ", file=err, end="")
+                print(file=err)
+            continue
+        if debug:
+            print(f"Using {parser.name} for message {i}", file=err)
+        try:
+            patch_program, patch, data = parser.decode(m, lazy=True)
+        except ParseError as e:
+            print(f"Unable to decode message {i}: {e}", file=err)
+            continue
+        if program > -1 and patch_program != program:
+            continue
+        write(source, i, parser.name, patch)
+
+        if debug:
+            print(file=err)
+            print(f"Data length: {len(data)}", file=err)
+            print(data, file=err)
+            print(file=err)
+    return count
+
+
+def iter_patches(
+    infile: BinaryIO,
+) -> Iterator[tuple[int, SysExParser, Patch]]:
+    """
+    This function decodes all MIDI SysEx dumps read from a binary file
+    object. Messages that cannot be decoded are skipped.
+
+    Parameters:
+            infile (file): binary file object
+    Returns:
+            An iterator over tuples containing the message number, the
+            parser and the decoded patch.
+    """
+    for i, m in enumerate(iter_sysex(infile)):
+        parser = factory.get_parser(m)
+        if not parser:
+            continue
+        try:
+            yield (i, parser, parser.decode(m, lazy=True)[1])
+        except ParseError:
+            continue
+
+
+class LiveDecoder:
+    """
+    This class decodes MIDI SysEx dumps as soon as they are received, e.g.
+    from a MIDI input port while patches are being edited on the device.
+    Every patch is written and flushed immediately. By default, only the
+    parameters that changed since the previous dump of the same program
+    are written, and dumps without changes are skipped.
+    """
+
+    def __init__(
+        self,
+        writer: PatchWriter,
+        source: str = "-",
+        changes: bool = True,
+        err: Optional[TextIO] = None,
+        debug: bool = False,
+    ) -> None:
+        """
+        Parameters:
+                writer (PatchWriter): output format receiving the decoded
+                                      patches
+                source (str): input name passed to the writer, e.g. the
+                              port name
+                changes (bool): only write changed parameters
+                err (file): text stream receiving debug output, defaults to
+                            sys.stderr
+                debug (bool): turn on debug output
+        """
+        self.writer = writer
+        self.source = source
+        self.changes = changes
+        self.err = err or sys.stderr
+        self.debug = debug
+        self.framer = SysExFramer()
+        # number of framed messages
+        self.count = 0
+        # last received version of every program
+        self.patches: dict[int, Patch] = {}
+
+    def feed(self, data: SysExMessage) -> int:
+        """
+        This function decodes all messages completed by a chunk of data.
+
+        Parameters:
+                data (bytes): received MIDI data
+        Returns:
+                The number of written patches.
+        """
+        written = 0
+        for msg in self.framer.feed(data):
+            written += self.decode(msg)
+        return written
+
+    def decode(self, msg: SysExMessage) -> bool:
+        """
+        This function decodes a single message.
+
+        Parameters:
+                msg (bytes): MIDI SysEx message starting with 0xf0
+        Returns:
+                True if a patch was written.
+        """
+        start = time.perf_counter()
+        i = self.count
+        self.count += 1
+        parser = factory.get_parser(msg)
+        if not parser:
+            self.writer.note(
+                f"No suitable parser found for message {i}", self.err
+            )
+            self.writer.flush()
+            return False
+        try:
+            program, patch, _ = parser.decode(msg, lazy=True)
+        except ParseError as e:
+            print(f"Unable to decode message {i}: {e}", file=self.err)
+            return False
+        if self.changes:
+            changes = PatchChanges.compare(self.patches.get(program), patch)
+            self.patches[program] = patch
+            if not changes.indices:
+                if self.debug:
+                    print(f"No changes in message {i}", file=self.err)
+                return False
+            patch = changes
+        self.writer.write(self.source, i, parser.name, patch)
+        self.writer.flush()
+        if self.debug:
+            elapsed = (time.perf_counter() - start) * 1000
+            print(
+                f"Decoded message {i} using {parser.name} in {elapsed:.2f} ms",
+                file=self.err,
+            )
+        return True
+
+    def callback(self, message: Any) -> None:
+        """
+        This function is the callback of a mido input port.
+
+        Parameters:
+                message (mido.Message): received message
+        """
+        if message.type == "sysex":
+            self.feed(bytes(message.bytes()))
+
+
+def decode_path(
+    path: str,
+    writer: PatchWriter,
+    err: Optional[TextIO] = None,
+    message: int = -1,
+    program: int = -1,
+    debug: bool = False,
+    stats: Optional[Stats] = None,
+    use_index: bool = True,
+) -> int:
+    """
+    This function decodes all MIDI SysEx dumps contained in a file and
+    passes them to a writer, see 'decode_stream'.
+
+    Parameters:
+            path (str): SysEx file name
+            use_index (bool): read the messages selected by message or
+                              program number using the sidecar index of
+                              the file, see index.open_index
+            see 'decode_stream' for all other parameters
+    Returns:
+            The number of messages found.
+    """
+    with open(path, "rb") as f:
+        index = None
+        if use_index and (message > -1 or program > -1):
+            index = open_index(path, f)
+        return decode_stream(
+            f, writer, err, message, program, debug, stats, path, index
+        )
+
+
+def decode_file(
+    path: str,
+    directory: str,
+    message: int = -1,
+    program: int = -1,
+    debug: bool = False,
+    stats: bool = False,
+    output_format: str = "text",
+    use_index: bool = True,
+) -> tuple[str, str, int, Optional[Stats], Optional[tuple[str, ...]]]:
+    """
+    This function decodes all MIDI SysEx dumps contained in a file into a
+    temporary file. It is used for decoding several files in parallel
+    processes, the outputs are combined using 'PatchWriter.write_raw'.
+
+    Parameters:
+            path (str): SysEx file name
+            directory (str): directory receiving the temporary file
+            message (int): select message number, -1 for all messages
+            program (int): select program number, -1 for all programs
+            debug (bool): turn on debug output
+            stats (bool): record the time spent in the decoding stages
+            output_format (str): output format, see output.FORMATS
+            use_index (bool): see 'decode_path'
+    Returns:
+            A tuple containing the name of the temporary file holding the
+            formatted patches without header, the debug output, the number
+            of messages found, the recorded statistics or None, and the
+            parameter names of the patches or None if no patch was written.
+            The caller removes the temporary file.
+    """
+    import tempfile
+
+    err = io.StringIO()
+    file_stats = Stats() if stats else None
+    fd, out_path = tempfile.mkstemp(suffix=".out", dir=directory)
+    with open(fd, "wb") as out, WRITERS[output_format](out, False) as writer:
+        count = decode_path(
+            path, writer, err, message, program, debug, file_stats, use_index
+        )
+    return (out_path, err.getvalue(), count, file_stats, writer.names)
@@ -0,0 +1,253 @@
+"""
+This module contains the comparison of decoded patches, i.e. content hashes
+for finding duplicates and slot-wise differences of two banks.
+"""
+from collections.abc import Iterator
+import hashlib
+import struct
+from typing import NamedTuple, Optional
+
+from .decoding import iter_patches
+from .patch import PATCH_NAME_PREFIX, Patch
+
+# parameters that do not affect the sound and are ignored in comparisons
+IGNORED_NAMES = frozenset(["(padding)", "(unused)"])
+
+SLOT_IDENTICAL = "identical"
+SLOT_DIFFERENT = "different"
+SLOT_ONLY_A = "only_a"
+SLOT_ONLY_B = "only_b"
+
+# parameter name and values in two patches
+Difference = tuple[str, Optional[int], Optional[int]]
+
+
+class PatchRef(NamedTuple):
+    """
+    This class identifies a patch within a set of SysEx files.
+    """
+
+    path: str
+    message: int
+    program: int
+    name: Optional[str]
+
+
+class _Normalization:
+    # precomputed normalization of a parameter layout
+    def __init__(self, names: tuple[str, ...]) -> None:
+        self.indices = tuple(
+            i for i, name in enumerate(names) if name not in IGNORED_NAMES
+        )
+        self.names = tuple(names[i] for i in self.indices)
+        self.name_indices = tuple(
+            i
+            for i, name in enumerate(names)
+            if name.startswith(PATCH_NAME_PREFIX)
+        )
+        self.struct = struct.Struct(f"<{len(self.indices)}H")
+        # patches of different layouts never have the same hash
+        self.digest = hashlib.blake2b(digest_size=16)
+        self.digest.update("\0".join(self.names).encode() + b"\1")
+
+
+_normalizations: dict[tuple[str, ...], _Normalization] = {}
+
+
+def _normalization(names: tuple[str, ...]) -> _Normalization:
+    normalization = _normalizations.get(names)
+    if normalization is None:
+        normalization = _normalizations[names] = _Normalization(names)
+    return normalization
+
+
+def normalize(patch: Patch) -> dict[str, int]:
+    """
+    This function returns the parameters of a patch that are relevant for
+    comparisons, i.e. without the program number and without unused and
+    padding parameters.
+
+    Parameters:
+            patch (Patch): decoded patch
+    Returns:
+            A dictionary mapping parameter names to values.
+    """
+    normalization = _normalization(patch.keys())
+    values = patch.values()
+    return {
+        name: values[i]
+        for name, i in zip(normalization.names, normalization.indices)
+    }
+
+
+def patch_hash(patch: Patch) -> bytes:
+    """
+    This function computes a content hash of a patch, which is equal for
+    patches with equal normalized parameters, see 'normalize'.
+
+    Parameters:
+            patch (Patch): decoded patch
+    Returns:
+            A 16 byte BLAKE2b digest.
+    """
+    return _hash(_normalization(patch.keys()), patch.values())
+
+
+def _hash(normalization: _Normalization, values: tuple[int, ...]) -> bytes:
+    digest = normalization.digest.copy()
+    digest.update(
+        normalization.struct.pack(*[values[i] for i in normalization.indices])
+    )
+    return digest.digest()
+
+
+class HashIndex:
+    """
+    This class indexes patches by their content hash for finding duplicates.
+    Adding a patch takes constant time, so the index scales linearly with
+    the number of patches.
+    """
+
+    def __init__(self) -> None:
+        self.entries: dict[bytes, list[PatchRef]] = {}
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, ref: PatchRef, patch: Patch) -> bytes:
+        """
+        This function adds a patch to the index.
+
+        Parameters:
+                ref (PatchRef): location of the patch
+                patch (Patch): decoded patch
+        Returns:
+                The content hash of the patch.
+        """
+        return self._add(ref, _normalization(patch.keys()), patch.values())
+
+    def _add(
+        self,
+        ref: PatchRef,
+        normalization: _Normalization,
+        values: tuple[int, ...],
+    ) -> bytes:
+        digest = _hash(normalization, values)
+        self.entries.setdefault(digest, []).append(ref)
+        self.count += 1
+        return digest
+
+    def add_file(self, path: str) -> int:
+        """
+        This function adds all patches contained in a file to the index.
+
+        Parameters:
+                path (str): SysEx file name
+        Returns:
+                The number of added patches.
+        """
+        count = 0
+        with open(path, "rb") as f:
+            for message, _, patch in iter_patches(f):
+                normalization = _normalization(patch.keys())
+                values = patch.values()
+                # same as patch_name without decoding all parameters
+                name = None
+                if normalization.name_indices:
+                    chars = [values[i] for i in normalization.name_indices]
+                    name = "".join(chr(c) for c in chars if c > 0).strip()
+                self._add(
+                    PatchRef(path, message, patch.program, name),
+                    normalization,
+                    values,
+                )
+                count += 1
+        return count
+
+    def duplicates(self) -> list[tuple[bytes, list[PatchRef]]]:
+        """
+        This function returns all groups of patches with the same content.
+
+        Returns:
+                A list of tuples containing the content hash and the
+                locations of all patches with that hash, in the order in
+                which the patches were added.
+        """
+        return [
+            (digest, refs)
+            for digest, refs in self.entries.items()
+            if len(refs) > 1
+        ]
+
+
+def load_bank(path: str) -> dict[int, Patch]:
+    """
+    This function decodes all patches contained in a file by program
+    number. If a file contains a program several times, the last dump wins
+    like on the device.
+
+    Parameters:
+            path (str): SysEx file name
+    Returns:
+            A dictionary mapping program numbers to patches.
+    """
+    with open(path, "rb") as f:
+        return {patch.program: patch for _, _, patch in iter_patches(f)}
+
+
+def diff_patches(a: Patch, b: Patch) -> list[Difference]:
+    """
+    This function compares the normalized parameters of two patches.
+
+    Parameters:
+            a (Patch): first patch
+            b (Patch): second patch
+    Returns:
+            A list of tuples containing the parameter name and the values in
+            both patches for every differing parameter. The value is None if
+            a parameter does not exist in a patch, e.g. if the patches were
+            stored in different storage format versions.
+    """
+    values_a = normalize(a)
+    values_b = normalize(b)
+    differences: list[Difference] = [
+        (name, value, values_b.get(name))
+        for name, value in values_a.items()
+        if values_b.get(name) != value
+    ]
+    differences += [
+        (name, None, value)
+        for name, value in values_b.items()
+        if name not in values_a
+    ]
+    return differences
+
+
+def diff_banks(
+    a: dict[int, Patch], b: dict[int, Patch]
+) -> Iterator[tuple[int, str, list[Difference]]]:
+    """
+    This function compares two banks slot by slot.
+
+    Parameters:
+            a (dict): first bank, see 'load_bank'
+            b (dict): second bank
+    Returns:
+            An iterator over tuples containing the program number, one of
+            SLOT_IDENTICAL, SLOT_DIFFERENT, SLOT_ONLY_A and SLOT_ONLY_B, and
+            the differing parameters, see 'diff_patches', in program order.
+    """
+    for program in sorted(a.keys() | b.keys()):
+        if program not in b:
+            yield (program, SLOT_ONLY_A, [])
+        elif program not in a:
+            yield (program, SLOT_ONLY_B, [])
+        elif patch_hash(a[program]) == patch_hash(b[program]):
+            yield (program, SLOT_IDENTICAL, [])
+        else:
+            yield (
+                program,
+                SLOT_DIFFERENT,
+                diff_patches(a[program], b[program]),
+            )
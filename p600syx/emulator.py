@@ -0,0 +1,463 @@
+"""
+This module emulates Prophet-600 synthesizers for testing and benchmarking
+the MIDI tools without hardware. It is a backend for mido, i.e. all mido
+ports can be replaced by emulated devices using the environment variable
+
+    MIDO_BACKEND=p600syx.emulator
+
+Alternatively, the environment variable P600_EMULATOR adds emulated ports
+named 'P600 Emulator 1', 'P600 Emulator 2', ... to the ports of the regular
+backend, see util.get_input_names. Its value configures the devices as
+comma separated options, e.g.
+
+    P600_EMULATOR="devices=2,latency=20,drop=0.05,bank=bank.syx"
+
+The emulated devices answer patch dump requests with the patches of a bank
+(GliGli format by default), store uploaded patches and accept firmware
+uploads. Both directions of the MIDI cable take the transmission time of
+31250 baud, and messages arriving while the device is still processing an
+upload are lost like on a real device.
+"""
+from collections import Counter
+from collections.abc import Iterable
+import heapq
+import os
+import random
+import threading
+import time
+from typing import Any, Optional
+
+import mido  # type: ignore
+from mido.ports import BaseInput, BaseOutput  # type: ignore
+
+from .error import MIDIError, ParseError
+from .registry import factory
+from .sender import (
+    MESSAGE_TYPE_FIRMWARE,
+    MESSAGE_TYPE_PATCH,
+    MIDI_BAUD_RATE,
+    message_type,
+    wire_time,
+)
+from .sysex_parser import SysExMessage
+from .util import SysEx
+
+ENVIRONMENT_VARIABLE = "P600_EMULATOR"
+PORT_PREFIX = "P600 Emulator"
+
+_DUMP_REQUEST = bytes(
+    [
+        0xF0,
+        SysEx.SYSEX_ID_0,
+        SysEx.SYSEX_ID_1,
+        SysEx.SYSEX_ID_2,
+        SysEx.SYSEX_COMMAND_PATCH_DUMP_REQUEST,
+    ]
+)
+
+
+def default_bank(fmt: str = "gligli") -> dict[int, bytes]:
+    """
+    This function creates a bank of 100 patches with all parameters set to
+    zero.
+
+    Parameters:
+            fmt (str): 'gligli' or 'sequential'
+    Returns:
+            A dictionary mapping program numbers to MIDI SysEx dumps
+            including 0xf0 and 0xf7.
+    """
+    from .gligli_sysex_parser import GliGliSysExParser
+    from .sequential_sysex_parser import SequentialSysExParser
+
+    if fmt == "sequential":
+        sequential = SequentialSysExParser()
+        values = [0] * len(sequential.parameters)
+        return {i: sequential.encode(i, values) for i in range(100)}
+    if fmt == "gligli":
+        gligli = GliGliSysExParser()
+        layout = gligli.get_layout(8)
+        assert layout is not None
+        values = [0] * len(layout.names)
+        return {i: gligli.encode(i, values, 8) for i in range(100)}
+    raise ValueError(f"Unknown patch format {fmt!r}")
+
+
+def load_bank(path: str) -> dict[int, bytes]:
+    """
+    This function reads the patches of a SysEx file. If a program is
+    contained several times, the last dump wins.
+
+    Parameters:
+            path (str): SysEx file name
+    Returns:
+            A dictionary mapping program numbers to MIDI SysEx dumps
+            including 0xf0 and 0xf7.
+    """
+    from .sync import read_dumps
+
+    return read_dumps(path)[0]
+
+
+def _program(msg: Any) -> Optional[int]:
+    parser = factory.get_parser(msg)
+    if not parser:
+        return None
+    try:
+        return parser.peek_program(msg)
+    except ParseError:
+        return None
+
+
+class Prophet600:
+    """
+    This class simulates the MIDI behaviour of a single device. Messages
+    sent to the device arrive after their transmission time, and replies
+    are delivered to the input port after the processing latency of the
+    device and their own transmission time. The counters in 'stats' record
+    the processed messages, e.g. 'requests', 'replies', 'dropped',
+    'patches', 'firmware' and 'overruns'.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        bank: Optional[dict[int, bytes]] = None,
+        latency: float = 0.005,
+        drop: float = 0.0,
+        patch_time: float = 0.02,
+        firmware_time: float = 0.1,
+        baud_rate: int = MIDI_BAUD_RATE,
+        seed: int = 0,
+    ) -> None:
+        """
+        Parameters:
+                name (str): port name
+                bank (dict): patches by program number, see 'load_bank',
+                             defaults to 'default_bank'
+                latency (float): seconds between receiving a dump request
+                                 and starting the reply
+                drop (float): probability of not answering a request
+                patch_time (float): seconds needed for storing a patch
+                firmware_time (float): seconds needed for processing a
+                                       firmware chunk
+                baud_rate (int): transmission rate in bits per second
+                seed (int): seed of the random generator for dropping
+                            replies, which makes runs repeatable
+        """
+        self.name = name
+        self.bank = default_bank() if bank is None else dict(bank)
+        self.latency = latency
+        self.drop = drop
+        self.patch_time = patch_time
+        self.firmware_time = firmware_time
+        self.baud_rate = baud_rate
+        self.random = random.Random(seed)
+        self.stats: Counter[str] = Counter()
+        self.condition = threading.Condition()
+        # replies by delivery time
+        self._outgoing: list[tuple[float, int, bytes]] = []
+        self._sequence = 0
+        # times at which the cable in each direction and the device are
+        # available again
+        self._receive_free = 0.0
+        self._send_free = 0.0
+        self._busy_until = 0.0
+
+    def receive(self, msg: bytes, now: Optional[float] = None) -> None:
+        """
+        This function passes a message sent by the host to the device.
+
+        Parameters:
+                msg (bytes): MIDI message including 0xf0 and 0xf7
+                now (float): time at which the host sent the message,
+                             defaults to time.monotonic()
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.condition:
+            start = max(now, self._receive_free)
+            arrival = start + wire_time(len(msg), self.baud_rate)
+            self._receive_free = arrival
+            # bytes arriving while the device is busy are lost
+            if start < self._busy_until:
+                self.stats["overruns"] += 1
+                return
+            self._process(msg, arrival)
+
+    def _process(self, msg: bytes, arrival: float) -> None:
+        if msg[: len(_DUMP_REQUEST)] == _DUMP_REQUEST and len(msg) > 5:
+            self.stats["requests"] += 1
+            reply = self.bank.get(msg[5])
+            if reply is None:
+                return
+            if self.drop and self.random.random() < self.drop:
+                self.stats["dropped"] += 1
+                return
+            self.transmit(reply, arrival + self.latency)
+            self.stats["replies"] += 1
+            return
+        kind = message_type(msg)
+        if kind == MESSAGE_TYPE_PATCH:
+            program = _program(msg)
+            if program is not None:
+                self.bank[program] = bytes(msg)
+            self.stats["patches"] += 1
+            self._busy_until = arrival + self.patch_time
+        elif kind == MESSAGE_TYPE_FIRMWARE:
+            self.stats["firmware"] += 1
+            self.stats["firmware_bytes"] += len(msg)
+            self._busy_until = arrival + self.firmware_time
+        else:
+            self.stats["ignored"] += 1
+
+    def transmit(self, msg: bytes, ready: Optional[float] = None) -> None:
+        """
+        This function sends a message from the device to the host, e.g. a
+        patch dump triggered on the device itself.
+
+        Parameters:
+                msg (bytes): MIDI message including 0xf0 and 0xf7
+                ready (float): time at which the device starts sending,
+                               defaults to time.monotonic()
+        """
+        if ready is None:
+            ready = time.monotonic()
+        with self.condition:
+            start = max(ready, self._send_free)
+            self._send_free = start + wire_time(len(msg), self.baud_rate)
+            self._sequence += 1
+            heapq.heappush(
+                self._outgoing, (self._send_free, self._sequence, msg)
+            )
+            self.condition.notify_all()
+
+    def pending(self, now: Optional[float] = None) -> list[bytes]:
+        """
+        This function removes all messages that have completely arrived at
+        the host.
+
+        Parameters:
+                now (float): current time, defaults to time.monotonic()
+        Returns:
+                A list of messages in the order of arrival.
+        """
+        if now is None:
+            now = time.monotonic()
+        messages = []
+        with self.condition:
+            while self._outgoing and self._outgoing[0][0] <= now:
+                messages.append(heapq.heappop(self._outgoing)[2])
+        return messages
+
+    def next_arrival(self) -> Optional[float]:
+        """
+        This function returns the arrival time of the next message sent to
+        the host, None if no message is being sent.
+        """
+        with self.condition:
+            return self._outgoing[0][0] if self._outgoing else None
+
+
+_devices: dict[str, Prophet600] = {}
+
+
+def parse_options(value: str) -> dict[str, str]:
+    """
+    This function parses the value of the environment variable
+    P600_EMULATOR, e.g. 'devices=2,latency=20'. Values without a key are
+    ignored, so e.g. '1' enables the emulator with the default options.
+
+    Parameters:
+            value (str): comma separated options
+    Returns:
+            A dictionary mapping option names to values.
+    """
+    options = {}
+    for item in value.split(","):
+        key, sep, option = item.partition("=")
+        if sep:
+            options[key.strip().lower()] = option.strip()
+    return options
+
+
+def configure(
+    devices: int = 1,
+    bank: Optional[str] = None,
+    fmt: str = "gligli",
+    latency: float = 0.005,
+    drop: float = 0.0,
+    patch_time: float = 0.02,
+    firmware_time: float = 0.1,
+    baud_rate: int = MIDI_BAUD_RATE,
+    seed: int = 0,
+) -> list[Prophet600]:
+    """
+    This function replaces all emulated devices.
+
+    Parameters:
+            devices (int): number of devices
+            bank (str): SysEx file containing the patches of all devices,
+                        defaults to 'default_bank'
+            fmt (str): format of the default bank
+            others: see Prophet600
+    Returns:
+            A list of the devices.
+    """
+    patches = load_bank(bank) if bank else default_bank(fmt)
+    _devices.clear()
+    for i in range(devices):
+        name = f"{PORT_PREFIX} {i + 1}"
+        _devices[name] = Prophet600(
+            name,
+            patches,
+            latency,
+            drop,
+            patch_time,
+            firmware_time,
+            baud_rate,
+            seed + i,
+        )
+    return list(_devices.values())
+
+
+def configure_from_environment() -> list[Prophet600]:
+    """
+    This function configures the emulated devices using the environment
+    variable P600_EMULATOR. Times are given in milliseconds, the options
+    are 'devices', 'bank', 'format', 'latency', 'drop', 'patch_time',
+    'firmware_time', 'baud' and 'seed'.
+
+    Returns:
+            A list of the devices.
+    """
+    options = parse_options(os.environ.get(ENVIRONMENT_VARIABLE, ""))
+    return configure(
+        devices=int(options.get("devices", 1)),
+        bank=options.get("bank"),
+        fmt=options.get("format", "gligli"),
+        latency=float(options.get("latency", 5)) / 1000.0,
+        drop=float(options.get("drop", 0)),
+        patch_time=float(options.get("patch_time", 20)) / 1000.0,
+        firmware_time=float(options.get("firmware_time", 100)) / 1000.0,
+        baud_rate=int(options.get("baud", MIDI_BAUD_RATE)),
+        seed=int(options.get("seed", 0)),
+    )
+
+
+def get_device(name: str) -> Prophet600:
+    """
+    This function returns an emulated device by port name.
+
+    Parameters:
+            name (str): port name
+    Returns:
+            The device.
+    """
+    if not _devices:
+        configure_from_environment()
+    try:
+        return _devices[name]
+    except KeyError:
+        raise MIDIError(f"Unknown emulated port {name!r}") from None
+
+
+def get_port_names() -> list[str]:
+    """
+    This function returns the port names of all emulated devices. Every
+    device has an input and an output port of the same name.
+    """
+    if not _devices:
+        configure_from_environment()
+    return list(_devices)
+
+
+def get_devices(**kwargs: Any) -> list[dict[str, Any]]:
+    """
+    This function lists the emulated ports for mido.
+    """
+    return [
+        {"name": name, "is_input": True, "is_output": True}
+        for name in get_port_names()
+    ]
+
+
+def _messages(data: Iterable[bytes]) -> list[Any]:
+    return [mido.Message.from_bytes(msg) for msg in data]
+
+
+class Input(BaseInput):  # type: ignore[misc]
+    """
+    This class is the mido input port of an emulated device. If a callback
+    is given, messages are passed to it from a separate thread.
+    """
+
+    name: Optional[str]
+
+    def _open(self, callback: Any = None, **kwargs: Any) -> None:
+        if not self.name:
+            self.name = get_port_names()[0]
+        self.device = get_device(self.name)
+        self.callback = callback
+        # 'closed' is only set by mido after opening the port
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if callback is not None:
+            self._thread = threading.Thread(target=self._deliver, daemon=True)
+            self._thread.start()
+
+    def _deliver(self) -> None:
+        device = self.device
+        while not self._stopped.is_set():
+            for msg in _messages(device.pending()):
+                self.callback(msg)
+            with device.condition:
+                arrival = device.next_arrival()
+                timeout = 0.1
+                if arrival is not None:
+                    timeout = min(timeout, arrival - time.monotonic())
+                if timeout > 0:
+                    device.condition.wait(timeout)
+
+    def _receive(self, block: bool = True) -> None:
+        self._messages.extend(_messages(self.device.pending()))
+
+    def _close(self) -> None:
+        self._stopped.set()
+        with self.device.condition:
+            self.device.condition.notify_all()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+
+class Output(BaseOutput):  # type: ignore[misc]
+    """
+    This class is the mido output port of an emulated device. Sending does
+    not block, the device receives the message after its transmission
+    time.
+    """
+
+    name: Optional[str]
+
+    def _open(self, **kwargs: Any) -> None:
+        if not self.name:
+            self.name = get_port_names()[0]
+        self.device = get_device(self.name)
+
+    def _send(self, msg: Any) -> None:
+        self.device.receive(bytes(msg.bytes()))
+
+    def send_bytes(self, msg: SysExMessage) -> None:
+        """
+        This function sends a raw MIDI message without creating a mido
+        message, see sender.raw_sender.
+
+        Parameters:
+                msg (bytes): MIDI message including 0xf0 and 0xf7
+        """
+        if self.closed:
+            raise ValueError("send() called on closed port")
+        # the same lock as mido's BaseOutput.send
+        with self._lock:
+            self.device.receive(bytes(msg))
@@ -0,0 +1,212 @@
+"""
+This module contains functions for splitting byte streams into MIDI SysEx
+messages.
+"""
+from collections.abc import Iterator
+import io
+import mmap
+import os
+import stat
+from typing import BinaryIO, Union
+
+SYSEX_START = b"\xf0"
+SYSEX_END = b"\xf7"
+
+# number of bytes read at once from streams that cannot be mapped
+CHUNK_SIZE = 1 << 16
+
+
+def _find_message(
+    buf: Union[bytes, bytearray, mmap.mmap], pos: int
+) -> tuple[int, int]:
+    """
+    This internal function finds the next complete SysEx message in a
+    buffer. Bytes outside of a message are skipped, and a message that is
+    interrupted by the start of another one is dropped.
+
+    Parameters:
+            buf (bytes): buffer containing raw MIDI data
+            pos (int): position in the buffer at which the search starts
+
+    Returns:
+            A tuple containing the positions of the start byte and of the
+            terminating byte of the message. If no complete message is found,
+            the terminating position is -1 and the start position is either
+            the position of an unterminated message or -1.
+    """
+    begin = buf.find(SYSEX_START, pos)
+    if begin < 0:
+        return (-1, -1)
+    end = buf.find(SYSEX_END, begin + 1)
+    if end < 0:
+        return (begin, -1)
+    # resync on the last start byte before the terminating byte
+    restart = buf.rfind(SYSEX_START, begin + 1, end)
+    if restart >= 0:
+        begin = restart
+    return (begin, end)
+
+
+def _is_mappable(fileobj: BinaryIO) -> bool:
+    try:
+        info = os.fstat(fileobj.fileno())
+    except (AttributeError, OSError, ValueError):
+        return False
+    return stat.S_ISREG(info.st_mode) and info.st_size > 0
+
+
+def _iter_mapped(
+    fileobj: BinaryIO, terminated: bool = False
+) -> Iterator[tuple[int, memoryview]]:
+    buf = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buf)
+    try:
+        pos = 0
+        while True:
+            begin, end = _find_message(buf, pos)
+            if end < 0:
+                break
+            pos = end + 1
+            yield (begin, view[begin : pos if terminated else end])
+    finally:
+        try:
+            view.release()
+            buf.close()
+        except BufferError:
+            # messages are still referenced by the caller, the mapping is
+            # closed once they are garbage collected
+            pass
+
+
+class SysExFramer:
+    """
+    This class splits a byte stream that arrives in chunks into MIDI SysEx
+    messages, e.g. data read from a pipe or received from a MIDI port. A
+    message may be split across several chunks, and messages are framed as
+    soon as their terminating byte arrives. The framing is the same as the
+    one of 'iter_sysex'.
+    """
+
+    def __init__(self, terminated: bool = False) -> None:
+        """
+        Parameters:
+                terminated (bool): include the terminating 0xf7 in the
+                                   messages
+        """
+        self.terminated = terminated
+        # unterminated message and its offset in the stream
+        self.pending = bytearray()
+        self.offset = 0
+
+    def feed_with_offsets(
+        self, data: Union[bytes, bytearray, memoryview]
+    ) -> list[tuple[int, memoryview]]:
+        """
+        This function appends data to the stream.
+
+        Parameters:
+                data (bytes): next chunk of the stream
+        Returns:
+                A list of tuples containing the byte offset of the start
+                byte and a memoryview of every message completed by the
+                chunk.
+        """
+        pending = self.pending
+        pending += data
+        messages = []
+        pos = 0
+        while True:
+            begin, end = _find_message(pending, pos)
+            if end < 0:
+                break
+            pos = end + 1
+            msg = bytes(pending[begin : pos if self.terminated else end])
+            messages.append((self.offset + begin, memoryview(msg)))
+        # keep an unterminated message, drop everything else
+        consumed = begin if begin >= 0 else len(pending)
+        del pending[:consumed]
+        self.offset += consumed
+        return messages
+
+    def feed(
+        self, data: Union[bytes, bytearray, memoryview]
+    ) -> list[memoryview]:
+        """
+        This function works like 'feed_with_offsets', but only returns the
+        messages.
+        """
+        return [msg for _, msg in self.feed_with_offsets(data)]
+
+
+def _iter_stream(
+    fileobj: BinaryIO, terminated: bool = False
+) -> Iterator[tuple[int, memoryview]]:
+    framer = SysExFramer(terminated)
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield from framer.feed_with_offsets(chunk)
+
+
+def iter_sysex_with_offsets(
+    fileobj: BinaryIO, terminated: bool = False
+) -> Iterator[tuple[int, memoryview]]:
+    """
+    This function works like 'iter_sysex', but additionally returns the
+    position of each message in the input.
+
+    Parameters:
+            fileobj (file): binary file object, e.g. an opened file or
+                            sys.stdin.buffer
+            terminated (bool): include the terminating 0xf7 in the messages
+
+    Returns:
+            An iterator yielding tuples containing the byte offset of the
+            start byte and a memoryview of the message.
+    """
+    if _is_mappable(fileobj):
+        return _iter_mapped(fileobj, terminated)
+    return _iter_stream(fileobj, terminated)
+
+
+def iter_sysex(fileobj: BinaryIO) -> Iterator[memoryview]:
+    """
+    This function splits the contents of a binary file object into MIDI
+    SysEx messages. The messages are framed incrementally, so the memory
+    consumption does not depend on the size of the input. Regular files are
+    memory-mapped instead of being read.
+
+    Bytes between messages are skipped, and messages that are interrupted by
+    the start of another message or by the end of the input are dropped.
+
+    Parameters:
+            fileobj (file): binary file object, e.g. an opened file or
+                            sys.stdin.buffer
+
+    Returns:
+            An iterator yielding memoryview objects of the messages, starting
+            with 0xf0 and excluding the terminating 0xf7.
+    """
+    return (msg for _, msg in iter_sysex_with_offsets(fileobj))
+
+
+def open_sysex_file(path: str) -> BinaryIO:
+    """
+    This function opens a SysEx file for 'iter_sysex'. Besides binary files,
+    files containing the messages as hexadecimal text are accepted, like
+    'mido.read_syx_file'. These are converted to binary in memory.
+
+    Parameters:
+            path (str): file name
+    Returns:
+            A binary file object.
+    """
+    fileobj = open(path, "rb")
+    first = fileobj.read(1)
+    fileobj.seek(0)
+    if not first or first == SYSEX_START:
+        return fileobj
+    with fileobj:
+        text = fileobj.read().decode("latin1")
+    return io.BytesIO(bytes.fromhex(" ".join(text.split())))
@@ -4,10 +4,32 @@ the GliGli mod for the Sequential Circuits Prophet-600 analog
 synthesizer.
 """
 
-from typing import Optional
+from array import array
+from collections.abc import Iterable, Sequence
+from typing import Literal, Optional, Union, overload
 
-from .sysex_parser import SysExParser
+from .sysex_parser import SysExMessage, SysExParser
 from .error import ParseError
+from .bytewise import make_table, or_bytes
+from .framing import SYSEX_END
+from .layout import ParameterLayout
+from .patch import Patch
+from .patch_bank import PatchBank, column_from_bytes, column_to_bytes
+
+
+def _high_bit_table(shift: int) -> bytes:
+    # translation table moving bit 'shift' of a byte to the MSB
+    return make_table(lambda byte: (byte >> shift & 1) << 7)
+
+
+def _bit_table(shift: int) -> bytes:
+    # translation table moving the MSB of a byte to bit 'shift'
+    return make_table(lambda byte: (byte >> 7) << shift)
+
+
+_HIGH_BITS = [_high_bit_table(shift) for shift in range(4)]
+_BITS = [_bit_table(shift) for shift in range(4)]
+_LOW_BITS = make_table(lambda byte: byte & 0x7F)
 
 
 class GliGliSysExParser(SysExParser):
@@ -22,6 +44,14 @@ class GliGliSysExParser(SysExParser):
         self.header = b"\xf0\x00\x61\x16\x01"
         self.format_id = b"\xa5\x16\x61\x00"
 
+    instrumented_methods = {
+        **SysExParser.instrumented_methods,
+        "unpack_bytes": "unpack",
+    }
+
+    # compiled parameter layouts by storage format version
+    _layouts: dict[int, ParameterLayout] = {}
+
     @classmethod
     def get_parameter_list(
         cls, format_version: int
@@ -37,7 +67,7 @@ class GliGliSysExParser(SysExParser):
                                    and length in bytes
         """
         # valid versions are: 1-8
-        if not format_version > 0 and format_version < 9:
+        if not 0 < format_version < 9:
             return None
 
         # version 1
@@ -70,9 +100,9 @@ class GliGliSysExParser(SysExParser):
             ("Osc A Saw", 1),
             ("Osc A Triangle", 1),
             ("Osc A Sqr", 1),
-            ("Osc A Saw", 1),
-            ("Osc A Triangle", 1),
-            ("Osc A Sqr", 1),
+            ("Osc B Saw", 1),
+            ("Osc B Triangle", 1),
+            ("Osc B Sqr", 1),
             ("Sync", 1),
             ("Poly Mod Osc A Destination", 1),
             ("Poly Mod Filter Destination", 1),
@@ -135,34 +165,33 @@ class GliGliSysExParser(SysExParser):
         return parameters
 
     @classmethod
-    def pop_and_format(
-        cls, parameter: tuple[str, int], data: list[int]
-    ) -> tuple[str, int]:
+    def get_layout(cls, format_version: int) -> Optional[ParameterLayout]:
         """
-        This internal function pops up to two bytes of data from a list and
-        converts it to the appropriate format for a given parameter.
+        This internal function returns the compiled parameter layout for a
+        storage format version. Layouts are created once and cached.
 
         Parameters:
-                parameter (tuple): A tuple containing the parameter name and
-                                   length in bytes.
-                data (list): A list of integers containing parameter data.
+                format_version (int): storage format version
         Returns:
-                A tuple containing the parameter name and value.
+                layout (ParameterLayout): compiled layout or None if the
+                                          version is not supported
         """
-        name, nbytes = parameter
-        try:
-            lsb, msb = (
-                data.pop(0) if len(data) else 0,
-                data.pop(0) if len(data) and nbytes == 2 else 0,
-            )
-        except:
-            print(f"Error while reading parameter {name}")
-            raise
-        value = msb << 8 | lsb
-        return (name, value)
+        layout = cls._layouts.get(format_version)
+        if layout is None:
+            parameter_list = cls.get_parameter_list(format_version)
+            if not parameter_list:
+                return None
+            layout = ParameterLayout(parameter_list)
+            cls._layouts[format_version] = layout
+        return layout
+
+    @staticmethod
+    def _end(msg: SysExMessage) -> int:
+        # messages are accepted with or without the terminating byte
+        return len(msg) - 1 if msg[-1:] == SYSEX_END else len(msg)
 
     @classmethod
-    def unpack(cls, data: bytes) -> list[int]:
+    def unpack(cls, data: SysExMessage) -> list[int]:
         """
         This internal function decodes five 7-bit bytes of raw data packed
         into four full 8-bit bytes.
@@ -175,14 +204,59 @@ class GliGliSysExParser(SysExParser):
                 A integer list of the unpacked data. The length will be a
                 multiple of 4.
         """
-        ret = []
-        while len(data):
-            for shift in range(4):
-                ret.append(data[shift] + 128 * (data[4] >> shift & 1))
-            data = data[5:]
-        return ret
+        return list(cls.unpack_bytes(data))
+
+    @classmethod
+    def unpack_bytes(cls, data: SysExMessage) -> bytes:
+        """
+        This internal function decodes five 7-bit bytes of raw data packed
+        into four full 8-bit bytes. In contrast to 'unpack', all groups of
+        five bytes are processed at once.
+
+        Parameters:
+                data (bytes): Raw 7-bit data. The length is required to be a
+                              multiple of five.
+        Returns:
+                A bytestring of the unpacked data. The length will be a
+                multiple of 4.
+        """
+        data = bytes(data)
+        if len(data) % 5:
+            raise ParseError(
+                f"Expected a multiple of 5 bytes of data, got {len(data)}"
+            )
+        ret = bytearray(len(data) // 5 * 4)
+        high = data[4::5]
+        for shift in range(4):
+            ret[shift::4] = or_bytes(
+                data[shift::5], high.translate(_HIGH_BITS[shift])
+            )
+        return bytes(ret)
 
-    def can_decode(self, msg: bytes) -> bool:
+    @classmethod
+    def pack_bytes(cls, data: bytes) -> bytes:
+        """
+        This internal function encodes four 8-bit bytes of data into five
+        7-bit bytes, see 'unpack_bytes'.
+
+        Parameters:
+                data (bytes): Unpacked data. If the length is not a multiple
+                              of four, the data is padded with zeros.
+        Returns:
+                A bytestring of the packed data. The length will be a
+                multiple of 5.
+        """
+        data = bytes(data)
+        data = data.ljust(-(-len(data) // 4) * 4, b"\0")
+        ret = bytearray(len(data) // 4 * 5)
+        high = bytes(len(data) // 4)
+        for shift in range(4):
+            ret[shift::5] = data[shift::4].translate(_LOW_BITS)
+            high = or_bytes(high, data[shift::4].translate(_BITS[shift]))
+        ret[4::5] = high
+        return bytes(ret)
+
+    def can_decode(self, msg: SysExMessage) -> bool:
         """
         This function checks if the parser can decode a given MIDI SysEx dump
         using the header of the data.
@@ -193,13 +267,25 @@ class GliGliSysExParser(SysExParser):
         Returns:
                 True if parser can decode dump, False otherwise.
         """
-        if msg.startswith(self.header):
+        if msg[: len(self.header)] == self.header:
             return True
         return False
 
+    @overload
     def decode(
-        self, msg: bytes
+        self, msg: SysExMessage, lazy: Literal[False] = False
     ) -> tuple[int, list[tuple[str, int]], list[int]]:
+        ...
+
+    @overload
+    def decode(
+        self, msg: SysExMessage, lazy: Literal[True]
+    ) -> tuple[int, Patch, list[int]]:
+        ...
+
+    def decode(
+        self, msg: SysExMessage, lazy: bool = False
+    ) -> tuple[int, Union[list[tuple[str, int]], Patch], list[int]]:
         """
         This function decodes a MIDI SysEx dump created using
         the original GliGli mod for the Sequential Circuits Prophet-600 analog
@@ -207,32 +293,212 @@ class GliGliSysExParser(SysExParser):
 
         Parameters:
                 msg (bytes): MIDI SysEx dump
+                lazy (bool): return the parameters as a Patch object
 
         Returns:
-                A tuple containing the program number, a list of parameters,
-                and (possibly) a list of remaining integer data that was not or
-                could not be decoded.
+                A tuple containing the program number, a list of parameters
+                or a Patch object, and (possibly) a list of remaining integer
+                data that was not or could not be decoded.
         """
-        if not msg.startswith(self.header):
+        if msg[: len(self.header)] != self.header:
             raise ParseError(
                 f"Header mismatch: expected {self.header!r},"
-                f"got {msg[:len(self.header)]!r}"
+                f"got {bytes(msg[:len(self.header)])!r}"
             )
-        data = self.unpack(msg[len(self.header) :])
-        program = data.pop(0)
-        format_id = bytes([data.pop(0) for _ in range(4)])
+        data = self.unpack_bytes(msg[len(self.header) : self._end(msg)])
+        format_id = data[1:5]
         if format_id != self.format_id:
             raise ParseError(
                 f"Storage format ID mismatch:"
                 f" expected {self.format_id!r}, got {format_id!r}"
             )
-        format_version = data.pop(0)
-        parameter_list = self.get_parameter_list(format_version)
-        if not parameter_list:
+        program = data[0]
+        format_version = data[5]
+        layout = self.get_layout(format_version)
+        if layout is None:
             raise ParseError(
                 f"Unable to create parameter list for storage format version {format_version}"
             )
-        parameters = []
-        for param in parameter_list:
-            parameters.append(self.pop_and_format(param, data))
-        return (program, parameters, data)
+        rest = list(data[6 + layout.size :])
+        if lazy:
+            return (program, Patch(program, layout, data, 6), rest)
+        parameters = list(zip(layout.names, layout.unpack_from(data, 6)))
+        return (program, parameters, rest)
+
+    def peek_program(self, msg: SysExMessage) -> int:
+        """
+        This function returns the program number of a MIDI SysEx dump
+        created using the GliGli mod by only unpacking the first bytes.
+
+        Parameter:
+                msg (bytes): MIDI SysEx dump
+
+        Returns:
+                The program number.
+        """
+        if msg[: len(self.header)] != self.header:
+            raise ParseError(
+                f"Header mismatch: expected {self.header!r},"
+                f" got {bytes(msg[:len(self.header)])!r}"
+            )
+        payload = msg[len(self.header) : len(self.header) + 5]
+        if len(payload) < 5:
+            raise ParseError("Message contains no program number")
+        return self.unpack_bytes(payload)[0]
+
+    def decode_many(self, msgs: Iterable[SysExMessage]) -> dict[int, PatchBank]:
+        """
+        This function decodes a batch of MIDI SysEx dumps created using
+        the GliGli mod for the Sequential Circuits Prophet-600 analog
+        synthesizer. The packed data of all messages is unpacked at once and
+        the parameters are stored column-wise.
+
+        Parameters:
+                msgs (iterable): MIDI SysEx dumps
+
+        Returns:
+                A dictionary mapping each storage format version found in the
+                batch to a PatchBank holding all patches of that version.
+        """
+        payloads = []
+        for index, msg in enumerate(msgs):
+            if msg[: len(self.header)] != self.header:
+                raise ParseError(
+                    f"Header mismatch in message {index}: expected"
+                    f" {self.header!r}, got {bytes(msg[:len(self.header)])!r}"
+                )
+            payload = msg[len(self.header) : self._end(msg)]
+            # a single invalid length would shift all following messages
+            if len(payload) % 5:
+                raise ParseError(
+                    f"Expected a multiple of 5 bytes of data in message"
+                    f" {index}, got {len(payload)}"
+                )
+            payloads.append(payload)
+        data = self.unpack_bytes(b"".join(payloads))
+
+        # collect the parameter bytes of all patches per format version
+        layouts: dict[int, ParameterLayout] = {}
+        groups: dict[int, tuple[list[int], list[int], list[bytes]]] = {}
+        offset = 0
+        for index, payload in enumerate(payloads):
+            record = data[offset : offset + len(payload) // 5 * 4]
+            offset += len(record)
+            if record[1:5] != self.format_id:
+                raise ParseError(
+                    f"Storage format ID mismatch in message {index}:"
+                    f" expected {self.format_id!r}, got {record[1:5]!r}"
+                )
+            format_version = record[5]
+            if format_version not in layouts:
+                layout = self.get_layout(format_version)
+                if layout is None:
+                    raise ParseError(
+                        f"Unable to create parameter list for storage format version {format_version}"
+                    )
+                layouts[format_version] = layout
+                groups[format_version] = ([], [], [])
+            size = layouts[format_version].size
+            indices, programs, records = groups[format_version]
+            indices.append(index)
+            programs.append(record[0])
+            # missing trailing data is treated as zero, see 'decode'
+            records.append(record[6 : 6 + size].ljust(size, b"\0"))
+
+        banks = {}
+        for format_version, (indices, programs, records) in groups.items():
+            layout = layouts[format_version]
+            buf = b"".join(records)
+            columns = [
+                column_from_bytes(
+                    buf[offset :: layout.size],
+                    buf[offset + 1 :: layout.size] if nbytes == 2 else None,
+                )
+                for offset, nbytes in zip(layout.offsets, layout.sizes)
+            ]
+            banks[format_version] = PatchBank(
+                layout.names,
+                array("B", programs),
+                columns,
+                format_version,
+                array("L", indices),
+            )
+        return banks
+
+    def encode(
+        self,
+        program: int,
+        parameters: Sequence[int],
+        format_version: int = 8,
+        data: Sequence[int] = (),
+    ) -> bytes:
+        """
+        This function encodes a patch as MIDI SysEx dump in the format of
+        the GliGli mod for the Sequential Circuits Prophet-600 analog
+        synthesizer. It is the inverse of 'decode'.
+
+        Parameters:
+                program (int): program number
+                parameters (sequence): parameter values in the order of the
+                                       storage format version
+                format_version (int): storage format version
+                data (sequence): additional data appended to the parameters,
+                                 e.g. the remaining data returned by 'decode'
+
+        Returns:
+                The MIDI SysEx dump including the terminating 0xf7.
+        """
+        layout = self.get_layout(format_version)
+        if layout is None:
+            raise ValueError(
+                f"Unsupported storage format version {format_version}"
+            )
+        body = bytes([program]) + self.format_id + bytes([format_version])
+        body += layout.pack(parameters) + bytes(data)
+        return self.header + self.pack_bytes(body) + SYSEX_END
+
+    def encode_many(self, bank: PatchBank) -> list[bytes]:
+        """
+        This function encodes a batch of patches as MIDI SysEx dumps in the
+        format of the GliGli mod. The parameter data of all patches is packed
+        at once. It is the inverse of 'decode_many'.
+
+        Parameters:
+                bank (PatchBank): patches and storage format version
+
+        Returns:
+                A list of MIDI SysEx dumps including the terminating 0xf7.
+        """
+        if bank.format_version is None:
+            raise ValueError("Patch bank has no storage format version")
+        layout = self.get_layout(bank.format_version)
+        if layout is None:
+            raise ValueError(
+                f"Unsupported storage format version {bank.format_version}"
+            )
+        if bank.names != layout.names:
+            raise ValueError(
+                f"Parameters do not match storage format version {bank.format_version}"
+            )
+        count = len(bank)
+        # unpacked size of a patch, padded to a multiple of four bytes
+        stride = -(-(6 + layout.size) // 4) * 4
+        data = bytearray(count * stride)
+        data[0::stride] = array("B", bank.programs).tobytes()
+        for i, byte in enumerate(self.format_id + bytes([bank.format_version])):
+            data[i + 1 :: stride] = bytes([byte]) * count
+        for name, column, offset, nbytes in zip(
+            layout.names, bank.columns, layout.offsets, layout.sizes
+        ):
+            lsb, msb = column_to_bytes(column)
+            if nbytes == 1 and any(msb):
+                raise ValueError(f"Value of parameter {name} out of range")
+            data[6 + offset :: stride] = lsb
+            if nbytes == 2:
+                data[7 + offset :: stride] = msb
+        packed = self.pack_bytes(bytes(data))
+        size = stride // 4 * 5
+        return [
+            self.header + packed[pos : pos + size] + SYSEX_END
+            for pos in range(0, len(packed), size)
+        ]
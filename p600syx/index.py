@@ -0,0 +1,267 @@
+"""
+This module contains a persistent index of the messages contained in a
+SysEx file. The index is stored in a sidecar file next to the SysEx file and
+records the byte offset, length, parser and program number of every
+message, so selected messages can be read without framing and decoding the
+whole file. The index is rebuilt automatically if the modification time or
+the size of the SysEx file changed.
+"""
+from array import array
+from collections.abc import Sequence
+import os
+import struct
+import sys
+from typing import BinaryIO, Optional
+
+from .error import ParseError
+from .framing import iter_sysex_with_offsets
+from .registry import factory
+
+# stored for messages without a suitable parser or with an unknown program
+UNKNOWN = -1
+
+
+class OffsetIndex:
+    """
+    This class contains the positions, parsers and program numbers of all
+    messages of a SysEx file, in message order.
+    """
+
+    SUFFIX = ".p600idx"
+    MAGIC = b"P600IDX\x01"
+
+    # magic, modification time in ns, file size, number of messages and
+    # length of the parser names
+    _HEADER = struct.Struct("<8sqqII")
+
+    def __init__(self, mtime_ns: int, size: int) -> None:
+        """
+        Parameters:
+                mtime_ns (int): modification time of the indexed file
+                size (int): size of the indexed file
+        """
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.parser_names: list[str] = []
+        self.offsets = array("q")
+        self.lengths = array("i")
+        # index into parser_names and program number per message
+        self.parsers = array("h")
+        self.programs = array("h")
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def is_current(self, info: os.stat_result) -> bool:
+        """
+        This function checks if the index matches a file.
+
+        Parameters:
+                info (os.stat_result): status of the indexed file
+        Returns:
+                False if the file was modified after building the index.
+        """
+        return info.st_mtime_ns == self.mtime_ns and info.st_size == self.size
+
+    @classmethod
+    def build(cls, fileobj: BinaryIO) -> "OffsetIndex":
+        """
+        This function indexes all messages of a file. Only the headers of
+        the messages are decoded for determining the program numbers.
+
+        Parameters:
+                fileobj (file): binary file object of a regular file
+        Returns:
+                The index.
+        """
+        info = os.fstat(fileobj.fileno())
+        index = cls(info.st_mtime_ns, info.st_size)
+        parser_ids: dict[str, int] = {}
+        for offset, msg in iter_sysex_with_offsets(fileobj):
+            parser = factory.get_parser(msg)
+            parser_id = program = UNKNOWN
+            if parser:
+                parser_id = parser_ids.get(parser.name, UNKNOWN)
+                if parser_id == UNKNOWN:
+                    parser_id = parser_ids[parser.name] = len(parser_ids)
+                    index.parser_names.append(parser.name)
+                try:
+                    program = parser.peek_program(msg)
+                except ParseError:
+                    pass
+            index.offsets.append(offset)
+            index.lengths.append(len(msg))
+            index.parsers.append(parser_id)
+            index.programs.append(program)
+        return index
+
+    def _columns(self) -> tuple["array[int]", ...]:
+        return (self.offsets, self.lengths, self.parsers, self.programs)
+
+    def to_bytes(self) -> bytes:
+        """
+        This function serializes the index.
+
+        Returns:
+                A bytestring, see 'from_bytes'.
+        """
+        names = "\0".join(self.parser_names).encode()
+        data = [
+            self._HEADER.pack(
+                self.MAGIC, self.mtime_ns, self.size, len(self), len(names)
+            ),
+            names,
+        ]
+        for column in self._columns():
+            # columns are stored as little-endian
+            if sys.byteorder == "big":
+                column = array(column.typecode, column)
+                column.byteswap()
+            data.append(column.tobytes())
+        return b"".join(data)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["OffsetIndex"]:
+        """
+        This function deserializes an index.
+
+        Parameters:
+                data (bytes): serialized index, see 'to_bytes'
+        Returns:
+                The index, or None if the data is not a valid index.
+        """
+        try:
+            return cls._from_bytes(data)
+        except (ValueError, struct.error):
+            # e.g. parser names that are not valid UTF-8
+            return None
+
+    @classmethod
+    def _from_bytes(cls, data: bytes) -> Optional["OffsetIndex"]:
+        if len(data) < cls._HEADER.size:
+            return None
+        magic, mtime_ns, size, count, length = cls._HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            return None
+        index = cls(mtime_ns, size)
+        pos = cls._HEADER.size
+        names = data[pos : pos + length].decode()
+        index.parser_names = names.split("\0") if names else []
+        pos += length
+        for column in index._columns():
+            end = pos + count * column.itemsize
+            if end > len(data):
+                return None
+            column.frombytes(data[pos:end])
+            if sys.byteorder == "big":
+                column.byteswap()
+            pos = end
+        # reject truncated, padded or inconsistent data
+        if pos != len(data):
+            return None
+        if count and (
+            min(index.offsets) < 0
+            or min(index.lengths) < 0
+            # messages are stored in file order
+            or index.offsets[-1] + index.lengths[-1] > size
+            or min(index.parsers) < UNKNOWN
+            or max(index.parsers) >= len(index.parser_names)
+        ):
+            return None
+        return index
+
+    def select(
+        self, message: int = -1, program: int = -1, parser: str = ""
+    ) -> list[int]:
+        """
+        This function returns the numbers of all messages that may match a
+        selection. Messages without a known program number, e.g. messages
+        without a suitable parser, match every program number.
+
+        Parameters:
+                message (int): select message number, -1 for all messages
+                program (int): select program number, -1 for all programs
+                parser (str): select parser name, empty for all parsers
+        Returns:
+                A list of message numbers in ascending order.
+        """
+        candidates: Sequence[int] = range(len(self))
+        if message > -1:
+            candidates = candidates[message : message + 1]
+        programs = self.programs
+        if program > -1:
+            candidates = [
+                i for i in candidates if programs[i] in (program, UNKNOWN)
+            ]
+        if parser:
+            if parser not in self.parser_names:
+                return []
+            parser_id = self.parser_names.index(parser)
+            parsers = self.parsers
+            candidates = [i for i in candidates if parsers[i] == parser_id]
+        return list(candidates)
+
+    def read(self, fileobj: BinaryIO, message: int) -> bytes:
+        """
+        This function reads a single message.
+
+        Parameters:
+                fileobj (file): binary file object of the indexed file
+                message (int): message number
+        Returns:
+                The message starting with 0xf0 and excluding the terminating
+                0xf7, like 'iter_sysex'.
+        """
+        fileobj.seek(self.offsets[message])
+        return fileobj.read(self.lengths[message])
+
+
+def sidecar_path(path: str) -> str:
+    """
+    This function returns the name of the index file of a SysEx file.
+
+    Parameters:
+            path (str): SysEx file name
+    Returns:
+            The file name.
+    """
+    return path + OffsetIndex.SUFFIX
+
+
+def open_index(path: str, fileobj: BinaryIO, save: bool = True) -> OffsetIndex:
+    """
+    This function loads the index of a SysEx file, or builds it if it does
+    not exist or is outdated.
+
+    Parameters:
+            path (str): SysEx file name
+            fileobj (file): binary file object of the SysEx file
+            save (bool): store a rebuilt index in the sidecar file. Errors
+                         while writing it, e.g. in read-only directories,
+                         are ignored.
+    Returns:
+            The index.
+    """
+    info = os.fstat(fileobj.fileno())
+    index_path = sidecar_path(path)
+    try:
+        with open(index_path, "rb") as f:
+            index = OffsetIndex.from_bytes(f.read())
+        if index is not None and index.is_current(info):
+            return index
+    except OSError:
+        pass
+    index = OffsetIndex.build(fileobj)
+    if save:
+        # write atomically, other processes may read the index concurrently
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(index.to_bytes())
+            os.replace(tmp_path, index_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return index
@@ -0,0 +1,237 @@
+"""
+This module contains the compiled representations of parameter layouts,
+i.e. fixed sequences of little-endian parameters of one or two bytes, or
+of bitfields of arbitrary width.
+"""
+from array import array
+import struct
+from collections.abc import Sequence
+from typing import Union
+
+from .bytewise import make_table, or_bytes
+from .patch_bank import column_from_bytes
+
+
+class ParameterLayout:
+    """
+    This class holds the precomputed names, byte offsets and struct format
+    of a parameter layout.
+    """
+
+    def __init__(self, parameters: list[tuple[str, int]]) -> None:
+        """
+        Parameters:
+                parameters (list): list of tuples containing the parameter
+                                   name and length in bytes
+        """
+        self.names = tuple(name for name, _ in parameters)
+        # parameter index by name, the last one wins for duplicate names
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.sizes = tuple(nbytes for _, nbytes in parameters)
+        # largest value of every parameter
+        self.maxima = tuple((1 << 8 * nbytes) - 1 for nbytes in self.sizes)
+        offsets = []
+        offset = 0
+        for nbytes in self.sizes:
+            if nbytes not in (1, 2):
+                raise ValueError(f"Unsupported parameter length {nbytes}")
+            offsets.append(offset)
+            offset += nbytes
+        self.offsets = tuple(offsets)
+        self.struct = struct.Struct(
+            "<" + "".join("B" if nbytes == 1 else "H" for nbytes in self.sizes)
+        )
+        self.size = self.struct.size
+        self._fields = tuple(
+            struct.Struct("<B" if nbytes == 1 else "<H")
+            for nbytes in self.sizes
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def unpack_from(
+        self, buffer: Union[bytes, memoryview], offset: int = 0
+    ) -> tuple[int, ...]:
+        """
+        This function decodes all parameter values from a buffer. Missing
+        data at the end of the buffer is treated as zero.
+
+        Parameters:
+                buffer (bytes): unpacked parameter data
+                offset (int): position of the first parameter in the buffer
+        Returns:
+                A tuple of integers in parameter order.
+        """
+        if len(buffer) - offset < self.size:
+            buffer = bytes(buffer[offset:]).ljust(self.size, b"\0")
+            offset = 0
+        return self.struct.unpack_from(buffer, offset)
+
+    def value(
+        self, buffer: Union[bytes, memoryview], index: int, offset: int = 0
+    ) -> int:
+        """
+        This function decodes a single parameter value from a buffer
+        containing at least 'size' bytes after the offset.
+
+        Parameters:
+                buffer (bytes): unpacked parameter data
+                index (int): parameter index
+                offset (int): position of the first parameter in the buffer
+        Returns:
+                The parameter value.
+        """
+        field = self._fields[index]
+        return int(field.unpack_from(buffer, offset + self.offsets[index])[0])
+
+    def pack(self, values: Sequence[int]) -> bytes:
+        """
+        This function encodes all parameter values.
+
+        Parameters:
+                values (sequence): integers in parameter order
+        Returns:
+                A bytestring of length 'size'.
+        """
+        if len(values) != len(self.names):
+            raise ValueError(
+                f"Expected {len(self.names)} values, got {len(values)}"
+            )
+        try:
+            return self.struct.pack(*values)
+        except struct.error as e:
+            raise ValueError(f"Unable to encode parameters: {e}") from e
+
+
+class BitfieldLayout:
+    """
+    This class holds the precomputed names, bit offsets and masks of a
+    layout of bitfields packed LS bit first without gaps, i.e. each
+    parameter starts at the bit following the last bit of its predecessor.
+    """
+
+    def __init__(self, parameters: list[tuple[str, int]]) -> None:
+        """
+        Parameters:
+                parameters (list): list of tuples containing the parameter
+                                   name and width in bits
+        """
+        self.names = tuple(name for name, _ in parameters)
+        # parameter index by name, the last one wins for duplicate names
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.widths = tuple(bits for _, bits in parameters)
+        self.masks = tuple((1 << bits) - 1 for bits in self.widths)
+        # largest value of every parameter
+        self.maxima = self.masks
+        offsets = []
+        offset = 0
+        for bits in self.widths:
+            offsets.append(offset)
+            offset += bits
+        # bit offset of every parameter
+        self.offsets = tuple(offsets)
+        # first and last byte containing a parameter and the shift of its LS
+        # bit within the first byte
+        self.first_bytes = tuple(offset // 8 for offset in self.offsets)
+        self.end_bytes = tuple(
+            (offset + bits + 7) // 8
+            for offset, bits in zip(self.offsets, self.widths)
+        )
+        self.shifts = tuple(offset % 8 for offset in self.offsets)
+        self.size = (offset + 7) // 8
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def unpack_from(
+        self, buffer: Union[bytes, memoryview], offset: int = 0
+    ) -> tuple[int, ...]:
+        """
+        This function decodes all parameter values from a buffer. Missing
+        data at the end of the buffer is treated as zero.
+
+        Parameters:
+                buffer (bytes): packed parameter data
+                offset (int): position of the first byte in the buffer
+        Returns:
+                A tuple of integers in parameter order.
+        """
+        bits = int.from_bytes(buffer[offset : offset + self.size], "little")
+        return tuple(
+            bits >> shift & mask
+            for shift, mask in zip(self.offsets, self.masks)
+        )
+
+    def value(
+        self, buffer: Union[bytes, memoryview], index: int, offset: int = 0
+    ) -> int:
+        """
+        This function decodes a single parameter value from a buffer
+        containing at least 'size' bytes after the offset.
+
+        Parameters:
+                buffer (bytes): packed parameter data
+                index (int): parameter index
+                offset (int): position of the first byte in the buffer
+        Returns:
+                The parameter value.
+        """
+        bits = int.from_bytes(
+            buffer[
+                offset
+                + self.first_bytes[index] : offset
+                + self.end_bytes[index]
+            ],
+            "little",
+        )
+        return bits >> self.shifts[index] & self.masks[index]
+
+    def unpack_columns(self, buffer: bytes) -> list["array[int]"]:
+        """
+        This function decodes the parameter values of a batch of records
+        stored back to back, i.e. a N x 'size' byte matrix. Every value is
+        composed from shifted and masked byte columns of the matrix, i.e.
+        without iterating over the records in Python.
+
+        Parameters:
+                buffer (bytes): packed parameter data of N records
+        Returns:
+                A list containing one integer array of length N per
+                parameter.
+        """
+        if len(buffer) % self.size:
+            raise ValueError(
+                f"Expected a multiple of {self.size} bytes, got {len(buffer)}"
+            )
+        if any(mask > 0xFFFF for mask in self.masks):
+            raise ValueError("Parameters wider than 16 bits are not supported")
+        rows = [buffer[i :: self.size] for i in range(self.size)]
+        columns = []
+        for first, end, shift, mask in zip(
+            self.first_bytes, self.end_bytes, self.shifts, self.masks
+        ):
+            # byte k of a value is composed of the upper bits of source byte
+            # first + k and the lower bits of the following byte
+            result = []
+            for k in range(2 if mask > 0xFF else 1):
+                part_mask = mask >> 8 * k & 0xFF
+                part = rows[first + k].translate(
+                    make_table(lambda byte: (byte >> shift) & part_mask)
+                )
+                if shift and first + k + 1 < end:
+                    part = or_bytes(
+                        part,
+                        rows[first + k + 1].translate(
+                            make_table(
+                                lambda byte: (byte << 8 - shift) & part_mask
+                            )
+                        ),
+                    )
+                result.append(part)
+            columns.append(
+                column_from_bytes(
+                    result[0], result[1] if len(result) > 1 else None
+                )
+            )
+        return columns
@@ -0,0 +1,313 @@
+"""
+This module contains a persistent library of decoded patches backed by
+SQLite. Every patch is stored as one row containing its source, program
+number, name and one indexed integer column per parameter, so patches can
+be searched without decoding the original files again.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+from typing import Any, Optional
+
+from .error import ParseError
+from .framing import iter_sysex_with_offsets
+from .output import unique_names
+from .patch import patch_name
+from .registry import SysExParserFactory, factory as default_factory
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parameters (
+    name TEXT PRIMARY KEY,
+    column_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS patches (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    message INTEGER NOT NULL,
+    byte_offset INTEGER NOT NULL,
+    parser TEXT NOT NULL,
+    program INTEGER NOT NULL,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS patches_file_id ON patches(file_id);
+CREATE INDEX IF NOT EXISTS patches_program ON patches(program);
+CREATE INDEX IF NOT EXISTS patches_name ON patches(name);
+"""
+
+# columns of the patches table that are not parameters
+RESERVED_COLUMNS = {
+    "id",
+    "file_id",
+    "message",
+    "byte_offset",
+    "parser",
+    "program",
+    "name",
+    "path",
+}
+
+
+def column_name(name: str) -> str:
+    """
+    This function converts a parameter name to a column name, e.g.
+    'Filter Envelope Amount' to 'filter_envelope_amount'. The maximum
+    value appended to the names of the original format is dropped.
+
+    Parameters:
+            name (str): parameter name as returned by the parsers
+    Returns:
+            A string usable as SQL identifier.
+    """
+    name = re.sub(r"\s*\(max: \d+\)$", "", name)
+    column = re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+    if not column or column[0].isdigit() or column in RESERVED_COLUMNS:
+        column = f"p_{column}"
+    return column
+
+
+def file_hash(path: str) -> str:
+    """
+    This function computes the SHA-256 digest of a file.
+
+    Parameters:
+            path (str): file name
+    Returns:
+            The digest as hexadecimal string.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PatchLibrary:
+    """
+    This class implements a persistent, queryable library of decoded
+    patches. Files are ingested incrementally, i.e. files whose modification
+    time and contents did not change since the last ingestion are skipped.
+    """
+
+    def __init__(
+        self, path: str, factory: Optional[SysExParserFactory] = None
+    ) -> None:
+        """
+        Parameters:
+                path (str): SQLite database file, created if missing
+                factory (SysExParserFactory): parser factory used for
+                                              decoding, defaults to the
+                                              global factory
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        self.factory = factory or default_factory
+        self.columns: dict[str, str] = {}
+        self._statements: dict[tuple[str, ...], str] = {}
+        self._load_columns()
+
+    def __enter__(self) -> "PatchLibrary":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        This function closes the underlying database connection.
+        """
+        self.connection.close()
+
+    def _load_columns(self) -> None:
+        """
+        This internal function reads the parameter columns from the
+        database, e.g. after columns added by a failed ingestion were rolled
+        back.
+        """
+        self.columns = dict(
+            self.connection.execute(
+                "SELECT name, column_name FROM parameters"
+            ).fetchall()
+        )
+        self._statements = {}
+
+    def _add_columns(self, names: tuple[str, ...]) -> None:
+        """
+        This internal function adds an indexed column for each new
+        parameter name.
+        """
+        used = {self.columns[name] for name in names if name in self.columns}
+        for name in names:
+            if name in self.columns:
+                continue
+            column = base = column_name(name)
+            suffix = 1
+            while column in used:
+                suffix += 1
+                column = f"{base}_{suffix}"
+            if column not in self.columns.values():
+                self.connection.execute(
+                    f'ALTER TABLE patches ADD COLUMN "{column}" INTEGER'
+                )
+                self.connection.execute(
+                    f'CREATE INDEX "patches_{column}" ON patches("{column}")'
+                )
+            self.connection.execute(
+                "INSERT INTO parameters VALUES (?, ?)", (name, column)
+            )
+            self.columns[name] = column
+            used.add(column)
+
+    def _insert_statement(self, names: tuple[str, ...]) -> str:
+        """
+        This internal function returns the INSERT statement for patches with
+        the given parameter names.
+        """
+        statement = self._statements.get(names)
+        if statement is None:
+            # repeated names, e.g. '(unused)', need separate columns
+            unique = unique_names(names)
+            self._add_columns(unique)
+            columns = [
+                "file_id",
+                "message",
+                "byte_offset",
+                "parser",
+                "program",
+                "name",
+            ]
+            columns += [self.columns[name] for name in unique]
+            statement = (
+                "INSERT INTO patches ("
+                + ", ".join(f'"{column}"' for column in columns)
+                + ") VALUES ("
+                + ", ".join("?" for _ in columns)
+                + ")"
+            )
+            self._statements[names] = statement
+        return statement
+
+    def ingest(self, path: str) -> Optional[int]:
+        """
+        This function decodes all patches contained in a file and stores
+        them in the library, replacing patches previously read from the same
+        file.
+
+        Parameters:
+                path (str): SysEx file name
+        Returns:
+                The number of stored patches, or None if the file did not
+                change since it was last ingested.
+        """
+        path = os.path.abspath(path)
+        info = os.stat(path)
+        row = self.connection.execute(
+            "SELECT id, mtime, size, hash FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if (
+            row
+            and row["mtime"] == info.st_mtime
+            and row["size"] == info.st_size
+        ):
+            return None
+        digest = file_hash(path)
+        try:
+            return self._ingest(path, info, row, digest)
+        except BaseException:
+            # columns added in the failed transaction were rolled back
+            self._load_columns()
+            raise
+
+    def _ingest(
+        self,
+        path: str,
+        info: os.stat_result,
+        row: Optional[sqlite3.Row],
+        digest: str,
+    ) -> Optional[int]:
+        with self.connection:
+            if row and row["hash"] == digest:
+                self.connection.execute(
+                    "UPDATE files SET mtime = ?, size = ? WHERE id = ?",
+                    (info.st_mtime, info.st_size, row["id"]),
+                )
+                return None
+            if row:
+                file_id = row["id"]
+                self.connection.execute(
+                    "DELETE FROM patches WHERE file_id = ?", (file_id,)
+                )
+                self.connection.execute(
+                    "UPDATE files SET mtime = ?, size = ?, hash = ?"
+                    " WHERE id = ?",
+                    (info.st_mtime, info.st_size, digest, file_id),
+                )
+            else:
+                file_id = self.connection.execute(
+                    "INSERT INTO files (path, mtime, size, hash)"
+                    " VALUES (?, ?, ?, ?)",
+                    (path, info.st_mtime, info.st_size, digest),
+                ).lastrowid
+            count = 0
+            with open(path, "rb") as f:
+                for i, (offset, msg) in enumerate(iter_sysex_with_offsets(f)):
+                    parser = self.factory.get_parser(msg)
+                    if not parser:
+                        continue
+                    try:
+                        program, parameters, _ = parser.decode(msg)
+                    except ParseError:
+                        continue
+                    names = tuple(name for name, _ in parameters)
+                    values = [
+                        file_id,
+                        i,
+                        offset,
+                        parser.name,
+                        program,
+                        patch_name(parameters),
+                    ]
+                    values += [value for _, value in parameters]
+                    self.connection.execute(
+                        self._insert_statement(names), values
+                    )
+                    count += 1
+        return count
+
+    def query(
+        self,
+        where: str = "",
+        args: tuple[Any, ...] = (),
+        limit: Optional[int] = None,
+    ) -> list[sqlite3.Row]:
+        """
+        This function returns all patches matching an SQL expression, e.g.
+        'cutoff > 200 AND unison = 1' or "name LIKE 'bass%'". See the
+        attribute 'columns' for the column names of all parameters.
+
+        Parameters:
+                where (str): SQL expression, empty for all patches
+                args (tuple): values for placeholders in the expression
+                limit (int): maximum number of returned patches
+        Returns:
+                A list of rows containing the source file name ('path') and
+                all columns of the matching patches.
+        """
+        statement = (
+            "SELECT files.path AS path, patches.* FROM patches"
+            " JOIN files ON files.id = patches.file_id"
+        )
+        if where:
+            statement += f" WHERE {where}"
+        statement += " ORDER BY files.path, patches.message"
+        if limit is not None:
+            statement += f" LIMIT {int(limit)}"
+        return self.connection.execute(statement, args).fetchall()
@@ -0,0 +1,398 @@
+"""
+This module contains the output formats of p600_decode. All writers format
+one record per patch and write to a binary stream through a single buffer.
+"""
+from abc import ABCMeta, abstractmethod
+from array import array
+from collections.abc import Iterable
+import csv
+import io
+import json
+import sys
+from typing import BinaryIO, Optional, TextIO
+
+from .patch import Patch
+from .stats import Stats
+
+
+def format_patch(program: int, parameters: Iterable[tuple[str, int]]) -> str:
+    """
+    This function formats a decoded patch as human readable text.
+
+    Parameters:
+            program (int): program number
+            parameters (iterable): tuples containing the parameter name and
+                                   value
+    Returns:
+            A string containing one line per parameter.
+    """
+    lines = ["", f'{"Program number":30}: {program:5}']
+    for name, value in parameters:
+        if name.startswith("Patch Name") and value > 0:
+            lines.append(f"{name:30}: {value:5} {repr(chr(value))}")
+        else:
+            lines.append(f"{name:30}: {value:5}")
+    return "\n".join(lines) + "\n"
+
+
+def unique_names(names: tuple[str, ...]) -> tuple[str, ...]:
+    """
+    This function makes parameter names usable as column names by
+    appending a counter to repeated names, e.g. '(unused) 2'.
+
+    Parameters:
+            names (tuple): parameter names
+    Returns:
+            A tuple of unique names.
+    """
+    seen: dict[str, int] = {}
+    result = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        result.append(name if seen[name] == 1 else f"{name} {seen[name]}")
+    return tuple(result)
+
+
+class PatchWriter(metaclass=ABCMeta):
+    """
+    This class is the base for all output formats. Subclasses implement
+    'write_patch' and optionally 'write_header', which is called once for
+    the parameter layout of the first patch.
+    """
+
+    # formats with one column per parameter require the same parameter
+    # layout for all patches
+    uniform = False
+
+    # methods recorded by instrument, mapped to their pipeline stage
+    instrumented_methods = {"write_patch": "format"}
+
+    def __init__(self, out: BinaryIO, header: bool = True) -> None:
+        """
+        Parameters:
+                out (file): binary output stream
+                header (bool): write the header, disable for partial
+                               outputs that are combined using 'write_raw'
+        """
+        self.out = out
+        self.header = header
+        self.text = io.TextIOWrapper(
+            out, encoding="utf-8", newline="", write_through=False
+        )
+        self.names: Optional[tuple[str, ...]] = None
+        self.columns: tuple[str, ...] = ()
+
+    def __enter__(self) -> "PatchWriter":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def _check_layout(self, names: tuple[str, ...]) -> None:
+        if self.names is None:
+            self.names = names
+            self.columns = unique_names(names)
+            if self.header:
+                self.write_header()
+        elif names != self.names:
+            if self.uniform:
+                raise ValueError(
+                    "Patches with different parameter layouts cannot be"
+                    " written to the same file in this format"
+                )
+            self.names = names
+            self.columns = unique_names(names)
+
+    def instrument(self, stats: Stats) -> None:
+        """
+        This function records all calls of the methods listed in
+        'instrumented_methods' in a statistics object until uninstrument is
+        called.
+
+        Parameters:
+                stats (Stats): statistics object
+        """
+        self.uninstrument()
+        name = type(self).__name__
+        for method, stage in self.instrumented_methods.items():
+            setattr(
+                self, method, stats.timed(getattr(self, method), name, stage)
+            )
+
+    def uninstrument(self) -> None:
+        """
+        This function stops recording the calls of this writer.
+        """
+        for method in self.instrumented_methods:
+            self.__dict__.pop(method, None)
+
+    def write(
+        self, source: str, message: int, parser: str, patch: Patch
+    ) -> None:
+        """
+        This function writes a decoded patch.
+
+        Parameters:
+                source (str): input file name
+                message (int): message number within the input
+                parser (str): name of the parser that decoded the patch
+                patch (Patch): decoded patch
+        """
+        names = patch.keys()
+        if names is not self.names:
+            self._check_layout(names)
+        self.write_patch(source, message, parser, patch)
+
+    def write_header(self) -> None:
+        """
+        This function writes the header derived from the parameter layout in
+        'names' and 'columns'.
+        """
+
+    @abstractmethod
+    def write_patch(
+        self, source: str, message: int, parser: str, patch: Patch
+    ) -> None:
+        """
+        This function formats and writes a decoded patch.
+
+        Parameters:
+                see 'write'
+        """
+
+    def write_raw(self, data: bytes, names: Optional[tuple[str, ...]]) -> None:
+        """
+        This function appends the output of another writer of the same
+        format that was created without header.
+
+        Parameters:
+                data (bytes): output of the other writer
+                names (tuple): parameter names of the other writer, None if
+                               it did not write any patches
+        """
+        if names is not None:
+            self._check_layout(names)
+        self.text.flush()
+        self.out.write(data)
+
+    def note(self, text: str, err: TextIO = sys.stderr) -> None:
+        """
+        This function reports a message that could not be decoded. Formats
+        that cannot represent it print it to an error stream.
+
+        Parameters:
+                text (str): message
+                err (file): error stream
+        """
+        print(text, file=err)
+
+    def flush(self) -> None:
+        """
+        This function writes all buffered output to the underlying stream,
+        e.g. after every patch when decoding live input.
+        """
+        self.text.flush()
+        self.out.flush()
+
+    def close(self) -> None:
+        """
+        This function flushes all buffered output. The underlying stream is
+        not closed.
+        """
+        self.text.flush()
+        self.text.detach()
+
+
+class TextWriter(PatchWriter):
+    """
+    This class writes patches as human readable text with one line per
+    parameter.
+    """
+
+    def __init__(self, out: BinaryIO, header: bool = True) -> None:
+        super().__init__(out, header)
+        self.template_names: Optional[tuple[str, ...]] = None
+        self.template = ""
+        self.name_fields: list[int] = []
+
+    def _compile(self, names: tuple[str, ...]) -> None:
+        # format string equivalent to 'format_patch' for a parameter layout
+        lines = ["", f'{"Program number":30}: {{:5}}']
+        self.name_fields = []
+        for i, name in enumerate(names):
+            escaped = f"{name:30}: ".replace("{", "{{").replace("}", "}}")
+            if name.startswith("Patch Name"):
+                self.name_fields.append(i)
+                lines.append(escaped + "{}")
+            else:
+                lines.append(escaped + "{:5}")
+        self.template = "\n".join(lines) + "\n"
+        self.template_names = names
+
+    def write_patch(
+        self, source: str, message: int, parser: str, patch: Patch
+    ) -> None:
+        if patch.keys() is not self.template_names:
+            self._compile(patch.keys())
+        parameters = patch.values()
+        values: list[object] = list(parameters)
+        for i in self.name_fields:
+            value = parameters[i]
+            if value > 0:
+                values[i] = f"{value:5} {repr(chr(value))}"
+            else:
+                values[i] = f"{value:5}"
+        self.text.write(self.template.format(patch.program, *values))
+
+    def note(self, text: str, err: TextIO = sys.stderr) -> None:
+        self.text.write(text + "\n")
+
+
+class JsonlWriter(PatchWriter):
+    """
+    This class writes one JSON object per line and patch.
+    """
+
+    def write_patch(
+        self, source: str, message: int, parser: str, patch: Patch
+    ) -> None:
+        record = {
+            "file": source,
+            "message": message,
+            "parser": parser,
+            "program": patch.program,
+            "parameters": dict(zip(self.columns, patch.values())),
+        }
+        self.text.write(json.dumps(record) + "\n")
+
+
+class CsvWriter(PatchWriter):
+    """
+    This class writes one CSV row per patch after a header row containing
+    the column names.
+    """
+
+    uniform = True
+
+    def __init__(self, out: BinaryIO, header: bool = True) -> None:
+        super().__init__(out, header)
+        self.writer = csv.writer(self.text, lineterminator="\n")
+
+    def write_header(self) -> None:
+        self.writer.writerow(
+            ("file", "message", "parser", "program") + self.columns
+        )
+
+    def write_patch(
+        self, source: str, message: int, parser: str, patch: Patch
+    ) -> None:
+        self.writer.writerow(
+            (source, message, parser, patch.program) + patch.values()
+        )
+
+
+class NpyWriter(PatchWriter):
+    """
+    This class writes a N x (P + 1) matrix of unsigned 16 bit integers in
+    NumPy's .npy format, i.e. one row per patch containing the program
+    number followed by the P parameter values. The output can be loaded
+    using numpy.load. As the number of rows is part of the file header,
+    the rows are streamed after a placeholder header that is rewritten when
+    the writer is closed. Outputs that are not seekable, e.g. pipes, are
+    buffered and written when the writer is closed.
+    """
+
+    uniform = True
+
+    # little-endian 16 bit unsigned integers
+    DTYPE = "<u2"
+
+    # space reserved in the header for the number of rows
+    ROW_DIGITS = 21
+
+    # number of values collected before writing them to the output
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, out: BinaryIO, header: bool = True) -> None:
+        super().__init__(out, header)
+        self.rows = array("H")
+        self.raw = bytearray()
+        self.buffered = header and not out.seekable()
+        self.size = 0
+        # output position of a streamed header
+        self.start: Optional[int] = None
+
+    def _header(self, height: int) -> bytes:
+        width = len(self.names) + 1 if self.names is not None else 0
+        header = (
+            f"{{'descr': '{self.DTYPE}', 'fortran_order': False,"
+            f" 'shape': ({height}, {width}), }}"
+        )
+        # the header including magic string, version and length field is
+        # padded to a multiple of 64 bytes and ends with a newline, leaving
+        # room for the final number of rows
+        padding = self.ROW_DIGITS - len(str(height))
+        header += " " * (padding + -(len(header) + padding + 11) % 64) + "\n"
+        return (
+            b"\x93NUMPY\x01\x00"
+            + len(header).to_bytes(2, "little")
+            + header.encode("latin1")
+        )
+
+    def write_header(self) -> None:
+        if not self.buffered:
+            self.start = self.out.tell()
+            self.out.write(self._header(0))
+
+    def write_patch(
+        self, source: str, message: int, parser: str, patch: Patch
+    ) -> None:
+        self.rows.append(patch.program)
+        self.rows.extend(patch.values())
+        if len(self.rows) >= self.CHUNK_SIZE:
+            self._flush_rows()
+
+    def write_raw(self, data: bytes, names: Optional[tuple[str, ...]]) -> None:
+        if names is not None:
+            self._check_layout(names)
+        self._flush_rows()
+        self._write_data(data)
+
+    def _flush_rows(self) -> None:
+        if sys.byteorder == "big":
+            self.rows.byteswap()
+        self._write_data(self.rows.tobytes())
+        self.rows = array("H")
+
+    def _write_data(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.buffered:
+            self.raw += data
+        else:
+            self.out.write(data)
+
+    def close(self) -> None:
+        self._flush_rows()
+        if self.header:
+            width = len(self.names) + 1 if self.names is not None else 0
+            height = self.size // (2 * width) if width else 0
+            if self.start is None:
+                # buffered output, or no patches were written
+                self.out.write(self._header(height))
+                self.out.write(self.raw)
+                self.raw = bytearray()
+            else:
+                end = self.out.tell()
+                self.out.seek(self.start)
+                self.out.write(self._header(height))
+                self.out.seek(end)
+        super().close()
+
+
+WRITERS: dict[str, type[PatchWriter]] = {
+    "text": TextWriter,
+    "jsonl": JsonlWriter,
+    "csv": CsvWriter,
+    "npy": NpyWriter,
+}
+FORMATS = list(WRITERS)
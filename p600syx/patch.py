@@ -0,0 +1,189 @@
+"""
+This module contains a compact view of a single decoded patch.
+"""
+from collections.abc import Iterable, Iterator
+from typing import Optional, Union
+
+from .layout import BitfieldLayout, ParameterLayout
+
+PATCH_NAME_PREFIX = "Patch Name"
+
+
+def patch_name(parameters: Iterable[tuple[str, int]]) -> Optional[str]:
+    """
+    This function composes the patch name from its single characters, if
+    the format supports patch names.
+
+    Parameters:
+            parameters (iterable): tuples containing the parameter name and
+                                   value, e.g. a Patch object
+    Returns:
+            The patch name or None.
+    """
+    chars = [
+        value
+        for name, value in parameters
+        if name.startswith(PATCH_NAME_PREFIX)
+    ]
+    if not chars:
+        return None
+    return "".join(chr(value) for value in chars if value > 0).strip()
+
+
+class Patch:
+    """
+    This class wraps the unpacked data of a patch and the parameter layout
+    of its format, which is shared by all patches of the same format.
+    Parameter values are only decoded when they are accessed by name or
+    index. Iterating over a patch yields tuples containing the parameter
+    name and value, i.e. a patch can be used in place of the parameter
+    list returned by the parsers.
+    """
+
+    __slots__ = ("program", "layout", "buffer", "offset")
+
+    def __init__(
+        self,
+        program: int,
+        layout: Union[ParameterLayout, BitfieldLayout],
+        buffer: bytes,
+        offset: int = 0,
+    ) -> None:
+        """
+        Parameters:
+                program (int): program number
+                layout (object): parameter layout of the patch format
+                buffer (bytes): unpacked patch data
+                offset (int): position of the first parameter in the buffer
+        """
+        if len(buffer) - offset < layout.size:
+            # treat missing data at the end as zero like the parsers do
+            buffer = buffer[offset:].ljust(layout.size, b"\0")
+            offset = 0
+        self.program = program
+        self.layout = layout
+        self.buffer = buffer
+        self.offset = offset
+
+    def __len__(self) -> int:
+        return len(self.layout)
+
+    def __getitem__(self, key: Union[int, str]) -> int:
+        """
+        This function decodes a single parameter value.
+
+        Parameters:
+                key (int or str): parameter index or name
+        Returns:
+                The parameter value.
+        """
+        if isinstance(key, str):
+            index = self.layout.index[key]
+        else:
+            index = key + len(self) if key < 0 else key
+            if not 0 <= index < len(self):
+                raise IndexError(f"Parameter index {key} out of range")
+        return self.layout.value(self.buffer, index, self.offset)
+
+    def __iter__(self) -> Iterator[tuple[str, int]]:
+        return self.items()
+
+    def __repr__(self) -> str:
+        return f"Patch(program={self.program}, {dict(self.items())})"
+
+    def keys(self) -> tuple[str, ...]:
+        """
+        This function returns the parameter names.
+
+        Returns:
+                A tuple of strings in parameter order.
+        """
+        return self.layout.names
+
+    def values(self) -> tuple[int, ...]:
+        """
+        This function decodes all parameter values.
+
+        Returns:
+                A tuple of integers in parameter order.
+        """
+        return self.layout.unpack_from(self.buffer, self.offset)
+
+    def items(self) -> Iterator[tuple[str, int]]:
+        """
+        This function decodes all parameters.
+
+        Returns:
+                An iterator over tuples containing the parameter name and
+                value, like the parameter list returned by the parsers.
+        """
+        return zip(self.layout.names, self.values())
+
+
+class PatchChanges(Patch):
+    """
+    This class is a view of the parameters of a patch that differ from a
+    previous version of the patch, e.g. while the patch is being edited. It
+    can be passed to the writers of the output module like a patch.
+    """
+
+    __slots__ = ("indices",)
+
+    def __init__(self, patch: Patch, indices: tuple[int, ...]) -> None:
+        """
+        Parameters:
+                patch (Patch): current version of the patch
+                indices (tuple): indices of the changed parameters
+        """
+        super().__init__(
+            patch.program, patch.layout, patch.buffer, patch.offset
+        )
+        self.indices = indices
+
+    @classmethod
+    def compare(cls, previous: Optional[Patch], patch: Patch) -> "PatchChanges":
+        """
+        This function compares two versions of a patch.
+
+        Parameters:
+                previous (Patch): previous version, None for a new patch
+                patch (Patch): current version
+        Returns:
+                A view of all parameters that differ. All parameters are
+                included if the patches have different parameter layouts.
+        """
+        if previous is None or previous.keys() != patch.keys():
+            return cls(patch, tuple(range(len(patch))))
+        old = previous.values()
+        return cls(
+            patch,
+            tuple(
+                i for i, value in enumerate(patch.values()) if value != old[i]
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, key: Union[int, str]) -> int:
+        if isinstance(key, str):
+            index = self.layout.index[key]
+            if index not in self.indices:
+                raise KeyError(key)
+        else:
+            index = self.indices[key]
+        return self.layout.value(self.buffer, index, self.offset)
+
+    def __repr__(self) -> str:
+        return f"PatchChanges(program={self.program}, {dict(self.items())})"
+
+    def keys(self) -> tuple[str, ...]:
+        names = self.layout.names
+        return tuple(names[i] for i in self.indices)
+
+    def values(self) -> tuple[int, ...]:
+        values = super().values()
+        return tuple(values[i] for i in self.indices)
+
+    def items(self) -> Iterator[tuple[str, int]]:
+        return zip(self.keys(), self.values())
@@ -0,0 +1,143 @@
+"""
+This module contains a columnar container for batches of decoded patches.
+"""
+from array import array
+import sys
+from typing import Optional, Union
+
+
+def column_from_bytes(lsb: bytes, msb: Optional[bytes] = None) -> "array[int]":
+    """
+    This function creates an unsigned integer column from the least and
+    (optionally) most significant bytes of its values.
+
+    Parameters:
+            lsb (bytes): least significant bytes of all values
+            msb (bytes): most significant bytes of all values, None for
+                         single byte values
+    Returns:
+            An array of type 'H' holding the values.
+    """
+    raw = bytearray(2 * len(lsb))
+    raw[0::2] = lsb
+    if msb is not None:
+        raw[1::2] = msb
+    column = array("H")
+    column.frombytes(raw)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def column_to_bytes(column: "array[int]") -> tuple[bytes, bytes]:
+    """
+    This function splits an unsigned integer column into the least and most
+    significant bytes of its values, see 'column_from_bytes'.
+
+    Parameters:
+            column (array): array of integers in the range 0-65535
+    Returns:
+            A tuple containing the least and the most significant bytes.
+    """
+    column = array("H", column)
+    if sys.byteorder == "big":
+        column.byteswap()
+    raw = column.tobytes()
+    return (raw[0::2], raw[1::2])
+
+
+class PatchBank:
+    """
+    This class holds a batch of decoded patches sharing the same parameter
+    layout. The parameter values are stored column-wise, i.e. as one integer
+    array per parameter, which makes the bank a N x P matrix of N patches
+    and P parameters.
+    """
+
+    def __init__(
+        self,
+        names: tuple[str, ...],
+        programs: "array[int]",
+        columns: list["array[int]"],
+        format_version: Optional[int] = None,
+        indices: Optional["array[int]"] = None,
+    ) -> None:
+        """
+        Parameters:
+                names (tuple): parameter names shared by all patches
+                programs (array): program number of each patch
+                columns (list): one array of values per parameter
+                format_version (int): storage format version, if applicable
+                indices (array): position of each patch in the original
+                                 sequence of messages
+        """
+        if len(columns) != len(names):
+            raise ValueError(
+                f"Expected {len(names)} columns, got {len(columns)}"
+            )
+        for column in columns:
+            if len(column) != len(programs):
+                raise ValueError(
+                    f"Expected {len(programs)} rows, got {len(column)}"
+                )
+        self.names = names
+        self.programs = programs
+        self.columns = columns
+        self.format_version = format_version
+        self.indices = (
+            indices if indices is not None else array("L", range(len(self)))
+        )
+
+    def __len__(self) -> int:
+        return len(self.programs)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """
+        This property returns the dimensions of the parameter matrix.
+
+        Returns:
+                A tuple containing the number of patches and parameters.
+        """
+        return (len(self), len(self.names))
+
+    def column(self, key: Union[int, str]) -> "array[int]":
+        """
+        This function returns the values of a single parameter for all
+        patches in the bank.
+
+        Parameters:
+                key (int or str): parameter index or name
+        Returns:
+                An integer array of length len(bank).
+        """
+        if isinstance(key, str):
+            key = self.names.index(key)
+        return self.columns[key]
+
+    def row(self, index: int) -> list[int]:
+        """
+        This function returns all parameter values of a single patch.
+
+        Parameters:
+                index (int): patch index within the bank
+        Returns:
+                A list of integers in parameter order.
+        """
+        return [column[index] for column in self.columns]
+
+    def patch(self, index: int) -> tuple[int, list[tuple[str, int]]]:
+        """
+        This function returns a single patch in the format used by the
+        'decode' functions of the parsers.
+
+        Parameters:
+                index (int): patch index within the bank
+        Returns:
+                A tuple containing the program number and a list of
+                parameters.
+        """
+        return (
+            self.programs[index],
+            list(zip(self.names, self.row(index))),
+        )
@@ -0,0 +1,372 @@
+"""
+This module contains the engine for requesting patch dumps from a
+Prophet-600 via MIDI.
+"""
+from collections import deque
+from collections.abc import Callable, Iterable
+import os
+import sys
+import time
+from typing import Any, BinaryIO, Optional, TextIO
+
+from .error import ParseError
+from .framing import iter_sysex
+from .registry import SysExParserFactory, factory as default_factory
+from .util import SysEx
+
+
+class ReceiveStats:
+    """
+    This class collects round-trip latencies and throughput of a dump.
+    """
+
+    def __init__(self) -> None:
+        self.latencies: list[float] = []
+        self.requests = 0
+        self.replies = 0
+        self.retries = 0
+        self.lost: list[int] = []
+        self.bytes = 0
+        self.start = time.monotonic()
+        self.end = self.start
+
+    def report(self) -> str:
+        """
+        This function summarizes the collected statistics.
+
+        Returns:
+                A string containing one line per statistic.
+        """
+        elapsed = max(self.end - self.start, 1e-9)
+        lines = [
+            f"{'Requests':20}: {self.requests}",
+            f"{'Replies':20}: {self.replies}",
+            f"{'Retries':20}: {self.retries}",
+            f"{'Lost':20}: {len(self.lost)} {self.lost if self.lost else ''}",
+        ]
+        if self.latencies:
+            import statistics
+
+            latencies = [latency * 1000 for latency in self.latencies]
+            lines += [
+                f"{'Latency min (ms)':20}: {min(latencies):8.1f}",
+                f"{'Latency mean (ms)':20}: {statistics.mean(latencies):8.1f}",
+                f"{'Latency median (ms)':20}: {statistics.median(latencies):8.1f}",
+                f"{'Latency max (ms)':20}: {max(latencies):8.1f}",
+            ]
+        lines += [
+            f"{'Total time (s)':20}: {elapsed:8.2f}",
+            f"{'Patches/s':20}: {self.replies / elapsed:8.1f}",
+            f"{'Bytes/s':20}: {self.bytes / elapsed:8.1f}",
+        ]
+        return "\n".join(line.rstrip() for line in lines)
+
+
+class PatchReceiver:
+    """
+    This class requests patch dumps and collects the replies. Requests are
+    paced according to the measured reply latency instead of a fixed delay,
+    lost replies are requested again after a timeout, and up to 'window'
+    requests may be in flight at the same time.
+    """
+
+    # weight of a new measurement in the moving latency average
+    SMOOTHING = 0.25
+
+    def __init__(
+        self,
+        send: Callable[[list[int]], None],
+        poll: Callable[[], Optional[bytes]],
+        window: int = 1,
+        timeout: float = 1.0,
+        retries: int = 3,
+        interval: float = 0.0,
+        factory: Optional[SysExParserFactory] = None,
+    ) -> None:
+        """
+        Parameters:
+                send (callable): function sending the data of a SysEx
+                                 message, i.e. without 0xf0 and 0xf7
+                poll (callable): function returning a received SysEx message
+                                 or None without blocking
+                window (int): maximum number of requests in flight
+                timeout (float): minimum number of seconds to wait for a
+                                 reply before requesting a patch again
+                retries (int): maximum number of repeated requests per patch
+                interval (float): minimum number of seconds between requests
+                factory (SysExParserFactory): parser factory used for
+                                              identifying replies
+        """
+        self.send = send
+        self.poll = poll
+        self.window = max(1, window)
+        self.timeout = timeout
+        self.retries = retries
+        self.interval = interval
+        self.factory = factory or default_factory
+        self.stats = ReceiveStats()
+        # moving average of the round-trip latency
+        self.latency: Optional[float] = None
+
+    @classmethod
+    def for_ports(
+        cls, inport: Any, outport: Any, **kwargs: Any
+    ) -> "PatchReceiver":
+        """
+        This function creates a receiver communicating via opened mido
+        ports.
+
+        Parameters:
+                inport (object): mido input port
+                outport (object): mido output port
+                kwargs: see constructor
+        Returns:
+                A PatchReceiver object.
+        """
+        import mido  # type: ignore
+
+        def send(data: list[int]) -> None:
+            outport.send(mido.Message("sysex", data=data))
+
+        def poll() -> Optional[bytes]:
+            # mido messages cannot be compared to None, so iter(poll, None)
+            # cannot be used
+            while True:
+                msg = inport.poll()
+                if msg is None:
+                    return None
+                if msg.type == "sysex":
+                    return bytes(msg.bytes())
+
+        return cls(send, poll, **kwargs)
+
+    def _average(self, average: Optional[float], value: float) -> float:
+        if average is None:
+            return value
+        return average + self.SMOOTHING * (value - average)
+
+    def _identify(self, msg: bytes) -> Optional[int]:
+        parser = self.factory.get_parser(msg)
+        if not parser:
+            return None
+        try:
+            return parser.peek_program(msg)
+        except ParseError:
+            return None
+
+    def request_timeout(self) -> float:
+        """
+        This function returns the current timeout for a single request,
+        which adapts to the measured latency.
+
+        Returns:
+                The timeout in seconds.
+        """
+        if self.latency is None:
+            return self.timeout
+        return max(self.timeout, 4 * self.latency)
+
+    def request_interval(self) -> float:
+        """
+        This function returns the current minimum time between two requests.
+        If several requests may be in flight, they are spread evenly over the
+        measured round-trip latency.
+
+        Returns:
+                The interval in seconds.
+        """
+        if self.window == 1 or self.latency is None:
+            return self.interval
+        return max(self.interval, self.latency / self.window)
+
+    def receive(
+        self,
+        patches: Iterable[int],
+        callback: Optional[Callable[[int, bytes], None]] = None,
+    ) -> dict[int, bytes]:
+        """
+        This function requests patch dumps and waits for the replies.
+
+        Parameters:
+                patches (iterable): patch numbers
+                callback (callable): function called with the patch number
+                                     and the message for every reply
+        Returns:
+                A dictionary mapping patch numbers to the received messages.
+                Patches that could not be received are missing.
+        """
+        stats = self.stats = ReceiveStats()
+        pending = deque(patches)
+        attempts = dict.fromkeys(pending, 0)
+        outstanding: dict[int, float] = {}
+        results: dict[int, bytes] = {}
+        next_request = 0.0
+        while pending or outstanding:
+            now = time.monotonic()
+            # checked on every iteration, so unrelated messages arriving
+            # continuously do not delay timeouts and retries
+            timeout = self.request_timeout()
+            for patch, sent in list(outstanding.items()):
+                if now - sent < timeout:
+                    continue
+                del outstanding[patch]
+                if attempts[patch] > self.retries:
+                    stats.lost.append(patch)
+                else:
+                    pending.appendleft(patch)
+            while (
+                pending
+                and len(outstanding) < self.window
+                and now >= next_request
+            ):
+                patch = pending.popleft()
+                self.send(
+                    [
+                        SysEx.SYSEX_ID_0,
+                        SysEx.SYSEX_ID_1,
+                        SysEx.SYSEX_ID_2,
+                        SysEx.SYSEX_COMMAND_PATCH_DUMP_REQUEST,
+                        patch,
+                    ]
+                )
+                stats.requests += 1
+                if attempts[patch]:
+                    stats.retries += 1
+                attempts[patch] += 1
+                outstanding[patch] = now
+                next_request = now + self.request_interval()
+
+            msg = self.poll()
+            if msg is None:
+                time.sleep(0.001)
+                continue
+
+            now = time.monotonic()
+            # messages that are not patch dumps are discarded
+            program = self._identify(msg)
+            if program is None or program in results:
+                continue
+            if program in outstanding:
+                latency = now - outstanding.pop(program)
+                stats.latencies.append(latency)
+                self.latency = self._average(self.latency, latency)
+            elif program in pending:
+                # late reply to a request that timed out
+                pending.remove(program)
+            elif program in stats.lost:
+                # late reply to the last request of a patch
+                stats.lost.remove(program)
+            else:
+                continue
+            results[program] = msg
+            stats.replies += 1
+            stats.bytes += len(msg)
+            if callback:
+                callback(program, msg)
+        stats.end = time.monotonic()
+        return results
+
+
+class DumpWriter:
+    """
+    This class writes received patch dumps to a file as they arrive. The
+    received patch numbers are recorded in a progress file next to the
+    output, so an interrupted dump can be resumed.
+    """
+
+    PROGRESS_SUFFIX = ".progress"
+
+    def __init__(self, path: Optional[str] = None, resume: bool = False):
+        """
+        Parameters:
+                path (str): output file name, None for standard output
+                resume (bool): append to an interrupted dump instead of
+                               overwriting it. An existing output without
+                               progress file is kept and only the patches
+                               it does not contain are requested.
+        """
+        self.path = path
+        self.received: set[int] = set()
+        self.progress: Optional[TextIO] = None
+        if path is None:
+            self.out: BinaryIO = sys.stdout.buffer
+            return
+        progress_path = path + self.PROGRESS_SUFFIX
+        end = 0
+        if resume and os.path.exists(path) and os.path.exists(progress_path):
+            with open(progress_path) as f:
+                for line in f:
+                    tokens = line.split()
+                    # ignore a line that was not completely written
+                    if len(tokens) != 2 or not line.endswith("\n"):
+                        break
+                    self.received.add(int(tokens[0]))
+                    end = int(tokens[1])
+        elif resume and os.path.exists(path):
+            # a completed dump, the progress file was removed
+            self.received = self.scan(path)
+            end = os.path.getsize(path)
+        self.out = open(path, "r+b" if end else "wb")
+        # drop data written after the last recorded reply
+        self.out.truncate(end)
+        self.out.seek(end)
+        self.progress = open(progress_path, "a" if end else "w")
+
+    @staticmethod
+    def scan(path: str) -> set[int]:
+        """
+        This function determines the patch numbers of the dumps contained
+        in a file.
+
+        Parameters:
+                path (str): SysEx file name
+        Returns:
+                A set of patch numbers.
+        """
+        received = set()
+        with open(path, "rb") as f:
+            for msg in iter_sysex(f):
+                parser = default_factory.get_parser(msg)
+                try:
+                    if parser:
+                        received.add(parser.peek_program(msg))
+                except ParseError:
+                    continue
+        return received
+
+    def __enter__(self) -> "DumpWriter":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def write(self, patch: int, msg: bytes) -> None:
+        """
+        This function appends a received message to the output.
+
+        Parameters:
+                patch (int): patch number
+                msg (bytes): MIDI SysEx dump
+        """
+        self.out.write(msg)
+        self.out.flush()
+        self.received.add(patch)
+        if self.progress:
+            self.progress.write(f"{patch} {self.out.tell()}\n")
+            self.progress.flush()
+
+    def close(self, complete: bool = False) -> None:
+        """
+        This function closes the output.
+
+        Parameters:
+                complete (bool): remove the progress file, i.e. the dump
+                                 cannot be resumed anymore
+        """
+        if self.progress:
+            self.progress.close()
+            self.progress = None
+            if complete and self.path:
+                os.remove(self.path + self.PROGRESS_SUFFIX)
+        if self.path:
+            self.out.close()
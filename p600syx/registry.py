@@ -0,0 +1,277 @@
+"""
+This module contains the registry of parsers. Parsers are registered by the
+import path of their class and only imported and instantiated when the first
+message is looked up, so importing p600syx does not import any parser.
+Third-party parsers are discovered through the entry point group
+'p600syx.parsers', e.g. in setup.py:
+
+    entry_points={
+        "p600syx.parsers": ["myformat = mypackage.parser:MyParser"],
+    }
+
+Scanning the entry points of all installed packages is comparatively slow,
+so it is deferred until a message cannot be decoded by any of the built-in
+parsers.
+"""
+from itertools import chain
+import importlib
+import threading
+from typing import TYPE_CHECKING, Any, Optional
+import warnings
+
+if TYPE_CHECKING:
+    # only needed for annotations, the parsers import them at load time
+    from .stats import Stats
+    from .sysex_parser import SysExMessage, SysExParser
+
+ENTRY_POINT_GROUP = "p600syx.parsers"
+
+# built-in parsers by entry point name, in the order of lookup
+BUILTIN_PARSERS = {
+    "sequential": "p600syx.sequential_sysex_parser:SequentialSysExParser",
+    "gligli": "p600syx.gligli_sysex_parser:GliGliSysExParser",
+}
+
+
+def load_object(spec: str) -> Any:
+    """
+    This function imports an object given in entry point syntax.
+
+    Parameters:
+            spec (str): module and attribute name separated by a colon,
+                        e.g. 'p600syx.patch:Patch'
+    Returns:
+            The imported object.
+    """
+    module, _, attr = spec.partition(":")
+    obj = importlib.import_module(module.strip())
+    # strip optional extras, e.g. 'module:attr [extra]'
+    for name in attr.split("[")[0].strip().split("."):
+        if name:
+            obj = getattr(obj, name)
+    return obj
+
+
+def entry_points(group: str) -> dict[str, str]:
+    """
+    This function returns the entry points of all installed packages in a
+    group.
+
+    Parameters:
+            group (str): entry point group
+    Returns:
+            A dictionary mapping entry point names to their values.
+    """
+    from importlib import metadata
+
+    eps: Any = metadata.entry_points()
+    if hasattr(eps, "select"):
+        selected = eps.select(group=group)
+    else:
+        # Python < 3.10 returns a dictionary of groups
+        selected = eps.get(group, [])
+    return {ep.name: ep.value for ep in selected}
+
+
+class SysExParserFactory:
+    """
+    This factory class is the provider for all registered parser classes.
+    """
+
+    def __init__(self, affinity: bool = True) -> None:
+        """
+        Parameters:
+                affinity (bool): try the parser that matched the previous
+                                 message first
+        """
+        self.affinity = affinity
+        self._parsers: dict[str, "SysExParser"] = {}
+        self._index: dict[bytes, list["SysExParser"]] = {}
+        self._unindexed: list["SysExParser"] = []
+        self._last: Optional["SysExParser"] = None
+        # entry point names and import paths of parsers not loaded yet
+        self._names: set[str] = set()
+        self._pending: dict[str, str] = {}
+        # entry point groups not scanned yet
+        self._groups: list[str] = []
+        self._stats: Optional["Stats"] = None
+        # serializes lazy loading, so parsers are loaded once and no thread
+        # looks up messages while the parsers are only partly registered
+        self._lock = threading.RLock()
+
+    @property
+    def parsers(self) -> dict[str, "SysExParser"]:
+        """
+        This property contains all parsers by name. Accessing it loads all
+        lazily registered parsers, including the ones of entry points.
+        """
+        self._discover()
+        return self._parsers
+
+    @staticmethod
+    def manufacturer_id(msg: "SysExMessage") -> bytes:
+        """
+        This function returns the start byte and the manufacturer ID of a
+        MIDI SysEx message. The ID is either a single byte or three bytes
+        starting with 0x00.
+
+        Parameters:
+                msg (bytes): A MIDI SysEx message as a bytestring.
+
+        Returns:
+                A bytestring of length 2 or 4, or shorter if the message is
+                truncated.
+        """
+        if len(msg) > 1 and msg[1] == 0:
+            return bytes(msg[:4])
+        return bytes(msg[:2])
+
+    def register_parser(self, parser: "SysExParser") -> None:
+        """
+        This function takes a parser object as argument and registers it
+        with the factory.
+
+        Parameters:
+                parser (object): An object implementing the functions
+                'can_decode' and 'decode' (see already implemented classes)
+        """
+        with self._lock:
+            if parser.name in self._parsers:
+                return
+            self._parsers[parser.name] = parser
+            if self._stats is not None:
+                parser.instrument(self._stats)
+            keys = [
+                self.manufacturer_id(prefix) for prefix in parser.prefixes()
+            ]
+            if not keys or any(
+                len(key) < 2 or key[1] == 0 and len(key) < 4 for key in keys
+            ):
+                # prefixes too short for determining the manufacturer ID
+                self._unindexed.append(parser)
+                return
+            for key in set(keys):
+                self._index.setdefault(key, []).append(parser)
+
+    def register_lazy(self, name: str, spec: str) -> None:
+        """
+        This function registers a parser class that is imported and
+        instantiated without arguments when the first message is looked up.
+        Registering a name a second time has no effect.
+
+        Parameters:
+                name (str): entry point name, e.g. 'gligli'
+                spec (str): import path of the class, see 'load_object'
+        """
+        with self._lock:
+            if name in self._names:
+                return
+            self._names.add(name)
+            self._pending[name] = spec
+
+    def register_entry_points(self, group: str = ENTRY_POINT_GROUP) -> None:
+        """
+        This function registers all parsers of an entry point group, see
+        'register_lazy'. The installed packages are only scanned if a
+        message cannot be decoded by any other parser or if all parsers are
+        requested.
+
+        Parameters:
+                group (str): entry point group
+        """
+        with self._lock:
+            self._groups.append(group)
+
+    def _load(self) -> None:
+        with self._lock:
+            # the parsers are removed from the pending ones only after they
+            # are registered, so other threads wait for them in 'get_parser'
+            for name, spec in list(self._pending.items()):
+                try:
+                    self.register_parser(load_object(spec)())
+                except Exception as e:
+                    # a broken plugin must not prevent decoding other formats
+                    warnings.warn(
+                        f"Failed to load parser {name!r} ({spec}): {e}"
+                    )
+                del self._pending[name]
+
+    def _discover(self) -> None:
+        # load all parsers including the ones of entry points
+        with self._lock:
+            for group in self._groups:
+                for name, spec in entry_points(group).items():
+                    self.register_lazy(name, spec)
+            if self._pending:
+                self._load()
+            self._groups = []
+
+    def _lookup(self, msg: "SysExMessage") -> Optional["SysExParser"]:
+        candidates = self._index.get(self.manufacturer_id(msg), [])
+        for parser in chain(candidates, self._unindexed):
+            if parser.can_decode(msg):
+                return parser
+        return None
+
+    def get_parser(self, msg: "SysExMessage") -> Optional["SysExParser"]:
+        """
+        This function returns a suitable parser for decoding a SysEx
+        messages if available, None otherwise.
+
+        Parameters:
+                msg (bytes): A MIDI SysEx message as a bytestring.
+
+        Returns:
+                parser object or None
+        """
+        if self._pending:
+            self._load()
+        last = self._last
+        if last is not None and last.can_decode(msg):
+            return last
+        parser = self._lookup(msg)
+        if parser is None and self._groups:
+            # another thread may have scanned the entry points meanwhile
+            self._discover()
+            parser = self._lookup(msg)
+        if parser is not None and self.affinity:
+            self._last = parser
+        return parser
+
+    def instrument(self, stats: "Stats") -> None:
+        """
+        This function records all parser lookups and the calls of all
+        registered parsers in a statistics object until uninstrument is
+        called. Parsers loaded later are instrumented when they are loaded.
+
+        Parameters:
+                stats (Stats): statistics object
+        """
+        self.uninstrument()
+        # load the registered parsers now, so loading them is not recorded
+        # as part of the first lookup
+        if self._pending:
+            self._load()
+        self._stats = stats
+        setattr(
+            self,
+            "get_parser",
+            stats.timed(self.get_parser, "SysExParserFactory", "dispatch"),
+        )
+        for parser in self._parsers.values():
+            parser.instrument(stats)
+
+    def uninstrument(self) -> None:
+        """
+        This function stops recording lookups and parser calls.
+        """
+        self._stats = None
+        self.__dict__.pop("get_parser", None)
+        for parser in self._parsers.values():
+            parser.uninstrument()
+
+
+factory = SysExParserFactory()
+for _name, _spec in BUILTIN_PARSERS.items():
+    factory.register_lazy(_name, _spec)
+factory.register_entry_points()
@@ -0,0 +1,166 @@
+"""
+This module contains the flow control for sending MIDI SysEx messages to a
+Prophet-600.
+"""
+from collections.abc import Callable
+import sys
+import time
+from typing import Any, Optional
+
+from .sysex_parser import SysExMessage
+from .util import SysEx
+
+# MIDI transmits 10 bits (start bit, 8 data bits, stop bit) per byte
+MIDI_BAUD_RATE = 31250
+MIDI_BITS_PER_BYTE = 10
+
+MESSAGE_TYPE_PATCH = "patch"
+MESSAGE_TYPE_FIRMWARE = "firmware"
+MESSAGE_TYPE_OTHER = "other"
+
+_GLIGLI_PREFIX = bytes(
+    [0xF0, SysEx.SYSEX_ID_0, SysEx.SYSEX_ID_1, SysEx.SYSEX_ID_2]
+)
+_SEQUENTIAL_PREFIX = b"\xf0\x01\x02"
+
+
+def message_type(msg: SysExMessage) -> str:
+    """
+    This function classifies a MIDI SysEx message by the processing it
+    causes on the device.
+
+    Parameters:
+            msg (bytes): MIDI SysEx message including 0xf0
+    Returns:
+            One of MESSAGE_TYPE_PATCH, MESSAGE_TYPE_FIRMWARE and
+            MESSAGE_TYPE_OTHER.
+    """
+    if msg[:3] == _SEQUENTIAL_PREFIX:
+        return MESSAGE_TYPE_PATCH
+    if msg[:4] == _GLIGLI_PREFIX and len(msg) > 4:
+        if msg[4] == SysEx.SYSEX_COMMAND_PATCH_DUMP:
+            return MESSAGE_TYPE_PATCH
+        if msg[4] == SysEx.SYSEX_COMMAND_UPDATE_FW:
+            return MESSAGE_TYPE_FIRMWARE
+    return MESSAGE_TYPE_OTHER
+
+
+def wire_time(nbytes: int, baud_rate: int = MIDI_BAUD_RATE) -> float:
+    """
+    This function returns the time needed for transmitting a number of bytes
+    over a MIDI cable.
+
+    Parameters:
+            nbytes (int): number of bytes
+            baud_rate (int): transmission rate in bits per second
+    Returns:
+            The transmission time in seconds.
+    """
+    return nbytes * MIDI_BITS_PER_BYTE / baud_rate
+
+
+class SendScheduler:
+    """
+    This class computes the minimum time between two messages from the
+    transmission time of a message and a processing allowance of the device
+    depending on the message type.
+    """
+
+    def __init__(
+        self,
+        allowances: Optional[dict[str, float]] = None,
+        default_allowance: float = 0.15,
+        baud_rate: int = MIDI_BAUD_RATE,
+    ) -> None:
+        """
+        Parameters:
+                allowances (dict): processing time in seconds the device
+                                   needs per message type
+                default_allowance (float): processing time in seconds for
+                                           other message types
+                baud_rate (int): transmission rate in bits per second
+        """
+        self.allowances = allowances or {}
+        self.default_allowance = default_allowance
+        self.baud_rate = baud_rate
+        self.next_slot = 0.0
+        self.messages = 0
+        self.bytes = 0
+        self.start: Optional[float] = None
+        self.end = 0.0
+
+    def gap(self, msg: SysExMessage) -> float:
+        """
+        This function returns the time the device needs for receiving and
+        processing a message.
+
+        Parameters:
+                msg (bytes): MIDI SysEx message including 0xf0 and 0xf7
+        Returns:
+                The time in seconds.
+        """
+        allowance = self.allowances.get(
+            message_type(msg), self.default_allowance
+        )
+        return wire_time(len(msg), self.baud_rate) + allowance
+
+    def wait(self) -> None:
+        """
+        This function blocks until the next message may be sent.
+        """
+        delay = self.next_slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def sent(self, msg: SysExMessage) -> None:
+        """
+        This function records that a message was just sent.
+
+        Parameters:
+                msg (bytes): MIDI SysEx message including 0xf0 and 0xf7
+        """
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+        self.next_slot = now + self.gap(msg)
+        self.end = now + wire_time(len(msg), self.baud_rate)
+        self.messages += 1
+        self.bytes += len(msg)
+
+    def throughput(self) -> float:
+        """
+        This function returns the achieved transmission rate, i.e. the number
+        of bytes divided by the time between the first message and the end of
+        the transmission of the last message.
+
+        Returns:
+                The rate in bytes per second.
+        """
+        if self.start is None:
+            return 0.0
+        return self.bytes / max(self.end - self.start, 1e-9)
+
+
+def raw_sender(port: Any) -> Callable[[SysExMessage], None]:
+    """
+    This function returns a function sending raw SysEx messages via an
+    opened mido output port. Emulated ports accept the bytes directly, see
+    emulator.Output.send_bytes, all other ports are sent mido messages
+    using the public API, which also serializes concurrent senders.
+
+    Parameters:
+            port (object): mido output port
+    Returns:
+            A function taking a MIDI SysEx message including 0xf0 and 0xf7.
+    """
+    # emulated ports only exist if the emulator has been imported
+    emulator = sys.modules.get("p600syx.emulator")
+    if emulator is not None and isinstance(port, emulator.Output):
+        return port.send_bytes  # type: ignore[no-any-return]
+    import mido  # type: ignore
+
+    def send(msg: SysExMessage) -> None:
+        data = bytes(msg[1:-1] if msg[-1:] == b"\xf7" else msg[1:])
+        port.send(mido.Message("sysex", data=data))
+
+    return send
@@ -3,11 +3,22 @@ This module contains the parser for decoding MIDI SysEx dumps created using
 the original firmware for the Sequential Circuits Prophet-600 analog
 synthesizer.
 """
-from collections.abc import Callable
+from array import array
+from collections.abc import Iterable, Sequence
 import sys
+from typing import Literal, Union, overload
 
-from .sysex_parser import SysExParser
+from .sysex_parser import SysExMessage, SysExParser
 from .error import ParseError
+from .bytewise import make_table, or_bytes
+from .framing import SYSEX_END
+from .layout import BitfieldLayout
+from .patch import Patch
+from .patch_bank import PatchBank, column_to_bytes
+
+_LOW_NIBBLE = make_table(lambda byte: byte & 0xF)
+_HIGH_NIBBLE = make_table(lambda byte: byte >> 4)
+_LOW_TO_HIGH_NIBBLE = make_table(lambda byte: byte << 4)
 
 
 class SequentialSysExParser(SysExParser):
@@ -36,74 +47,62 @@ class SequentialSysExParser(SysExParser):
     # E     Z7 Z6 Z5 Z4 Z3 Z2 Z1 Z0
     # F     ZF ZE ZD ZC ZB ZA Z9 Z8
     parameters = [
-        ("OSC A PULSE WIDTH", 7, lambda data: data[0x0]),
-        ("PMOD FIL ENV AMT", 4, lambda data: data[0x1] << 1 | data[0x0] >> 7),
-        ("LFO FREQ", 4, lambda data: data[0x1] >> 3),
-        ("PMOD OSC B AMT", 7, lambda data: data[0x2] << 1 | data[0x1] >> 7),
-        ("LFO AMT", 5, lambda data: data[0x3] << 2 | data[0x2] >> 6),
-        ("OSC B FREQ", 6, lambda data: data[0x4] << 5 | data[0x3] >> 3),
-        ("OSC A FREQ", 6, lambda data: data[0x4] >> 1),
-        ("OSC B FINE", 7, lambda data: data[0x5] << 1 | data[0x4] >> 7),
-        ("MIXER", 6, lambda data: data[0x6] << 2 | data[0x5] >> 6),
-        ("FILTER CUTOFF", 7, lambda data: data[0x7] << 4 | data[0x6] >> 4),
-        ("RESONANCE", 6, lambda data: data[0x8] << 5 | data[0x7] >> 3),
-        ("FIL ENV AMT", 4, lambda data: data[0x8] >> 1),
-        ("FIL REL", 4, lambda data: data[0x9] << 3 | data[0x8] >> 5),
-        ("FIL SUS", 4, lambda data: data[0x9] >> 1),
-        ("FIL DEC", 4, lambda data: data[0xA] << 3 | data[0x9] >> 5),
-        ("FIL ATK", 4, lambda data: data[0xA] >> 1),
-        ("AMP REL", 4, lambda data: data[0xB] << 3 | data[0xA] >> 5),
-        ("AMP SUS", 4, lambda data: data[0xB] >> 1),
-        ("AMP DEC", 4, lambda data: data[0xC] << 3 | data[0xB] >> 5),
-        ("AMP ATK", 4, lambda data: data[0xC] >> 1),
-        ("GLIDE", 4, lambda data: data[0xD] << 3 | data[0xC] >> 5),
-        ("OSC B PULSE WIDTH", 7, lambda data: data[0xD] >> 1),
-        ("OSC A PULSE", 1, lambda data: data[0xE]),
-        ("OSC B PULSE", 1, lambda data: data[0xE] >> 1),
-        ("FIL KBD FULL", 1, lambda data: data[0xE] >> 2),
-        ("FIL KBD 1/2", 1, lambda data: data[0xE] >> 3),
-        ("LFO SHAPE (1=TRI)", 1, lambda data: data[0xE] >> 4),
-        ("LFO FREQ AB", 1, lambda data: data[0xE] >> 5),
-        ("LFO PW AB", 1, lambda data: data[0xE] >> 6),
-        ("LFO FIL", 1, lambda data: data[0xE] >> 7),
-        ("OSC A SAW", 1, lambda data: data[0xF]),
-        ("OSC A TRI", 1, lambda data: data[0xF] >> 1),
-        ("OSC A SYNC", 1, lambda data: data[0xF] >> 2),
-        ("OSC B SAW", 1, lambda data: data[0xF] >> 3),
-        ("OSC B TRI", 1, lambda data: data[0xF] >> 4),
-        ("PMOD FREQ A", 1, lambda data: data[0xF] >> 5),
-        ("PMOD FIL", 1, lambda data: data[0xF] >> 6),
-        ("UNISON", 1, lambda data: data[0xF] >> 7),
+        ("OSC A PULSE WIDTH", 7),
+        ("PMOD FIL ENV AMT", 4),
+        ("LFO FREQ", 4),
+        ("PMOD OSC B AMT", 7),
+        ("LFO AMT", 5),
+        ("OSC B FREQ", 6),
+        ("OSC A FREQ", 6),
+        ("OSC B FINE", 7),
+        ("MIXER", 6),
+        ("FILTER CUTOFF", 7),
+        ("RESONANCE", 6),
+        ("FIL ENV AMT", 4),
+        ("FIL REL", 4),
+        ("FIL SUS", 4),
+        ("FIL DEC", 4),
+        ("FIL ATK", 4),
+        ("AMP REL", 4),
+        ("AMP SUS", 4),
+        ("AMP DEC", 4),
+        ("AMP ATK", 4),
+        ("GLIDE", 4),
+        ("OSC B PULSE WIDTH", 7),
+        ("OSC A PULSE", 1),
+        ("OSC B PULSE", 1),
+        ("FIL KBD FULL", 1),
+        ("FIL KBD 1/2", 1),
+        ("LFO SHAPE (1=TRI)", 1),
+        ("LFO FREQ AB", 1),
+        ("LFO PW AB", 1),
+        ("LFO FIL", 1),
+        ("OSC A SAW", 1),
+        ("OSC A TRI", 1),
+        ("OSC A SYNC", 1),
+        ("OSC B SAW", 1),
+        ("OSC B TRI", 1),
+        ("PMOD FREQ A", 1),
+        ("PMOD FIL", 1),
+        ("UNISON", 1),
     ]
 
+    # The parameters are packed LS bit first without gaps, i.e. each
+    # parameter starts at the bit following the last bit of its predecessor.
+    # The layout of the 16 data bytes is compiled once, including the
+    # displayed parameter names.
+    layout = BitfieldLayout(
+        [
+            (f"{name} (max: {(1 << bits) - 1})", bits)
+            for name, bits in parameters
+        ]
+    )
+
     def __init__(self, name: str = "SequentialSysExParser"):
         super().__init__(name)
         self.header = b"\xf0\x01\x02"
 
-    @classmethod
-    def trunc_and_format(
-        cls, param: tuple[str, int, Callable[[list[int]], int]], data: list[int]
-    ) -> tuple[str, int]:
-        """
-        This internal function returns a string containing a parameter name
-        and value.
-
-        Parameters:
-                param (tuple): A tuple of parameter name, number of bits and
-                               conversion function for extracting the parameter
-                               value from the 16 bytes of message data.
-                data (list): List of integers containing the full 16 bytes of
-                             message data.
-
-        Returns:
-                A string containing the parameter name, maximum and current
-                value.
-        """
-        name, bits, func = param
-        mask = (0x1 << bits) - 1
-        return (f"{name} (max: {mask})", func(data) & mask)
-
-    def can_decode(self, msg: bytes) -> bool:
+    def can_decode(self, msg: SysExMessage) -> bool:
         """
         This function checks if the parser can decode a given MIDI SysEx dump
         using the header of the data.
@@ -114,13 +113,25 @@ class SequentialSysExParser(SysExParser):
         Returns:
                 True if parser can decode dump, False otherwise.
         """
-        if msg.startswith(self.header):
+        if msg[: len(self.header)] == self.header:
             return True
         return False
 
+    @overload
     def decode(
-        self, msg: bytes
+        self, msg: SysExMessage, lazy: Literal[False] = False
     ) -> tuple[int, list[tuple[str, int]], list[int]]:
+        ...
+
+    @overload
+    def decode(
+        self, msg: SysExMessage, lazy: Literal[True]
+    ) -> tuple[int, Patch, list[int]]:
+        ...
+
+    def decode(
+        self, msg: SysExMessage, lazy: bool = False
+    ) -> tuple[int, Union[list[tuple[str, int]], Patch], list[int]]:
         """
         This function decodes a MIDI SysEx dump created using
         the original firmware for the Sequential Circuits Prophet-600 analog
@@ -128,22 +139,24 @@ class SequentialSysExParser(SysExParser):
 
         Parameter:
                 msg (bytes): MIDI SysEx dump
+                lazy (bool): return the parameters as a Patch object
 
         Returns:
-                A tuple containing the program number, a list of parameters,
-                and (possibly) a list of remaining integer data that was not or
-                could not be decoded.
+                A tuple containing the program number, a list of parameters
+                or a Patch object, and (possibly) a list of remaining integer
+                data that was not or could not be decoded.
         """
-        if not msg.startswith(self.header):
+        if msg[: len(self.header)] != self.header:
             raise ParseError(
                 f"Header mismatch: expected {self.header!r},"
-                f" got {msg[:len(self.header)]!r}"
+                f" got {bytes(msg[:len(self.header)])!r}"
             )
         program = msg[len(self.header)]
         # From P600 owner's manual, page 10-5
         # 16 bytes of data sent as 32 4-bit nibbles
         # right justified, LS nibble sent first
-        raw_data = msg[len(self.header) + 1 :]
+        end = len(msg) - 1 if msg[-1:] == SYSEX_END else len(msg)
+        raw_data = bytes(msg[len(self.header) + 1 : end])
         raw_size = len(raw_data)
         if raw_size != 32:
             if raw_size > 32:
@@ -155,14 +168,166 @@ class SequentialSysExParser(SysExParser):
                 for byte in raw_data:
                     print("", bin(byte))
                 raise ParseError(f"Expected 32 bytes of data, got {raw_size}")
-        # compose bytes from nibbles
-        data = [
-            int(msb << 4 | lsb)
-            for lsb, msb in zip(raw_data[::2], raw_data[1::2])
-        ]
-        parameters = []
-        # generate list of parameters from raw data
-        for param in SequentialSysExParser.parameters:
-            parameters.append(self.trunc_and_format(param, data))
+        packed = self.pack_nibbles(raw_data[:32])
+        if lazy:
+            return (program, Patch(program, self.layout, packed), list(packed))
+        parameters = list(
+            zip(self.layout.names, self.layout.unpack_from(packed))
+        )
+        return (program, parameters, list(packed))
+
+    @staticmethod
+    def pack_nibbles(data: bytes) -> bytes:
+        """
+        This function composes bytes from pairs of 4-bit nibbles sent LS
+        nibble first.
+
+        Parameters:
+                data (bytes): nibbles, the length must be even
+
+        Returns:
+                A bytestring of half the length of the input.
+        """
+        return or_bytes(
+            data[0::2].translate(_LOW_NIBBLE),
+            data[1::2].translate(_LOW_TO_HIGH_NIBBLE),
+        )
+
+    def decode_many(self, msgs: Iterable[SysExMessage]) -> PatchBank:
+        """
+        This function decodes a batch of MIDI SysEx dumps created using
+        the original firmware for the Sequential Circuits Prophet-600 analog
+        synthesizer. The bit fields of all messages are extracted at once and
+        the parameters are stored column-wise. Data following the 32 nibbles
+        of a message is ignored.
+
+        Parameters:
+                msgs (iterable): MIDI SysEx dumps
+
+        Returns:
+                A PatchBank holding all patches.
+        """
+        programs = array("B")
+        payloads = []
+        for index, msg in enumerate(msgs):
+            if msg[: len(self.header)] != self.header:
+                raise ParseError(
+                    f"Header mismatch in message {index}: expected"
+                    f" {self.header!r}, got {bytes(msg[:len(self.header)])!r}"
+                )
+            end = len(msg) - 1 if msg[-1:] == SYSEX_END else len(msg)
+            payload = msg[len(self.header) + 1 : end]
+            if len(payload) < 32:
+                raise ParseError(
+                    f"Expected 32 bytes of data in message {index},"
+                    f" got {len(payload)}"
+                )
+            programs.append(msg[len(self.header)])
+            payloads.append(payload[:32])
+        packed = self.pack_nibbles(b"".join(payloads))
+        return PatchBank(
+            self.layout.names, programs, self.layout.unpack_columns(packed)
+        )
+
+    def peek_program(self, msg: SysExMessage) -> int:
+        """
+        This function returns the program number of a MIDI SysEx dump
+        created using the original firmware without decoding its parameters.
+
+        Parameter:
+                msg (bytes): MIDI SysEx dump
+
+        Returns:
+                The program number.
+        """
+        if msg[: len(self.header)] != self.header:
+            raise ParseError(
+                f"Header mismatch: expected {self.header!r},"
+                f" got {bytes(msg[:len(self.header)])!r}"
+            )
+        if len(msg) <= len(self.header):
+            raise ParseError("Message contains no program number")
+        return msg[len(self.header)]
 
-        return (program, parameters, data)
+    def encode(self, program: int, parameters: Sequence[int]) -> bytes:
+        """
+        This function encodes a patch as MIDI SysEx dump in the format of
+        the original firmware for the Sequential Circuits Prophet-600 analog
+        synthesizer. It is the inverse of 'decode'.
+
+        Parameters:
+                program (int): program number
+                parameters (sequence): parameter values in the order of
+                                       'SequentialSysExParser.parameters'
+
+        Returns:
+                The MIDI SysEx dump including the terminating 0xf7.
+        """
+        if len(parameters) != len(self.parameters):
+            raise ValueError(
+                f"Expected {len(self.parameters)} values, got {len(parameters)}"
+            )
+        bits = 0
+        for (name, nbits), offset, value in zip(
+            self.parameters, self.layout.offsets, parameters
+        ):
+            if not 0 <= value < 1 << nbits:
+                raise ValueError(f"Value of parameter {name} out of range")
+            bits |= value << offset
+        data = bits.to_bytes(16, "little")
+        nibbles = bytearray(32)
+        nibbles[0::2] = data.translate(_LOW_NIBBLE)
+        nibbles[1::2] = data.translate(_HIGH_NIBBLE)
+        return self.header + bytes([program]) + nibbles + SYSEX_END
+
+    def encode_many(self, bank: PatchBank) -> list[bytes]:
+        """
+        This function encodes a batch of patches as MIDI SysEx dumps in the
+        format of the original firmware. The bit fields of all patches are
+        composed at once.
+
+        Parameters:
+                bank (PatchBank): patches with parameters in the order of
+                                  'SequentialSysExParser.parameters'
+
+        Returns:
+                A list of MIDI SysEx dumps including the terminating 0xf7.
+        """
+        if len(bank.columns) != len(self.parameters):
+            raise ValueError(
+                f"Expected {len(self.parameters)} parameters,"
+                f" got {len(bank.columns)}"
+            )
+        count = len(bank)
+        data = [bytes(count)] * 16
+        for (name, nbits), offset, column in zip(
+            self.parameters, self.layout.offsets, bank.columns
+        ):
+            values, msb = column_to_bytes(column)
+            if any(msb) or max(values, default=0) >= 1 << nbits:
+                raise ValueError(f"Value of parameter {name} out of range")
+            index, shift = divmod(offset, 8)
+            data[index] = or_bytes(
+                data[index],
+                values.translate(make_table(lambda value: value << shift)),
+            )
+            if shift + nbits > 8:
+                data[index + 1] = or_bytes(
+                    data[index + 1],
+                    values.translate(
+                        make_table(lambda value: value >> 8 - shift)
+                    ),
+                )
+        size = len(self.header) + 34
+        msgs = bytearray(count * size)
+        for i, byte in enumerate(self.header):
+            msgs[i::size] = bytes([byte]) * count
+        msgs[len(self.header) :: size] = array("B", bank.programs).tobytes()
+        for i in range(16):
+            pos = len(self.header) + 1 + 2 * i
+            msgs[pos::size] = data[i].translate(_LOW_NIBBLE)
+            msgs[pos + 1 :: size] = data[i].translate(_HIGH_NIBBLE)
+        msgs[size - 1 :: size] = SYSEX_END * count
+        return [
+            bytes(msgs[pos : pos + size]) for pos in range(0, len(msgs), size)
+        ]
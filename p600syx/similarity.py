@@ -0,0 +1,164 @@
+"""
+This module contains a nearest-neighbour index over decoded patches. Every
+parameter is scaled from its range to 0-255, and the distance of two
+patches is the sum of the absolute differences of their scaled parameters
+(Manhattan distance). Program numbers, patch names and unused parameters
+are ignored.
+
+The index uses NumPy if it is installed and falls back to an equivalent
+implementation operating on whole byte strings otherwise.
+"""
+from array import array
+import heapq
+import importlib
+import sys
+from typing import Any, Optional
+
+from .decoding import iter_patches
+from .diff import IGNORED_NAMES, PatchRef
+from .patch import PATCH_NAME_PREFIX, Patch, patch_name
+
+try:
+    numpy: Any = importlib.import_module("numpy")
+except ImportError:
+    numpy = None
+
+
+class _Group:
+    # scaled parameters of all indexed patches sharing a parameter layout,
+    # stored as one byte string per parameter
+    def __init__(self, patch: Patch) -> None:
+        names = patch.keys()
+        self.indices = tuple(
+            i
+            for i, name in enumerate(names)
+            if name not in IGNORED_NAMES
+            and not name.startswith(PATCH_NAME_PREFIX)
+        )
+        self.maxima = tuple(patch.layout.maxima[i] for i in self.indices)
+        self.columns = [bytearray() for _ in self.indices]
+        self.refs: list[PatchRef] = []
+
+    def scale(self, patch: Patch) -> bytes:
+        values = patch.values()
+        return bytes(
+            min(values[i], maximum) * 255 // maximum
+            for i, maximum in zip(self.indices, self.maxima)
+        )
+
+    def add(self, ref: PatchRef, patch: Patch) -> None:
+        for column, value in zip(self.columns, self.scale(patch)):
+            column.append(value)
+        self.refs.append(ref)
+
+    def distances(self, query: bytes) -> Any:
+        if numpy is not None:
+            total = numpy.zeros(len(self.refs), dtype=numpy.uint32)
+            for column, value in zip(self.columns, query):
+                diff = numpy.frombuffer(column, dtype=numpy.uint8).astype(
+                    numpy.int16
+                )
+                total += numpy.abs(diff - value).astype(numpy.uint32)
+            return total
+        # The absolute differences of each parameter are looked up using a
+        # translation table and summed up for all patches at once in 16 bit
+        # lanes of a big integer. The sum cannot overflow a lane for up to
+        # 257 parameters.
+        if len(self.columns) > 257:
+            raise ValueError("Too many parameters")
+        total = 0
+        lanes = bytearray(2 * len(self.refs))
+        for column, value in zip(self.columns, query):
+            table = bytes(abs(value - byte) for byte in range(256))
+            lanes[0::2] = column.translate(table)
+            total += int.from_bytes(lanes, "little")
+        result = array("H")
+        result.frombytes(total.to_bytes(len(lanes), "little"))
+        if sys.byteorder == "big":
+            result.byteswap()
+        return result
+
+
+class SimilarityIndex:
+    """
+    This class finds the patches closest to a given patch. Patches are
+    grouped by their parameter layout, i.e. a query only returns patches
+    stored in the same format and storage format version. Patches can be
+    added at any time.
+    """
+
+    def __init__(self) -> None:
+        self.groups: dict[tuple[str, ...], _Group] = {}
+
+    def __len__(self) -> int:
+        return sum(len(group.refs) for group in self.groups.values())
+
+    def add(self, ref: PatchRef, patch: Patch) -> None:
+        """
+        This function adds a patch to the index.
+
+        Parameters:
+                ref (PatchRef): location of the patch
+                patch (Patch): decoded patch
+        """
+        group = self.groups.get(patch.keys())
+        if group is None:
+            group = self.groups[patch.keys()] = _Group(patch)
+        group.add(ref, patch)
+
+    def add_file(self, path: str) -> int:
+        """
+        This function adds all patches contained in a file to the index.
+
+        Parameters:
+                path (str): SysEx file name
+        Returns:
+                The number of added patches.
+        """
+        count = 0
+        with open(path, "rb") as f:
+            for message, _, patch in iter_patches(f):
+                ref = PatchRef(path, message, patch.program, patch_name(patch))
+                self.add(ref, patch)
+                count += 1
+        return count
+
+    def nearest(
+        self, patch: Patch, k: int = 5, exclude: Optional[PatchRef] = None
+    ) -> list[tuple[int, PatchRef]]:
+        """
+        This function returns the patches closest to a patch.
+
+        Parameters:
+                patch (Patch): decoded patch
+                k (int): maximum number of returned patches
+                exclude (PatchRef): location of a patch that is not
+                                    returned, e.g. the query patch itself
+        Returns:
+                A list of up to k tuples containing the distance and the
+                location of a patch, sorted by distance. Patches with equal
+                distance are sorted in the order they were added.
+        """
+        group = self.groups.get(patch.keys())
+        if group is None or k <= 0:
+            return []
+        distances = group.distances(group.scale(patch))
+        count = k + 1 if exclude is not None else k
+        if numpy is not None:
+            if count < len(distances):
+                candidates = numpy.argpartition(distances, count)[:count]
+            else:
+                candidates = numpy.arange(len(distances))
+            indices = sorted(
+                candidates.tolist(), key=lambda i: (distances[i], i)
+            )
+        else:
+            # comparing plain integers is much faster than using a key
+            threshold = heapq.nsmallest(count, distances)[-1]
+            indices = [i for i, d in enumerate(distances) if d <= threshold]
+            indices.sort(key=lambda i: (distances[i], i))
+        return [
+            (int(distances[i]), group.refs[i])
+            for i in indices
+            if group.refs[i] != exclude
+        ][:k]
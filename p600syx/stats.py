@@ -0,0 +1,148 @@
+"""
+This module contains counters and timers for the stages of the decoding
+pipeline. Instrumentation replaces the methods of single objects by timed
+wrappers, so objects that are not instrumented run without any overhead.
+"""
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterable, Iterator
+import functools
+import time
+from typing import Any, TypeVar
+
+from .error import ParseError
+
+T = TypeVar("T")
+
+# stages in the order of the pipeline
+STAGES = ["framing", "dispatch", "decode", "unpack", "output", "format"]
+
+
+class Stats:
+    """
+    This class collects call counts, processed bytes, time and parse errors
+    per parser and pipeline stage. Times of nested stages are included in
+    the time of the enclosing stage, e.g. unpacking is part of decoding and
+    formatting is part of the output.
+    """
+
+    def __init__(self) -> None:
+        self.calls: Counter[tuple[str, str]] = Counter()
+        self.bytes: Counter[tuple[str, str]] = Counter()
+        self.seconds: defaultdict[tuple[str, str], float] = defaultdict(float)
+        self.errors: Counter[tuple[str, str]] = Counter()
+
+    def record(
+        self, name: str, stage: str, seconds: float, nbytes: int = 0
+    ) -> None:
+        """
+        This function records a single call.
+
+        Parameters:
+                name (str): parser name, or the component name for stages
+                            not belonging to a parser
+                stage (str): pipeline stage, see STAGES
+                seconds (float): duration of the call
+                nbytes (int): number of processed bytes
+        """
+        key = (name, stage)
+        self.calls[key] += 1
+        self.bytes[key] += nbytes
+        self.seconds[key] += seconds
+
+    def timed(
+        self, func: Callable[..., T], name: str, stage: str
+    ) -> Callable[..., T]:
+        """
+        This function wraps a function such that its calls are recorded.
+        The size of a bytestring passed as first argument is recorded as
+        processed bytes, and raised parse errors are counted.
+
+        Parameters:
+                func (callable): function to wrap
+                name (str): see record
+                stage (str): see record
+        Returns:
+                The wrapped function.
+        """
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            nbytes = 0
+            if args and isinstance(args[0], (bytes, bytearray, memoryview)):
+                nbytes = len(args[0])
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except ParseError:
+                self.errors[(name, stage)] += 1
+                raise
+            finally:
+                self.record(name, stage, time.perf_counter() - start, nbytes)
+
+        return wrapper
+
+    def timed_iter(
+        self, iterable: Iterable[T], name: str, stage: str
+    ) -> Iterator[T]:
+        """
+        This function wraps an iterable such that the time for producing
+        each item is recorded.
+
+        Parameters:
+                iterable (iterable): iterable to wrap
+                name (str): see record
+                stage (str): see record
+        Returns:
+                An iterator over the items of the iterable.
+        """
+        it = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            nbytes = len(item) if isinstance(item, (bytes, memoryview)) else 0
+            self.record(name, stage, time.perf_counter() - start, nbytes)
+            yield item
+
+    def merge(self, other: "Stats") -> None:
+        """
+        This function adds the statistics collected by another object, e.g.
+        in a different process.
+
+        Parameters:
+                other (Stats): statistics to add
+        """
+        self.calls.update(other.calls)
+        self.bytes.update(other.bytes)
+        for key, seconds in other.seconds.items():
+            self.seconds[key] += seconds
+        self.errors.update(other.errors)
+
+    def report(self) -> str:
+        """
+        This function summarizes the collected statistics as a table.
+
+        Returns:
+                A string containing one line per parser and stage.
+        """
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        keys = sorted(
+            self.calls,
+            key=lambda key: (order.get(key[1], len(order)), key[0]),
+        )
+        lines = [
+            f"{'Stage':10} {'Name':24} {'Calls':>9} {'Bytes':>11}"
+            f" {'Time (s)':>9} {'us/call':>9} {'Errors':>6}"
+        ]
+        for name, stage in keys:
+            calls = self.calls[(name, stage)]
+            nbytes = self.bytes[(name, stage)]
+            seconds = self.seconds[(name, stage)]
+            errors = self.errors[(name, stage)]
+            lines.append(
+                f"{stage:10} {name:24} {calls:9} {nbytes:11}"
+                f" {seconds:9.3f} {seconds / calls * 1e6:9.1f} {errors:6}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,215 @@
+"""
+This module contains the delta synchronization of p600_send. The patches of
+a bank are compared slot by slot with the patches stored on a device, so
+only programs that differ have to be sent. The patches stored on a device
+are either requested via MIDI or taken from the cache containing the state
+of every port after the last synchronization, see the cache module.
+"""
+from collections.abc import Iterable
+from typing import Any, NamedTuple, Optional
+
+from .cache import cache_path
+from .diff import SLOT_DIFFERENT, SLOT_ONLY_B, Difference, diff_banks
+from .error import ParseError
+from .framing import iter_sysex, open_sysex_file
+from .patch import Patch
+from .receiver import PatchReceiver, ReceiveStats
+from .registry import factory
+
+
+class Change(NamedTuple):
+    """
+    This class describes a program that has to be sent to a device.
+    """
+
+    program: int
+    # SLOT_DIFFERENT, or SLOT_ONLY_B if the program on the device is unknown
+    status: str
+    differences: list[Difference]
+
+
+def read_messages(path: str) -> list[tuple[Optional[int], bytes]]:
+    """
+    This function reads the messages of a SysEx file in file order.
+
+    Parameters:
+            path (str): SysEx file name
+    Returns:
+            A list of tuples containing the program number of a patch dump
+            or None for other messages, e.g. firmware chunks, and the
+            message including 0xf0 and 0xf7.
+    """
+    messages: list[tuple[Optional[int], bytes]] = []
+    with open_sysex_file(path) as f:
+        for msg in iter_sysex(f):
+            data = bytes(msg) + b"\xf7"
+            parser = factory.get_parser(msg)
+            program = None
+            try:
+                if parser:
+                    program = parser.peek_program(msg)
+            except ParseError:
+                pass
+            messages.append((program, data))
+    return messages
+
+
+def read_dumps(path: str) -> tuple[dict[int, bytes], list[bytes]]:
+    """
+    This function reads the messages of a SysEx file. If a program is
+    contained several times, the last dump wins like on the device.
+
+    Parameters:
+            path (str): SysEx file name
+    Returns:
+            A tuple containing a dictionary mapping program numbers to patch
+            dumps and a list of all other messages in file order, e.g.
+            firmware chunks. All messages include 0xf0 and 0xf7.
+    """
+    messages = read_messages(path)
+    dumps = {program: data for program, data in messages if program is not None}
+    others = [data for program, data in messages if program is None]
+    return (dumps, others)
+
+
+def select_messages(
+    messages: list[tuple[Optional[int], bytes]], programs: Iterable[int]
+) -> list[bytes]:
+    """
+    This function selects the messages that have to be sent for storing
+    the changed programs of a bank, keeping the order of the file. Patch
+    dumps of other programs and dumps overwritten by a later dump of the
+    same program are skipped, all other messages are kept.
+
+    Parameters:
+            messages (list): messages of a file, see 'read_messages'
+            programs (iterable): program numbers of the changed patches
+    Returns:
+            A list of messages including 0xf0 and 0xf7.
+    """
+    # position of the last dump of every program
+    last = {program: i for i, (program, _) in enumerate(messages)}
+    selected = set(programs)
+    return [
+        data
+        for i, (program, data) in enumerate(messages)
+        if program is None or program in selected and last[program] == i
+    ]
+
+
+def decode_dumps(dumps: dict[int, bytes]) -> dict[int, Patch]:
+    """
+    This function decodes patch dumps. Dumps that cannot be decoded are
+    skipped.
+
+    Parameters:
+            dumps (dict): patch dumps by program number, see 'read_dumps'
+    Returns:
+            A dictionary mapping program numbers to patches.
+    """
+    patches = {}
+    for program, msg in dumps.items():
+        parser = factory.get_parser(msg)
+        if not parser:
+            continue
+        try:
+            patches[program] = parser.decode(msg, lazy=True)[1]
+        except ParseError:
+            continue
+    return patches
+
+
+def compare_dumps(
+    target: dict[int, bytes], current: dict[int, bytes]
+) -> list[Change]:
+    """
+    This function determines the programs that have to be sent to a device
+    for storing a bank. The patches are compared by their parameter names
+    and values, see diff.patch_hash, so patches in different storage
+    formats always differ.
+
+    Parameters:
+            target (dict): patch dumps that should be stored on the device
+            current (dict): patch dumps currently stored on the device,
+                            programs that are missing are sent
+    Returns:
+            A list of changes in program order.
+    """
+    target_patches = decode_dumps(target)
+    changes = [
+        Change(program, status, differences)
+        for program, status, differences in diff_banks(
+            decode_dumps(current), target_patches
+        )
+        if status in (SLOT_DIFFERENT, SLOT_ONLY_B)
+    ]
+    # dumps that cannot be decoded are sent unless they are identical
+    changes += [
+        Change(program, SLOT_DIFFERENT, [])
+        for program, msg in target.items()
+        if program not in target_patches and current.get(program) != msg
+    ]
+    return sorted(changes)
+
+
+def fetch_dumps(
+    inport: Any, outport: Any, programs: Iterable[int], **kwargs: Any
+) -> tuple[dict[int, bytes], ReceiveStats]:
+    """
+    This function requests patch dumps from a device like p600_recv.
+
+    Parameters:
+            inport (object): mido input port
+            outport (object): mido output port
+            programs (iterable): program numbers
+            kwargs: see PatchReceiver
+    Returns:
+            A tuple containing the received dumps by program number and the
+            statistics of the transfer. Programs that could not be received
+            are missing.
+    """
+    receiver = PatchReceiver.for_ports(inport, outport, **kwargs)
+    dumps = receiver.receive(programs)
+    return (dumps, receiver.stats)
+
+
+def load_cache(port: str, directory: Optional[str] = None) -> dict[int, bytes]:
+    """
+    This function reads the cached bank of a port.
+
+    Parameters:
+            port (str): output port name
+            directory (str): cache directory, see cache.cache_dir
+    Returns:
+            A dictionary mapping program numbers to patch dumps, empty if
+            the port has no cached bank.
+    """
+    try:
+        return read_dumps(cache_path(port, directory))[0]
+    except FileNotFoundError:
+        return {}
+
+
+def describe(change: Change, limit: int = 5) -> str:
+    """
+    This function formats a change for reports.
+
+    Parameters:
+            change (Change): change of a program
+            limit (int): maximum number of listed parameter names
+    Returns:
+            A single line.
+    """
+    if change.status == SLOT_ONLY_B:
+        return f"Program {change.program:02}: unknown on device"
+    if not change.differences:
+        return f"Program {change.program:02}: different"
+    names = [name for name, _, _ in change.differences]
+    listed = ", ".join(names[:limit])
+    if len(names) > limit:
+        listed += ", ..."
+    plural = "s" if len(names) > 1 else ""
+    return (
+        f"Program {change.program:02}: {len(names)} changed"
+        f" parameter{plural} ({listed})"
+    )
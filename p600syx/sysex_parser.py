@@ -2,6 +2,13 @@
 This module contains the abstract base class for all parsers in p600syx.
 """
 from abc import ABCMeta, abstractmethod
+from typing import Literal, Union, overload
+
+from .patch import Patch
+from .stats import Stats
+
+# MIDI SysEx messages are accepted as bytestrings or views thereof
+SysExMessage = Union[bytes, memoryview]
 
 
 class SysExParser(metaclass=ABCMeta):
@@ -9,11 +16,27 @@ class SysExParser(metaclass=ABCMeta):
     This class is the abstract base for all parsers in p600syx.
     """
 
+    # methods recorded by instrument, mapped to their pipeline stage
+    instrumented_methods = {"decode": "decode", "decode_many": "decode"}
+
     def __init__(self, name: str) -> None:
         self.name = name
+        self.header = b""
+
+    def prefixes(self) -> tuple[bytes, ...]:
+        """
+        This function returns the prefixes of all messages the parser can
+        decode. The factory uses them for looking up parsers by the
+        manufacturer ID of a message. Parsers returning no prefixes are
+        queried for every message.
+
+        Returns:
+                A tuple of bytestrings starting with 0xf0.
+        """
+        return (self.header,) if self.header else ()
 
     @abstractmethod
-    def can_decode(self, msg: bytes) -> bool:
+    def can_decode(self, msg: SysExMessage) -> bool:
         """
         This function checks if the parser can decode a given MIDI SysEx dump
         using the header of the data.
@@ -25,18 +48,68 @@ class SysExParser(metaclass=ABCMeta):
                 True if parser can decode dump, False otherwise.
         """
 
-    @abstractmethod
+    @overload
     def decode(
-        self, msg: bytes
+        self, msg: SysExMessage, lazy: Literal[False] = False
     ) -> tuple[int, list[tuple[str, int]], list[int]]:
+        ...
+
+    @overload
+    def decode(
+        self, msg: SysExMessage, lazy: Literal[True]
+    ) -> tuple[int, Patch, list[int]]:
+        ...
+
+    @abstractmethod
+    def decode(
+        self, msg: SysExMessage, lazy: bool = False
+    ) -> tuple[int, Union[list[tuple[str, int]], Patch], list[int]]:
         """
         This function decodes a MIDI SysEx dump. created using
 
+        Parameter:
+                msg (bytes): MIDI SysEx dump
+                lazy (bool): return the parameters as a Patch object, which
+                             decodes values only when they are accessed
+
+        Returns:
+                A tuple containing the program number, a list of parameters
+                or a Patch object, and (possibly) a list of remaining integer
+                data that was not or could not be decoded.
+        """
+
+    def peek_program(self, msg: SysExMessage) -> int:
+        """
+        This function returns the program number of a MIDI SysEx dump
+        without decoding its parameters. Parsers should override the default
+        implementation, which decodes the whole message.
+
         Parameter:
                 msg (bytes): MIDI SysEx dump
 
         Returns:
-                A tuple containing the program number, a list of parameters,
-                and (possibly) a list of remaining integer data that was not or
-                could not be decoded.
+                The program number.
+        """
+        return self.decode(msg)[0]
+
+    def instrument(self, stats: Stats) -> None:
+        """
+        This function records all calls of the methods listed in
+        'instrumented_methods' in a statistics object until uninstrument is
+        called. Other parser objects are not affected.
+
+        Parameters:
+                stats (Stats): statistics object
+        """
+        self.uninstrument()
+        for method, stage in self.instrumented_methods.items():
+            func = getattr(self, method, None)
+            if func is not None:
+                setattr(self, method, stats.timed(func, self.name, stage))
+
+    def uninstrument(self) -> None:
+        """
+        This function stops recording the calls of this parser.
         """
+        for method in self.instrumented_methods:
+            self.__dict__.pop(method, None)
@@ -1,4 +1,6 @@
 import argparse
+from collections.abc import Sequence
+import fnmatch
 import os
 from typing import Any, Optional, Set
 
@@ -55,3 +57,173 @@ def get_port(ports: Set[Any], port: Optional[str] = None) -> Optional[str]:
         selected_port = ports.pop()
 
     return selected_port
+
+
+def is_port_pattern(port: str) -> bool:
+    """
+    This function checks if a port name contains shell-style wildcards.
+    """
+    return any(c in port for c in "*?[")
+
+
+def get_ports(ports: Set[Any], selection: Sequence[str] = ()) -> list[str]:
+    """
+    This function resolves several port names or shell-style patterns, e.g.
+    'Prophet*' or '*' for all ports.
+
+    Parameters:
+            ports (set): available port names
+            selection (list): port names or patterns, empty for the only
+                              available port, see 'get_port'
+    Returns:
+            A list of port names in the order of the selection, the ports
+            matching a pattern are sorted by name.
+    """
+    if not selection:
+        return [str(get_port(set(ports)))]
+    selected: list[str] = []
+    for port in selection:
+        if port in ports:
+            matches = [port]
+        elif is_port_pattern(port):
+            matches = sorted(fnmatch.filter(ports, port))
+            if not matches:
+                raise MIDIError(
+                    f"No MIDI port matches {port!r}. Available: {ports}"
+                )
+        else:
+            raise MIDIError(f"Selected port {port!r} is not available")
+        selected += [match for match in matches if match not in selected]
+    return selected
+
+
+def get_port_pairs(
+    inports: Set[Any], outports: Set[Any], selection: Sequence[str] = ()
+) -> list[tuple[str, str]]:
+    """
+    This function resolves the input and output ports of several devices.
+    The ports of a device are paired by their name, like 'get_port' selects
+    the same name for input and output.
+
+    Parameters:
+            inports (set): available input port names
+            outports (set): available output port names
+            selection (list): port names or patterns, empty for the only
+                              available input and output port, see
+                              'get_ports'
+    Returns:
+            A list of tuples containing the input and output port name of
+            every device.
+    """
+    if not selection:
+        return [(str(get_port(set(inports))), str(get_port(set(outports))))]
+    names = get_ports(set(inports) | set(outports), selection)
+    unpaired = [
+        name for name in names if name not in inports or name not in outports
+    ]
+    if unpaired:
+        raise MIDIError(
+            f"No matching input and output port for {unpaired}."
+            f" Input ports: {inports}, output ports: {outports}"
+        )
+    return [(name, name) for name in names]
+
+
+def _emulated() -> bool:
+    # emulated ports are added to the ports of the mido backend, see
+    # emulator.py
+    return bool(os.environ.get("P600_EMULATOR"))
+
+
+def _backend_names(kind: str) -> list[str]:
+    import mido  # type: ignore
+
+    try:
+        return list(getattr(mido, f"get_{kind}_names")())
+    except (ImportError, OSError):
+        # the emulator does not need a working MIDI backend
+        if not _emulated():
+            raise
+        return []
+
+
+def _is_emulated_port(name: Optional[str]) -> bool:
+    if not name or not _emulated():
+        return False
+    from .emulator import PORT_PREFIX
+
+    return name.startswith(PORT_PREFIX)
+
+
+def get_input_names() -> list[str]:
+    """
+    This function returns the names of all MIDI input ports of the mido
+    backend and of the emulated devices, if enabled by the environment
+    variable P600_EMULATOR.
+    """
+    names = _backend_names("input")
+    if _emulated():
+        from .emulator import get_port_names
+
+        names += get_port_names()
+    return names
+
+
+def get_output_names() -> list[str]:
+    """
+    This function returns the names of all MIDI output ports, see
+    'get_input_names'.
+    """
+    names = _backend_names("output")
+    if _emulated():
+        from .emulator import get_port_names
+
+        names += get_port_names()
+    return names
+
+
+def open_input(name: Optional[str] = None, **kwargs: Any) -> Any:
+    """
+    This function opens a MIDI input port of the mido backend or of an
+    emulated device.
+
+    Parameters:
+            name (str): port name
+            kwargs: passed to the port, e.g. 'callback'
+    Returns:
+            The mido input port.
+    """
+    if _is_emulated_port(name):
+        from .emulator import Input
+
+        return Input(name, **kwargs)
+    import mido
+
+    return mido.open_input(name, **kwargs)
+
+
+def open_output(name: Optional[str] = None, **kwargs: Any) -> Any:
+    """
+    This function opens a MIDI output port, see 'open_input'.
+    """
+    if _is_emulated_port(name):
+        from .emulator import Output
+
+        return Output(name, **kwargs)
+    import mido
+
+    return mido.open_output(name, **kwargs)
+
+
+def find_files(paths: list[str], pattern: str = "*.syx") -> list[str]:
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in sorted(names):
+                if fnmatch.fnmatch(name.lower(), pattern):
+                    files.append(os.path.join(root, name))
+    return files
@@ -0,0 +1,129 @@
+"""
+This module contains helpers for driving several MIDI devices at the same
+time. Every device is handled by its own worker thread, so the total time is
+that of the slowest device, and an error on one device does not affect the
+others.
+"""
+from collections.abc import Callable, Sequence
+import os
+import threading
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class SharedProgress:
+    """
+    This class combines the progress of several workers in a single progress
+    bar. If there is more than one worker, the number of processed items of
+    every worker is shown after the bar in the order of the ports.
+    """
+
+    def __init__(
+        self, message: str, ports: Sequence[str], total: int, bar: bool = True
+    ) -> None:
+        """
+        Parameters:
+                message (str): label of the progress bar
+                ports (list): port names of the workers
+                total (int): number of items of all workers
+                bar (bool): show the progress bar, otherwise the progress is
+                            only counted
+        """
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(ports, 0)
+        self.bar: Any = None
+        if bar:
+            from progress.bar import IncrementalBar  # type: ignore
+
+            self.bar = IncrementalBar(message, max=total)
+
+    def next(self, port: str, count: int = 1) -> None:
+        """
+        This function records processed items.
+
+        Parameters:
+                port (str): port name of the worker
+                count (int): number of items, e.g. bytes
+        """
+        with self.lock:
+            self.counts[port] += count
+            if self.bar is None:
+                return
+            if len(self.counts) > 1:
+                counts = " ".join(str(count) for count in self.counts.values())
+                self.bar.suffix = f"%(index)d/%(max)d [{counts}]"
+            self.bar.next(count)
+
+    def finish(self) -> None:
+        """
+        This function completes the progress bar.
+        """
+        with self.lock:
+            if self.bar is not None:
+                self.bar.finish()
+
+
+def run_workers(
+    ports: Sequence[str], func: Callable[[str], T]
+) -> tuple[dict[str, T], dict[str, Exception]]:
+    """
+    This function calls a function for every port in a separate thread and
+    waits until all calls have returned. A single port is handled in the
+    calling thread.
+
+    Parameters:
+            ports (list): port names
+            func (callable): function called with a port name
+    Returns:
+            A tuple containing the return values and the raised exceptions,
+            both by port name.
+    """
+    results: dict[str, T] = {}
+    errors: dict[str, Exception] = {}
+
+    def work(port: str) -> None:
+        try:
+            results[port] = func(port)
+        except Exception as e:
+            errors[port] = e
+
+    if len(ports) == 1:
+        work(ports[0])
+        return (results, errors)
+    threads = [
+        threading.Thread(target=work, args=(port,), name=port, daemon=True)
+        for port in ports
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (
+        {port: results[port] for port in ports if port in results},
+        {port: errors[port] for port in ports if port in errors},
+    )
+
+
+def port_path(path: str, port: str, multiple: bool = True) -> str:
+    """
+    This function derives the name of the output file of a port. A
+    placeholder '{port}' in the file name is replaced by the port name,
+    otherwise the port name is appended to the base name if several ports
+    are used, e.g. 'bank-Prophet-600_MIDI_1.syx'.
+
+    Parameters:
+            path (str): output file name given by the user
+            port (str): port name
+            multiple (bool): several ports are used
+    Returns:
+            The output file name.
+    """
+    safe = "".join(c if c.isalnum() or c in "-." else "_" for c in port)
+    safe = safe.strip("_") or "port"
+    if "{port}" in path:
+        return path.replace("{port}", safe)
+    if not multiple:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}-{safe}{ext}"
@@ -17,7 +17,21 @@ setup(
     use_scm_version={"local_scheme": "no-local-version"},
     setup_requires=["setuptools_scm"],
     install_requires=["appdirs", "mido", "progress", "python-rtmidi"],
-    scripts=["p600_decode", "p600_recv", "p600_send"],
+    extras_require={"similarity": ["numpy"]},
+    entry_points={
+        "p600syx.parsers": [
+            "sequential = p600syx.sequential_sysex_parser:SequentialSysExParser",
+            "gligli = p600syx.gligli_sysex_parser:GliGliSysExParser",
+        ],
+    },
+    scripts=[
+        "p600_decode",
+        "p600_diff",
+        "p600_library",
+        "p600_recv",
+        "p600_send",
+        "p600_similar",
+    ],
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
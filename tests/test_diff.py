@@ -0,0 +1,125 @@
+"""
+Tests of the content hashes and bank comparisons of p600_diff.
+"""
+from pathlib import Path
+from typing import Optional
+
+from p600syx.diff import (
+    SLOT_DIFFERENT,
+    SLOT_IDENTICAL,
+    SLOT_ONLY_A,
+    SLOT_ONLY_B,
+    HashIndex,
+    PatchRef,
+    diff_banks,
+    diff_patches,
+    load_bank,
+    normalize,
+    patch_hash,
+)
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.patch import Patch
+
+
+def dump(
+    program: int,
+    values: Optional[dict[str, int]] = None,
+    name: str = "",
+    version: int = 8,
+) -> bytes:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(version)
+    assert layout is not None
+    values = dict(values or {})
+    for i, char in enumerate(name):
+        values[f"Patch Name ({i + 1:02}/16)"] = ord(char)
+    parameters = [values.get(name, 0) for name in layout.names]
+    return parser.encode(program, parameters, version)
+
+
+def patch(program: int, values: Optional[dict[str, int]] = None) -> Patch:
+    parser = GliGliSysExParser()
+    _, result, _ = parser.decode(dump(program, values), lazy=True)
+    return result
+
+
+def test_patch_hash() -> None:
+    a = patch(0, {"Cutoff": 100})
+    assert len(patch_hash(a)) == 16
+    # program numbers and unused parameters are ignored
+    assert patch_hash(a) == patch_hash(patch(7, {"Cutoff": 100}))
+    assert patch_hash(a) == patch_hash(patch(0, {"Cutoff": 100, "(unused)": 3}))
+    assert patch_hash(a) != patch_hash(patch(0, {"Cutoff": 101}))
+    assert "(unused)" not in normalize(a)
+    assert normalize(a)["Cutoff"] == 100
+
+
+def test_hash_index(tmp_path: Path) -> None:
+    first = tmp_path / "first.syx"
+    first.write_bytes(
+        dump(0, {"Cutoff": 1}, "Bass")
+        + dump(1, {"Cutoff": 2})
+        + dump(2, {"Cutoff": 1}, "Bass")
+    )
+    second = tmp_path / "second.syx"
+    second.write_bytes(dump(5, {"Cutoff": 2}) + dump(6, {"Cutoff": 3}))
+    index = HashIndex()
+    assert index.add_file(str(first)) == 3
+    assert index.add_file(str(second)) == 2
+    assert index.count == 5
+    assert len(index) == 3
+    groups = [refs for _, refs in index.duplicates()]
+    assert groups == [
+        [
+            PatchRef(str(first), 0, 0, "Bass"),
+            PatchRef(str(first), 2, 2, "Bass"),
+        ],
+        [PatchRef(str(first), 1, 1, ""), PatchRef(str(second), 0, 5, "")],
+    ]
+    ref = PatchRef("-", 0, 9, None)
+    digest = index.add(ref, patch(9, {"Cutoff": 3}))
+    assert index.entries[digest][-1] == ref
+    assert len(index.duplicates()) == 3
+
+
+def test_diff_banks(tmp_path: Path) -> None:
+    path_a = tmp_path / "a.syx"
+    path_a.write_bytes(
+        dump(0)
+        + dump(1, {"Cutoff": 1})
+        + dump(2, {"Cutoff": 5, "Resonance": 1})
+        + dump(3)
+    )
+    path_b = tmp_path / "b.syx"
+    path_b.write_bytes(
+        dump(2, {"Cutoff": 9})
+        + dump(0, {"(unused)": 1})
+        + dump(1, {"Cutoff": 2})
+        + dump(1, {"Cutoff": 1})
+        + dump(4)
+    )
+    a = load_bank(str(path_a))
+    b = load_bank(str(path_b))
+    # the last dump of a program wins
+    assert b[1].program == 1 and normalize(b[1])["Cutoff"] == 1
+    assert list(diff_banks(a, b)) == [
+        (0, SLOT_IDENTICAL, []),
+        (1, SLOT_IDENTICAL, []),
+        (
+            2,
+            SLOT_DIFFERENT,
+            [("Cutoff", 5, 9), ("Resonance", 1, 0)],
+        ),
+        (3, SLOT_ONLY_A, []),
+        (4, SLOT_ONLY_B, []),
+    ]
+
+
+def test_diff_versions() -> None:
+    parser = GliGliSysExParser()
+    _, old, _ = parser.decode(dump(0, version=7), lazy=True)
+    new = patch(0)
+    differences = diff_patches(old, new)
+    assert differences
+    assert all(a is None and b is not None for _, a, b in differences)
+    assert [(n, b, a) for n, a, b in diff_patches(new, old)] == differences
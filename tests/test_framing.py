@@ -0,0 +1,110 @@
+"""
+Tests of the splitting of byte streams into SysEx messages.
+"""
+import io
+from pathlib import Path
+
+import pytest
+
+from p600syx import framing
+from p600syx.framing import (
+    SysExFramer,
+    iter_sysex,
+    iter_sysex_with_offsets,
+    open_sysex_file,
+)
+
+CASES = [
+    # input, expected offsets and messages without terminating byte
+    (b"", []),
+    (b"\x01\x02", []),
+    (
+        b"\x01\xf0\x01\x02\xf7\x03\xf0\x04\xf7",
+        [(1, b"\xf0\x01\x02"), (6, b"\xf0\x04")],
+    ),
+    # a stray start byte interrupts a message
+    (b"\xf0\x01\x02\xf0\x03\xf7", [(3, b"\xf0\x03")]),
+    # resync on the last start byte before the terminating byte
+    (
+        b"\xf0\x01\xf0\x02\xf0\x03\xf7\xf0\x04\xf7",
+        [(4, b"\xf0\x03"), (7, b"\xf0\x04")],
+    ),
+    # the terminating byte is missing at the end of the input
+    (b"\xf0\x01\xf7\xf0\x02\x03", [(0, b"\xf0\x01")]),
+    (b"\xf0\x01\x02", []),
+    # a truncated message followed by a complete one
+    (b"\xf0\x01\x02\xf0\xf7\xf7", [(3, b"\xf0")]),
+]
+
+
+def frame(data: bytes, chunk_size: int) -> list[tuple[int, bytes]]:
+    framer = SysExFramer()
+    result = []
+    for i in range(0, len(data), chunk_size):
+        for offset, msg in framer.feed_with_offsets(data[i : i + chunk_size]):
+            result.append((offset, bytes(msg)))
+    return result
+
+
+@pytest.mark.parametrize("data,expected", CASES)
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 1 << 16])
+def test_framer(
+    data: bytes, expected: list[tuple[int, bytes]], chunk_size: int
+) -> None:
+    assert frame(data, chunk_size) == expected
+
+
+@pytest.mark.parametrize("data,expected", CASES)
+def test_stream(
+    data: bytes,
+    expected: list[tuple[int, bytes]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(framing, "CHUNK_SIZE", 2)
+    messages = iter_sysex_with_offsets(io.BytesIO(data))
+    assert [(offset, bytes(msg)) for offset, msg in messages] == expected
+
+
+@pytest.mark.parametrize("data,expected", CASES)
+def test_mapped(
+    data: bytes, expected: list[tuple[int, bytes]], tmp_path: Path
+) -> None:
+    path = tmp_path / "messages.syx"
+    path.write_bytes(data)
+    with open(path, "rb") as f:
+        # empty files cannot be mapped
+        assert framing._is_mappable(f) == bool(data)
+        messages = list(iter_sysex_with_offsets(f))
+        # the messages stay valid after the iteration finished
+        assert [(offset, bytes(msg)) for offset, msg in messages] == expected
+        f.seek(0)
+        assert [bytes(msg) for msg in iter_sysex(f)] == [
+            msg for _, msg in expected
+        ]
+
+
+def test_terminated(tmp_path: Path) -> None:
+    data = b"\xf0\x01\xf7\x00\xf0\x02\xf0\x03\xf7"
+    expected = [(0, b"\xf0\x01\xf7"), (6, b"\xf0\x03\xf7")]
+    framer = SysExFramer(terminated=True)
+    messages = [framer.feed_with_offsets(data[i : i + 1]) for i in range(9)]
+    assert [(o, bytes(m)) for chunk in messages for o, m in chunk] == expected
+    path = tmp_path / "messages.syx"
+    path.write_bytes(data)
+    with open(path, "rb") as f:
+        mapped = iter_sysex_with_offsets(f, terminated=True)
+        assert [(o, bytes(m)) for o, m in mapped] == expected
+
+
+def test_open_sysex_file(tmp_path: Path) -> None:
+    binary = tmp_path / "binary.syx"
+    binary.write_bytes(b"\xf0\x01\xf7")
+    text = tmp_path / "text.syx"
+    text.write_text("F0 01 F7\nf0 02\n f7\n")
+    with open_sysex_file(str(binary)) as f:
+        assert [bytes(msg) for msg in iter_sysex(f)] == [b"\xf0\x01"]
+    with open_sysex_file(str(text)) as f:
+        assert [bytes(msg) for msg in iter_sysex(f)] == [
+            b"\xf0\x01",
+            b"\xf0\x02",
+        ]
@@ -0,0 +1,74 @@
+"""
+Tests of the sidecar index of SysEx files.
+"""
+from collections.abc import Callable
+import os
+from pathlib import Path
+
+import pytest
+
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.index import OffsetIndex, open_index, sidecar_path
+
+Corrupt = Callable[[bytes], bytes]
+
+
+def write_bank(path: Path, count: int) -> list[bytes]:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(8)
+    assert layout is not None
+    msgs = [
+        parser.encode(program, [program] * len(layout.names))
+        for program in range(count)
+    ]
+    path.write_bytes(b"".join(msgs))
+    return msgs
+
+
+def load(path: Path) -> OffsetIndex:
+    with open(path, "rb") as f:
+        return open_index(str(path), f)
+
+
+def test_open_index(tmp_path: Path) -> None:
+    path = tmp_path / "bank.syx"
+    msgs = write_bank(path, 5)
+    index = load(path)
+    assert os.path.exists(sidecar_path(str(path)))
+    assert index.select(program=3) == [3]
+    with open(path, "rb") as f:
+        # messages are returned without the terminating 0xf7
+        assert index.read(f, 3) == msgs[3][:-1]
+    assert load(path).to_bytes() == index.to_bytes()
+
+
+def test_stale_index(tmp_path: Path) -> None:
+    path = tmp_path / "bank.syx"
+    write_bank(path, 5)
+    load(path)
+    write_bank(path, 8)
+    os.utime(path, ns=(0, 0))
+    assert len(load(path)) == 8
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda data: data[:-3],
+        lambda data: data + b"\x00",
+        lambda data: data[:20],
+        lambda data: data[:36] + b"\xff\xfe" + data[38:],
+        lambda data: bytes(len(data)),
+    ],
+    ids=["truncated", "padded", "header", "names", "zeros"],
+)
+def test_corrupt_index(tmp_path: Path, corrupt: Corrupt) -> None:
+    path = tmp_path / "bank.syx"
+    write_bank(path, 5)
+    expected = load(path).to_bytes()
+    index_path = Path(sidecar_path(str(path)))
+    index_path.write_bytes(corrupt(index_path.read_bytes()))
+    assert OffsetIndex.from_bytes(index_path.read_bytes()) is None
+    assert load(path).to_bytes() == expected
+    # the index is rebuilt and saved
+    assert index_path.read_bytes() == expected
@@ -0,0 +1,84 @@
+"""
+Tests of the persistent patch library.
+"""
+import os
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+import pytest
+
+from p600syx import library as library_module
+from p600syx.framing import iter_sysex_with_offsets
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.library import PatchLibrary, column_name
+
+
+def dump(program: int, **values: int) -> bytes:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(8)
+    assert layout is not None
+    parameters = [
+        values.get(name.replace(" ", "_"), 0) for name in layout.names
+    ]
+    return parser.encode(program, parameters)
+
+
+def test_column_name() -> None:
+    assert column_name("Filter Envelope Amount") == "filter_envelope_amount"
+    assert column_name("Cutoff (max: 255)") == "cutoff"
+    assert column_name("program") == "p_program"
+    assert column_name("(unused)") == "unused"
+
+
+def test_ingest_and_query(tmp_path: Path) -> None:
+    path = tmp_path / "bank.syx"
+    path.write_bytes(dump(0, Cutoff=100) + dump(1, Cutoff=200))
+    with PatchLibrary(str(tmp_path / "library.sqlite")) as library:
+        assert library.ingest(str(path)) == 2
+        rows = library.query("cutoff > ?", (150,))
+        assert [(row["program"], row["cutoff"]) for row in rows] == [(1, 200)]
+        assert rows[0]["path"] == str(path)
+        assert len(library.query(limit=1)) == 1
+        # repeated names are stored in separate columns
+        assert library.columns["(unused)"] == "unused"
+        assert library.columns["(unused) 2"] == "unused_2"
+
+
+def test_ingest_unchanged_and_changed_file(tmp_path: Path) -> None:
+    path = tmp_path / "bank.syx"
+    path.write_bytes(dump(0, Cutoff=100))
+    database = str(tmp_path / "library.sqlite")
+    with PatchLibrary(database) as library:
+        assert library.ingest(str(path)) == 1
+        assert library.ingest(str(path)) is None
+        # same contents with a new modification time
+        os.utime(path, (0, 0))
+        assert library.ingest(str(path)) is None
+        path.write_bytes(dump(0, Cutoff=50) + dump(1))
+        assert library.ingest(str(path)) == 2
+    with PatchLibrary(database) as library:
+        assert library.ingest(str(path)) is None
+        assert [row["cutoff"] for row in library.query()] == [50, 0]
+
+
+def test_failed_ingest_restores_columns(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path = tmp_path / "bank.syx"
+    path.write_bytes(dump(0) + dump(1))
+
+    def failing(f: BinaryIO) -> Iterator[tuple[int, memoryview]]:
+        yield from iter_sysex_with_offsets(f)
+        raise OSError("read error")
+
+    monkeypatch.setattr(library_module, "iter_sysex_with_offsets", failing)
+    with PatchLibrary(str(tmp_path / "library.sqlite")) as library:
+        with pytest.raises(OSError):
+            library.ingest(str(path))
+        assert library.columns == {}
+        assert library.query() == []
+        monkeypatch.setattr(
+            library_module, "iter_sysex_with_offsets", iter_sysex_with_offsets
+        )
+        assert library.ingest(str(path)) == 2
+        assert len(library.query()) == 2
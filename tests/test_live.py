@@ -0,0 +1,105 @@
+"""
+Tests of the decoding of live input, see p600_decode --listen.
+"""
+import io
+import json
+from typing import Any
+
+from p600syx.decoding import LiveDecoder
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.output import (
+    JsonlWriter,
+    TextWriter,
+    format_patch,
+    unique_names,
+)
+
+
+def dump(program: int, cutoff: int = 0, resonance: int = 0) -> bytes:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(8)
+    assert layout is not None
+    values = {"Cutoff": cutoff, "Resonance": resonance}
+    parameters = [values.get(name, 0) for name in layout.names]
+    return parser.encode(program, parameters)
+
+
+def parameters(msg: bytes) -> list[tuple[str, int]]:
+    _, result, _ = GliGliSysExParser().decode(msg)
+    return result
+
+
+def record(msg: bytes) -> dict[str, int]:
+    names, values = zip(*parameters(msg))
+    return dict(zip(unique_names(names), values))
+
+
+def test_live_text() -> None:
+    out = io.BytesIO()
+    err = io.StringIO()
+    with TextWriter(out) as writer:
+        decoder = LiveDecoder(writer, err=err)
+
+        def written(data: bytes) -> str:
+            # the writer is flushed after every patch
+            start = len(out.getvalue())
+            decoder.feed(data)
+            return out.getvalue()[start:].decode()
+
+        first = dump(0, cutoff=1)
+        assert written(first) == format_patch(0, parameters(first))
+        assert written(first) == ""
+        assert written(dump(0, cutoff=2)) == format_patch(0, [("Cutoff", 2)])
+        assert written(dump(0, cutoff=2)) == ""
+        # other programs are compared to their own previous version
+        assert written(dump(1, cutoff=2)) == format_patch(
+            1, parameters(dump(1, cutoff=2))
+        )
+        assert written(dump(0, cutoff=3, resonance=4)) == format_patch(
+            0, [("Cutoff", 3), ("Resonance", 4)]
+        )
+        # messages split across chunks are written once complete
+        data = dump(1, cutoff=5) + dump(1, cutoff=5)
+        chunks = [written(data[i : i + 7]) for i in range(0, len(data), 7)]
+        assert "".join(chunks) == format_patch(1, [("Cutoff", 5)])
+        # the text format includes messages that cannot be decoded
+        assert written(b"\xf0\x7d\x01\xf7") == (
+            "No suitable parser found for message 8\n"
+        )
+    assert decoder.count == 9
+    assert err.getvalue() == ""
+
+
+def test_live_jsonl() -> None:
+    out = io.BytesIO()
+    with JsonlWriter(out) as writer:
+        decoder = LiveDecoder(writer, source="port")
+        for msg in [
+            dump(0, cutoff=1),
+            dump(0, cutoff=1),
+            dump(0, cutoff=2),
+            dump(0, cutoff=2, resonance=3),
+            dump(0, cutoff=2, resonance=3),
+        ]:
+            decoder.feed(msg)
+    records: list[dict[str, Any]] = [
+        json.loads(line) for line in out.getvalue().decode().splitlines()
+    ]
+    assert [(r["file"], r["message"], r["program"]) for r in records] == [
+        ("port", 0, 0),
+        ("port", 2, 0),
+        ("port", 3, 0),
+    ]
+    assert records[0]["parameters"] == record(dump(0, cutoff=1))
+    assert records[1]["parameters"] == {"Cutoff": 2}
+    assert records[2]["parameters"] == {"Resonance": 3}
+
+
+def test_live_all_parameters() -> None:
+    out = io.BytesIO()
+    with JsonlWriter(out) as writer:
+        decoder = LiveDecoder(writer, changes=False)
+        assert decoder.feed(dump(0) + dump(0)) == 2
+    lines = out.getvalue().decode().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[1])["parameters"] == record(dump(0))
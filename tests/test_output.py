@@ -0,0 +1,105 @@
+"""
+Tests of the output formats of p600_decode.
+"""
+import ast
+import io
+from pathlib import Path
+import struct
+
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.decoding import decode_stream
+from p600syx.output import NpyWriter, TextWriter
+from p600syx.patch import Patch
+from p600syx.stats import Stats
+
+
+class Pipe(io.BytesIO):
+    """
+    This class emulates a non-seekable output, e.g. a pipe.
+    """
+
+    def seekable(self) -> bool:
+        return False
+
+
+def patch(program: int, cutoff: int) -> Patch:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(8)
+    assert layout is not None
+    parameters = [cutoff if name == "Cutoff" else 0 for name in layout.names]
+    _, result, _ = parser.decode(parser.encode(program, parameters), lazy=True)
+    return result
+
+
+def read_npy(data: bytes) -> tuple[tuple[int, int], list[int]]:
+    assert data[:8] == b"\x93NUMPY\x01\x00"
+    length = int.from_bytes(data[8:10], "little")
+    assert (10 + length) % 64 == 0
+    header = ast.literal_eval(data[10 : 10 + length].decode("latin1"))
+    assert header["descr"] == "<u2"
+    assert not header["fortran_order"]
+    body = data[10 + length :]
+    values = list(struct.unpack(f"<{len(body) // 2}H", body))
+    return header["shape"], values
+
+
+def test_npy_streamed_and_buffered(tmp_path: Path) -> None:
+    patches = [patch(program, program * 10) for program in range(3)]
+    width = len(patches[0]) + 1
+    path = tmp_path / "bank.npy"
+    with open(path, "wb") as f:
+        writer = NpyWriter(f)
+        writer.CHUNK_SIZE = width
+        with writer:
+            for i, p in enumerate(patches):
+                writer.write("bank.syx", i, "gligli", p)
+            # the rows are written before the writer is closed
+            f.flush()
+            assert path.stat().st_size > 2 * width * len(patches)
+    pipe = Pipe()
+    with NpyWriter(pipe) as buffered:
+        for i, p in enumerate(patches):
+            buffered.write("bank.syx", i, "gligli", p)
+        assert pipe.getvalue() == b""
+    assert path.read_bytes() == pipe.getvalue()
+    shape, values = read_npy(path.read_bytes())
+    assert shape == (3, width)
+    assert values[::width] == [0, 1, 2]
+    assert values == [
+        value for p in patches for value in [p.program] + list(p.values())
+    ]
+
+
+def test_npy_raw_and_empty() -> None:
+    part = io.BytesIO()
+    with NpyWriter(part, header=False) as writer:
+        writer.write("bank.syx", 0, "gligli", patch(5, 1))
+        names = writer.names
+    out = io.BytesIO()
+    with NpyWriter(out) as writer:
+        writer.write("bank.syx", 0, "gligli", patch(4, 1))
+        writer.write_raw(part.getvalue(), names)
+    shape, values = read_npy(out.getvalue())
+    assert shape[0] == 2
+    assert values[:: shape[1]] == [4, 5]
+    empty = io.BytesIO()
+    NpyWriter(empty).close()
+    assert read_npy(empty.getvalue()) == ((0, 0), [])
+
+
+def test_stats_stages() -> None:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(8)
+    assert layout is not None
+    data = b"".join(
+        parser.encode(program, [0] * len(layout.names)) for program in range(3)
+    )
+    stats = Stats()
+    out = io.BytesIO()
+    with TextWriter(out) as writer:
+        decode_stream(io.BytesIO(data), writer, io.StringIO(), stats=stats)
+        assert "write_patch" not in vars(writer)
+    assert stats.calls[("TextWriter", "output")] == 3
+    assert stats.calls[("TextWriter", "format")] == 3
+    assert stats.calls[("GliGliSysExParser", "decode")] == 3
+    assert b"Program number" in out.getvalue()
@@ -0,0 +1,133 @@
+"""
+Tests of PatchReceiver using a simulated device and of DumpWriter.
+"""
+import os
+from pathlib import Path
+import time
+from typing import Optional
+
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.receiver import DumpWriter, PatchReceiver
+
+# a patch dump request echoed by a MIDI merger, i.e. not a patch dump
+ECHO = b"\xf0\x00\x61\x16\x02\x00\xf7"
+
+
+def dump(program: int) -> bytes:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(8)
+    assert layout is not None
+    return parser.encode(program, [0] * len(layout.names))
+
+
+class FakeDevice:
+    """
+    This class answers patch dump requests after a delay per program. It can
+    ignore the first request of programs, answer with messages that are not
+    patch dumps and send unrelated messages whenever it has nothing else to
+    send.
+    """
+
+    def __init__(
+        self,
+        delays: Optional[dict[int, float]] = None,
+        ignore: Optional[set[int]] = None,
+        replies: Optional[dict[int, bytes]] = None,
+        noise: Optional[bytes] = None,
+    ) -> None:
+        self.delays = delays or {}
+        self.ignore = ignore or set()
+        self.replies = replies or {}
+        self.noise = noise
+        self.queue: list[tuple[float, bytes]] = []
+        self.requests: list[int] = []
+        # fail instead of hanging if the receiver never finishes
+        self.deadline = time.monotonic() + 5
+
+    def send(self, data: list[int]) -> None:
+        program = data[-1]
+        self.requests.append(program)
+        if program in self.ignore:
+            self.ignore.remove(program)
+            return
+        due = time.monotonic() + self.delays.get(program, 0.0)
+        self.queue.append((due, self.replies.get(program, dump(program))))
+        self.queue.sort()
+
+    def poll(self) -> Optional[bytes]:
+        now = time.monotonic()
+        assert now < self.deadline, "receiver did not finish"
+        if self.queue and self.queue[0][0] <= now:
+            return self.queue.pop(0)[1]
+        return self.noise
+
+
+def test_receive() -> None:
+    device = FakeDevice()
+    receiver = PatchReceiver(device.send, device.poll, window=4)
+    results = receiver.receive(range(10))
+    assert results == {program: dump(program) for program in range(10)}
+    assert receiver.stats.lost == []
+    assert receiver.stats.retries == 0
+
+
+def test_retry_with_unrelated_messages() -> None:
+    # the device never stops sending, so the receiver is never idle
+    device = FakeDevice(ignore={3}, noise=b"\xf0\x43\x10\x00\xf7")
+    receiver = PatchReceiver(device.send, device.poll, timeout=0.02)
+    results = receiver.receive(range(5))
+    assert sorted(results) == list(range(5))
+    assert device.requests.count(3) == 2
+    assert receiver.stats.retries == 1
+
+
+def test_discard_unknown_reply() -> None:
+    device = FakeDevice(replies={2: ECHO})
+    receiver = PatchReceiver(device.send, device.poll, timeout=0.02, retries=1)
+    results = receiver.receive([2])
+    assert results == {}
+    assert receiver.stats.lost == [2]
+
+
+def test_late_reply_of_lost_patch() -> None:
+    device = FakeDevice(delays={0: 0.05})
+    receiver = PatchReceiver(
+        device.send, device.poll, timeout=0.02, retries=0, interval=0.01
+    )
+    results = receiver.receive(range(10))
+    assert sorted(results) == list(range(10))
+    assert receiver.stats.lost == []
+
+
+def test_resume(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "bank.syx")
+    writer = DumpWriter(path)
+    for program in range(3):
+        writer.write(program, dump(program))
+    writer.close()
+    # data written after the last recorded reply is dropped
+    with open(path, "ab") as f:
+        f.write(dump(3)[:10])
+    with DumpWriter(path, resume=True) as writer:
+        assert writer.received == {0, 1, 2}
+        writer.write(3, dump(3))
+    with open(path, "rb") as f:
+        assert f.read() == b"".join(dump(program) for program in range(4))
+
+
+def test_resume_complete(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "bank.syx")
+    with DumpWriter(path) as writer:
+        for program in range(3):
+            writer.write(program, dump(program))
+        writer.close(complete=True)
+    assert not os.path.exists(path + DumpWriter.PROGRESS_SUFFIX)
+    # a complete dump is kept instead of being overwritten
+    with DumpWriter(path, resume=True) as writer:
+        assert writer.received == {0, 1, 2}
+        writer.write(5, dump(5))
+    with open(path, "rb") as f:
+        assert f.read() == b"".join(dump(program) for program in (0, 1, 2, 5))
+    with DumpWriter(path) as writer:
+        assert writer.received == set()
+    assert os.path.getsize(path) == 0
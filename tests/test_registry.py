@@ -0,0 +1,133 @@
+"""
+Tests of the parser lookup and the lazy loading of parsers in
+SysExParserFactory.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import Any, Optional
+
+import pytest
+
+from p600syx import registry
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.registry import BUILTIN_PARSERS, SysExParserFactory
+from p600syx.sysex_parser import SysExMessage, SysExParser
+
+THREADS = 8
+
+
+class FakeParser(SysExParser):
+    """
+    This class accepts all messages starting with a given prefix and
+    records its name in a shared log whenever it is queried.
+    """
+
+    def __init__(
+        self, name: str, header: bytes, accept: bytes, log: list[str]
+    ) -> None:
+        super().__init__(name)
+        self.header = header
+        self.accept = accept
+        self.log = log
+
+    def can_decode(self, msg: SysExMessage) -> bool:
+        self.log.append(self.name)
+        return bytes(msg).startswith(self.accept)
+
+    def decode(self, msg: SysExMessage, lazy: bool = False) -> Any:
+        raise NotImplementedError
+
+
+def make_factory(
+    affinity: bool = True,
+) -> tuple[SysExParserFactory, list[FakeParser], list[str]]:
+    log: list[str] = []
+    parsers = [
+        FakeParser("a1", b"\xf0\x01", b"\xf0\x01\x01", log),
+        FakeParser("a2", b"\xf0\x01", b"\xf0\x01\x02", log),
+        FakeParser("b", b"\xf0\x00\x20\x33", b"\xf0\x00\x20\x33", log),
+        # parsers without prefix are queried for all messages
+        FakeParser("any", b"", b"\xf0\x7d", log),
+    ]
+    factory = SysExParserFactory(affinity)
+    for parser in parsers:
+        factory.register_parser(parser)
+    return factory, parsers, log
+
+
+def queried(log: list[str]) -> list[str]:
+    names = list(log)
+    log.clear()
+    return names
+
+
+def test_dispatch_by_manufacturer_id() -> None:
+    factory, parsers, log = make_factory(affinity=False)
+    _, a2, b, any_parser = parsers
+    assert factory.manufacturer_id(b"\xf0\x01\x02") == b"\xf0\x01"
+    assert factory.manufacturer_id(b"\xf0\x00\x20\x33\x01") == (
+        b"\xf0\x00\x20\x33"
+    )
+    assert factory.get_parser(b"\xf0\x01\x02\x00") is a2
+    assert queried(log) == ["a1", "a2"]
+    assert factory.get_parser(b"\xf0\x00\x20\x33\x00") is b
+    assert queried(log) == ["b"]
+    assert factory.get_parser(b"\xf0\x7d\x00") is any_parser
+    assert queried(log) == ["any"]
+    assert factory.get_parser(b"\xf0\x01\x03") is None
+    assert queried(log) == ["a1", "a2", "any"]
+    # without affinity, the lookup starts over for every message
+    assert factory.get_parser(b"\xf0\x01\x02\x00") is a2
+    assert queried(log) == ["a1", "a2"]
+
+
+def test_affinity() -> None:
+    factory, parsers, log = make_factory()
+    a1, a2, b, _ = parsers
+    assert factory.get_parser(b"\xf0\x01\x02\x00") is a2
+    assert queried(log) == ["a1", "a2"]
+    # the parser of the previous message is tried first
+    assert factory.get_parser(b"\xf0\x01\x02\x01") is a2
+    assert queried(log) == ["a2"]
+    # a miss falls back to the lookup by manufacturer ID
+    assert factory.get_parser(b"\xf0\x01\x01\x00") is a1
+    assert queried(log) == ["a2", "a1"]
+    assert factory.get_parser(b"\xf0\x00\x20\x33\x00") is b
+    assert queried(log) == ["a1", "b"]
+    # messages without parser do not change the preferred parser
+    assert factory.get_parser(b"\xf0\x02") is None
+    assert queried(log) == ["b", "any"]
+    assert factory.get_parser(b"\xf0\x00\x20\x33\x01") is b
+    assert queried(log) == ["b"]
+
+
+def test_concurrent_lookup(monkeypatch: pytest.MonkeyPatch) -> None:
+    load_object = registry.load_object
+    calls: list[str] = []
+
+    def slow_load_object(spec: str) -> Any:
+        calls.append(spec)
+        # widen the window in which other threads can observe a partly
+        # loaded factory
+        time.sleep(0.05)
+        return load_object(spec)
+
+    monkeypatch.setattr(registry, "load_object", slow_load_object)
+    factory = SysExParserFactory()
+    for name, spec in BUILTIN_PARSERS.items():
+        factory.register_lazy(name, spec)
+    gligli = GliGliSysExParser()
+    layout = gligli.get_layout(8)
+    assert layout is not None
+    msg = gligli.encode(0, [0] * len(layout.names))
+    barrier = threading.Barrier(THREADS)
+
+    def lookup(_: int) -> Optional[SysExParser]:
+        barrier.wait()
+        return factory.get_parser(msg)
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        parsers = list(executor.map(lookup, range(THREADS)))
+    assert all(isinstance(p, GliGliSysExParser) for p in parsers)
+    assert sorted(calls) == sorted(BUILTIN_PARSERS.values())
@@ -0,0 +1,118 @@
+"""
+Round-trip tests of the encoders and decoders of both dump formats. Every
+dump is decoded and encoded again, which has to reproduce the original
+bytes exactly.
+"""
+import random
+
+import pytest
+
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.sequential_sysex_parser import SequentialSysExParser
+
+GLIGLI_VERSIONS = list(range(1, 9))
+
+
+def gligli_dumps(format_version: int, count: int = 20) -> list[bytes]:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(format_version)
+    assert layout is not None
+    rng = random.Random(format_version)
+    return [
+        parser.encode(
+            rng.randrange(100),
+            [rng.randrange(1 << 8 * nbytes) for nbytes in layout.sizes],
+            format_version,
+        )
+        for _ in range(count)
+    ]
+
+
+def sequential_dumps(count: int = 20) -> list[bytes]:
+    parser = SequentialSysExParser()
+    rng = random.Random(0)
+    return [
+        parser.encode(
+            rng.randrange(100),
+            [rng.randrange(1 << nbits) for _, nbits in parser.parameters],
+        )
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("format_version", GLIGLI_VERSIONS)
+def test_gligli_encode(format_version: int) -> None:
+    parser = GliGliSysExParser()
+    for msg in gligli_dumps(format_version):
+        program, parameters, data = parser.decode(msg)
+        values = [value for _, value in parameters]
+        assert parser.encode(program, values, format_version, data) == msg
+
+
+@pytest.mark.parametrize("format_version", GLIGLI_VERSIONS)
+def test_gligli_encode_many(format_version: int) -> None:
+    parser = GliGliSysExParser()
+    msgs = gligli_dumps(format_version)
+    banks = parser.decode_many(msgs)
+    assert list(banks) == [format_version]
+    assert parser.encode_many(banks[format_version]) == msgs
+
+
+@pytest.mark.parametrize("format_version", GLIGLI_VERSIONS)
+def test_gligli_decode(format_version: int) -> None:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(format_version)
+    assert layout is not None
+    values = [(1 << 8 * nbytes) - 1 for nbytes in layout.sizes]
+    msg = parser.encode(42, values, format_version)
+    program, parameters, _ = parser.decode(msg)
+    assert program == 42
+    assert parameters == list(zip(layout.names, values))
+    assert parser.decode(msg, lazy=True)[1].values() == tuple(values)
+
+
+def test_gligli_mixed_versions() -> None:
+    parser = GliGliSysExParser()
+    msgs = [msg for v in GLIGLI_VERSIONS for msg in gligli_dumps(v, 3)]
+    banks = parser.decode_many(msgs)
+    assert sorted(banks) == GLIGLI_VERSIONS
+    for format_version, bank in banks.items():
+        encoded = parser.encode_many(bank)
+        assert bank.indices is not None
+        assert encoded == [msgs[i] for i in bank.indices]
+
+
+def test_sequential_encode() -> None:
+    parser = SequentialSysExParser()
+    for msg in sequential_dumps():
+        program, parameters, _ = parser.decode(msg)
+        values = [value for _, value in parameters]
+        assert parser.encode(program, values) == msg
+
+
+def test_sequential_encode_many() -> None:
+    parser = SequentialSysExParser()
+    msgs = sequential_dumps()
+    assert parser.encode_many(parser.decode_many(msgs)) == msgs
+
+
+def test_sequential_decode() -> None:
+    parser = SequentialSysExParser()
+    values = [(1 << nbits) - 1 for _, nbits in parser.parameters]
+    msg = parser.encode(7, values)
+    program, parameters, _ = parser.decode(msg)
+    assert program == 7
+    assert [value for _, value in parameters] == values
+
+
+@pytest.mark.parametrize("format_version", [0, 9])
+def test_gligli_unknown_version(format_version: int) -> None:
+    with pytest.raises(ValueError):
+        GliGliSysExParser().encode(0, [], format_version)
+
+
+def test_sequential_out_of_range() -> None:
+    parser = SequentialSysExParser()
+    values = [1 << nbits for _, nbits in parser.parameters]
+    with pytest.raises(ValueError):
+        parser.encode(0, values)
@@ -0,0 +1,107 @@
+"""
+Tests of the nearest-neighbour search of p600_similar.
+"""
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+from p600syx import similarity
+from p600syx.diff import IGNORED_NAMES, PatchRef
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.patch import PATCH_NAME_PREFIX, Patch
+from p600syx.similarity import SimilarityIndex
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(
+    request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch
+) -> str:
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(similarity, "numpy", None)
+    return str(request.param)
+
+
+def dump(program: int, values: Optional[dict[str, int]] = None) -> bytes:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(8)
+    assert layout is not None
+    parameters = [(values or {}).get(name, 0) for name in layout.names]
+    return parser.encode(program, parameters)
+
+
+def patch(program: int, values: Optional[dict[str, int]] = None) -> Patch:
+    _, result, _ = GliGliSysExParser().decode(dump(program, values), lazy=True)
+    return result
+
+
+def distance(a: Patch, b: Patch) -> int:
+    total = 0
+    for (name, x), (_, y), maximum in zip(a, b, a.layout.maxima):
+        if name in IGNORED_NAMES or name.startswith(PATCH_NAME_PREFIX):
+            continue
+        total += abs(
+            min(x, maximum) * 255 // maximum - min(y, maximum) * 255 // maximum
+        )
+    return total
+
+
+def test_nearest(backend: str) -> None:
+    patches = [
+        patch(0, {"Cutoff": 65535, "Unison": 1}),
+        patch(1, {"Cutoff": 30000, "LFO Shape": 200}),
+        patch(
+            2,
+            {
+                "Cutoff": 65535,
+                "Unison": 1,
+                "(unused)": 255,
+                "Patch Name (01/16)": 65,
+            },
+        ),
+        patch(3, {"Cutoff": 1000, "Resonance": 40000}),
+        patch(4, {"Cutoff": 65535, "Unison": 1}),
+    ]
+    index = SimilarityIndex()
+    refs = [
+        PatchRef("bank.syx", i, p.program, None) for i, p in enumerate(patches)
+    ]
+    for ref, p in zip(refs, patches):
+        index.add(ref, p)
+    assert len(index) == 5
+    query = patches[0]
+    expected = sorted((distance(query, p), i) for i, p in enumerate(patches))
+    assert index.nearest(query, k=5) == [(d, refs[i]) for d, i in expected]
+    # unused parameters and patch names are ignored, ties keep the order
+    assert index.nearest(query, k=3) == [
+        (0, refs[0]),
+        (0, refs[2]),
+        (0, refs[4]),
+    ]
+    assert index.nearest(query, k=2, exclude=refs[0]) == [
+        (0, refs[2]),
+        (0, refs[4]),
+    ]
+    assert index.nearest(query, k=0) == []
+    assert index.nearest(query, k=10)[-1][1] == refs[3]
+
+
+def test_layouts(backend: str, tmp_path: Path) -> None:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(7)
+    assert layout is not None
+    path = tmp_path / "bank.syx"
+    path.write_bytes(
+        dump(0, {"Cutoff": 100})
+        + parser.encode(1, [0] * len(layout.names), 7)
+        + dump(2, {"Cutoff": 200})
+    )
+    index = SimilarityIndex()
+    assert index.add_file(str(path)) == 3
+    assert len(index.groups) == 2
+    # only patches of the same layout are returned
+    result = index.nearest(patch(5))
+    assert [(ref.message, ref.program) for _, ref in result] == [(0, 0), (2, 2)]
+    assert SimilarityIndex().nearest(patch(5)) == []
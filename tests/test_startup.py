@@ -0,0 +1,86 @@
+"""
+Startup time tests of the command line tools and the p600syx package. Every
+case is run in a fresh interpreter and compared to a budget on top of the
+start time of a bare interpreter. Wall clock budgets depend on the
+machine and its load, so the timing tests only run if P600SYX_STARTUP_SCALE
+is set to a factor applied to all budgets, e.g. 1 on an idle development
+machine. The check for modules loaded by 'import p600syx' always runs.
+"""
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# number of runs per case, the best is compared to the budget
+REPEAT = 10
+
+SCALE = os.environ.get("P600SYX_STARTUP_SCALE")
+
+# modules that must not be loaded by 'import p600syx'
+HEAVY_MODULES = [
+    "importlib.metadata",
+    "mido",
+    "progress",
+    "rtmidi",
+    "p600syx.gligli_sysex_parser",
+    "p600syx.sequential_sysex_parser",
+]
+
+# name, command line and budget in milliseconds
+CASES = [
+    ("import p600syx", ["-c", "import p600syx"], 30),
+    ("import decoding", ["-c", "import p600syx.decoding"], 60),
+    ("p600_decode -h", ["p600_decode", "-h"], 70),
+    ("p600_recv -h", ["p600_recv", "-h"], 70),
+    ("p600_send -h", ["p600_send", "-h"], 70),
+]
+
+
+def best_time(args: list[str]) -> float:
+    # best wall clock time of several runs in milliseconds
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + args,
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+@pytest.fixture(scope="module")
+def baseline() -> float:
+    return best_time(["-c", "pass"])
+
+
+def test_heavy_modules() -> None:
+    code = (
+        "import sys, p600syx;"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.split() == []
+
+
+@pytest.mark.skipif(
+    SCALE is None, reason="set P600SYX_STARTUP_SCALE to check start times"
+)
+@pytest.mark.parametrize(
+    "args,budget", [case[1:] for case in CASES], ids=[case[0] for case in CASES]
+)
+def test_startup_time(args: list[str], budget: float, baseline: float) -> None:
+    elapsed = best_time(args) - baseline
+    assert elapsed <= budget * float(SCALE or 1)
@@ -0,0 +1,82 @@
+"""
+Tests of the comparison and message selection of p600_send --sync.
+"""
+from pathlib import Path
+
+from p600syx.diff import SLOT_DIFFERENT, SLOT_ONLY_B, Difference
+from p600syx.gligli_sysex_parser import GliGliSysExParser
+from p600syx.sync import (
+    Change,
+    compare_dumps,
+    describe,
+    read_dumps,
+    read_messages,
+    select_messages,
+)
+
+FIRMWARE = b"\xf0\x00\x61\x16\x6b\x01\x02\x03\xf7"
+
+
+def dump(program: int, **values: int) -> bytes:
+    parser = GliGliSysExParser()
+    layout = parser.get_layout(8)
+    assert layout is not None
+    parameters = [
+        values.get(name.replace(" ", "_"), 0) for name in layout.names
+    ]
+    return parser.encode(program, parameters)
+
+
+def test_compare_dumps() -> None:
+    target = {
+        0: dump(0),
+        1: dump(1, Cutoff=100),
+        2: dump(2),
+        3: b"\xf0\x7d\xf7",
+    }
+    current = {0: dump(0), 1: dump(1, Cutoff=50), 3: b"\xf0\x7d\xf7"}
+    assert compare_dumps(target, current) == [
+        Change(1, SLOT_DIFFERENT, [("Cutoff", 50, 100)]),
+        Change(2, SLOT_ONLY_B, []),
+    ]
+    assert compare_dumps(target, target) == []
+
+
+def test_compare_undecodable_dumps() -> None:
+    target = {5: b"\xf0\x7d\x01\xf7"}
+    assert compare_dumps(target, {5: b"\xf0\x7d\x02\xf7"}) == [
+        Change(5, SLOT_DIFFERENT, [])
+    ]
+
+
+def test_describe() -> None:
+    assert (
+        describe(Change(2, SLOT_ONLY_B, [])) == "Program 02: unknown on device"
+    )
+    assert describe(Change(3, SLOT_DIFFERENT, [])) == "Program 03: different"
+    assert (
+        describe(Change(4, SLOT_DIFFERENT, [("Cutoff", 1, 2)]))
+        == "Program 04: 1 changed parameter (Cutoff)"
+    )
+    differences: list[Difference] = [(f"P{i}", 0, 1) for i in range(7)]
+    assert describe(Change(10, SLOT_DIFFERENT, differences), limit=2) == (
+        "Program 10: 7 changed parameters (P0, P1, ...)"
+    )
+
+
+def test_select_messages(tmp_path: Path) -> None:
+    path = tmp_path / "bank.syx"
+    messages = [dump(0), FIRMWARE, dump(1), dump(0, Cutoff=1), dump(2)]
+    path.write_bytes(b"".join(messages))
+    file_messages = read_messages(str(path))
+    assert [program for program, _ in file_messages] == [0, None, 1, 0, 2]
+    dumps, others = read_dumps(str(path))
+    assert dumps == {0: messages[3], 1: messages[2], 2: messages[4]}
+    assert others == [FIRMWARE]
+    # the file order is kept and only the last dump of a program is sent
+    assert select_messages(file_messages, [0, 2]) == [
+        FIRMWARE,
+        messages[3],
+        messages[4],
+    ]
+    assert select_messages(file_messages, []) == [FIRMWARE]
@@ -0,0 +1,40 @@
+"""
+Tests of the MIDI port selection.
+"""
+import pytest
+
+from p600syx.error import MIDIError
+from p600syx.util import get_port_pairs, get_ports
+
+PORTS = {"Prophet 1", "Prophet 2", "Other"}
+
+
+def test_get_ports() -> None:
+    assert get_ports(PORTS, ["Prophet*"]) == ["Prophet 1", "Prophet 2"]
+    assert get_ports(PORTS, ["Other", "*"]) == [
+        "Other",
+        "Prophet 1",
+        "Prophet 2",
+    ]
+    assert get_ports({"Other"}) == ["Other"]
+    with pytest.raises(MIDIError):
+        get_ports(PORTS, ["Missing*"])
+    with pytest.raises(MIDIError):
+        get_ports(PORTS)
+
+
+def test_get_port_pairs() -> None:
+    assert get_port_pairs(PORTS, PORTS, ["Prophet*"]) == [
+        ("Prophet 1", "Prophet 1"),
+        ("Prophet 2", "Prophet 2"),
+    ]
+    # the only ports are used even if their names differ
+    assert get_port_pairs({"In"}, {"Out"}) == [("In", "Out")]
+
+
+def test_get_port_pairs_unpaired() -> None:
+    # an input port without output port is not paired with another device
+    with pytest.raises(MIDIError, match="Prophet 3"):
+        get_port_pairs(PORTS | {"Prophet 3"}, PORTS, ["Prophet*"])
+    with pytest.raises(MIDIError, match="Other"):
+        get_port_pairs({"Prophet 1"}, {"Prophet 1", "Other"}, ["*"])